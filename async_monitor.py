@@ -0,0 +1,255 @@
+"""
+非同步監控模組
+以 asyncio 包裝 PacketProcessor：任何擷取來源或 pcap 檔的資料段經有界佇列送入解析，
+解析結果轉換為名單變動事件，以 `async for event in monitor.events()` 取用
+    
+    async with AsyncPlayerMonitor(PacketProcessor(DataManager())) as monitor:
+        asyncio.create_task(monitor.replay_pcap('capture.pcapng'))
+        async for event in monitor.events():
+            print(event.kind, event.player.nickname)
+"""
+
+import asyncio
+import concurrent.futures
+import time
+from typing import AsyncIterator, Callable, Dict, NamedTuple, Optional
+from capture_backend import create_capture_backend
+from config import Config
+from packet_decoder import decode_frame, TCP_FIN, TCP_RST, TCP_SYN
+from packet_processor import PacketProcessor
+from packet_queue import QueuedSegment
+from pcap_replay import iter_capture
+from player import Player
+from roster_delta import RosterTracker
+
+_END = object()  # 輸入結束標記
+
+
+class MonitorEvent(NamedTuple):
+    """名單變動事件（附上資料段的時間戳記）"""
+    timestamp: float
+    kind: str  # roster_delta 的事件類型
+    player: Player
+    previous: Optional[Player] = None
+
+
+class AsyncPlayerMonitor:
+    """asyncio 版的玩家監控
+    
+    資料段佇列與事件佇列都有上限：解析跟不上時 feed 會等待，
+    事件沒被取用時解析也會暫停，壓力一路回推到資料來源。
+    解析與名單比對在專用的單一執行緒中進行（一次取出佇列中最多 BATCH_SIZE 個資料段），
+    大型名單封包不會卡住事件迴圈上的其他協程；分派工作的 task 在 stop()（或離開 async with）時取消，
+    等待中的 feed() 與 events() 也會一併結束。
+    """
+    
+    YIELD_EVERY = 256  # 重播檔案時每隔幾個封包讓出一次事件迴圈
+    BATCH_SIZE = 64  # 每次交給解析執行緒的資料段上限
+    
+    def __init__(self, processor: PacketProcessor, tracker: Optional[RosterTracker] = None,
+                 queue_size: int = Config.PACKET_QUEUE_SIZE,
+                 event_queue_size: int = Config.EVENT_QUEUE_SIZE):
+        self.processor = processor
+        self.tracker = tracker or RosterTracker()
+        self.queue_size = queue_size
+        self.event_queue_size = event_queue_size
+        self.segments: Optional[asyncio.Queue] = None
+        self.event_queue: Optional[asyncio.Queue] = None
+        self._parser_task: Optional[asyncio.Task] = None
+        self._executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        
+        # 統計
+        self.segments_processed = 0
+        self.events_emitted = 0
+        self.dropped = 0
+    
+    async def __aenter__(self) -> 'AsyncPlayerMonitor':
+        self.start()
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+    
+    def start(self) -> None:
+        """在目前的事件迴圈中建立佇列並啟動解析 task"""
+        if self._parser_task is not None:
+            return
+        # 佇列在執行中的事件迴圈內建立（Python 3.8/3.9 的佇列會綁定建立時的迴圈）
+        self.segments = asyncio.Queue(self.queue_size)
+        self.event_queue = asyncio.Queue(self.event_queue_size)
+        # 單一執行緒：PacketProcessor 與 RosterTracker 不是執行緒安全的，資料段也必須依序處理
+        self._executor = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix='async-parser')
+        self._parser_task = asyncio.get_running_loop().create_task(self._parse_loop())
+    
+    async def stop(self) -> None:
+        """取消解析 task，釋放等待中的 feed()，並讓等待中的 events() 結束"""
+        task, self._parser_task = self._parser_task, None
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        # 正在執行的一批解析無法中斷，在執行緒池中等它結束，不卡住事件迴圈
+        executor, self._executor = self._executor, None
+        await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
+        
+        # 清空資料段佇列，喚醒卡在 put() 的送入端（被喚醒的送入端會再放入一筆，重複到沒有人等待為止）
+        segments = self.segments
+        while True:
+            while not segments.empty():
+                segments.get_nowait()
+            await asyncio.sleep(0)
+            if segments.empty():
+                break
+        
+        # 佇列已滿時丟棄最舊的事件騰出位置，確保結束標記一定放得進去
+        if self.event_queue.full():
+            self.event_queue.get_nowait()
+        self.event_queue.put_nowait(_END)
+    
+    async def feed(self, segment: QueuedSegment) -> None:
+        """送入一個 TCP 資料段（佇列滿時等待；等待中監控停止則直接返回，資料段丟棄）"""
+        self.start()
+        await self.segments.put(segment)
+    
+    async def feed_payload(self, payload: bytes, timestamp: Optional[float] = None) -> None:
+        """送入沒有 TCP 資訊的原始資料，視為單一串流依序拼接"""
+        await self.feed(QueuedSegment(time.time() if timestamp is None else timestamp,
+                                      None, 0, 0, payload))
+    
+    async def finish(self) -> None:
+        """標記輸入結束：佇列中的資料處理完後 events() 即結束"""
+        self.start()
+        await self.segments.put(_END)
+    
+    def threadsafe_feeder(self, timeout: float = 1.0) -> Callable[[QueuedSegment], bool]:
+        """建立給其他執行緒（擷取後端）使用的送入函式
+        
+        呼叫端會等待佇列騰出空間，最多 timeout 秒，逾時則丟棄並回傳 False。
+        """
+        loop = asyncio.get_running_loop()
+        self.start()
+        
+        def put(segment: QueuedSegment) -> bool:
+            future = asyncio.run_coroutine_threadsafe(self.segments.put(segment), loop)
+            try:
+                future.result(timeout)
+                return True
+            except (concurrent.futures.TimeoutError, concurrent.futures.CancelledError, RuntimeError):
+                future.cancel()
+                self.dropped += 1
+                return False
+        
+        return put
+    
+    async def run_capture(self, backend: str = Config.CAPTURE_BACKEND, iface: Optional[str] = None,
+                          port: int = Config.DEFAULT_PORT) -> None:
+        """以擷取後端即時監聽，直到 task 被取消或擷取停止"""
+        loop = asyncio.get_running_loop()
+        capture = create_capture_backend(backend, iface, port, self.threadsafe_feeder())
+        capture.start()
+        try:
+            while capture.running:
+                await asyncio.sleep(0.5)
+        finally:
+            # stop 會等待擷取執行緒結束，放到執行緒池避免卡住事件迴圈
+            await loop.run_in_executor(None, capture.stop)
+    
+    async def replay_pcap(self, path: str, port: int = Config.DEFAULT_PORT,
+                          speed: Optional[float] = None, finish: bool = True) -> None:
+        """將 pcap/pcapng 檔的資料段送入監控；speed 為 None 時全速"""
+        loop = asyncio.get_running_loop()
+        first_ts = None
+        started = loop.time()
+        for count, (timestamp, linktype, data) in enumerate(iter_capture(path), 1):
+            if speed:
+                if first_ts is None:
+                    first_ts = timestamp
+                delay = (timestamp - first_ts) / speed - (loop.time() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            elif count % self.YIELD_EVERY == 0:
+                await asyncio.sleep(0)
+            
+            segment = decode_frame(linktype, data)
+            if segment is None or port not in (segment.flow_key[1], segment.flow_key[3]):
+                continue
+            await self.feed(QueuedSegment(timestamp, segment.flow_key, segment.seq,
+                                          segment.flags, segment.payload))
+        if finish:
+            await self.finish()
+    
+    async def events(self) -> AsyncIterator[MonitorEvent]:
+        """依序產生名單變動事件，輸入結束（finish）後停止"""
+        self.start()
+        queue = self.event_queue
+        while True:
+            event = await queue.get()
+            if event is _END:
+                return
+            yield event
+    
+    def stats(self) -> Dict[str, int]:
+        """統計快照（可供狀態端點使用）"""
+        processor = self.processor
+        return {
+            'segment_queue': self.segments.qsize() if self.segments else 0,
+            'event_queue': self.event_queue.qsize() if self.event_queue else 0,
+            'segments_processed': self.segments_processed,
+            'events_emitted': self.events_emitted,
+            'dropped': self.dropped,
+            'frames_processed': processor.frames_processed,
+            'frames_dropped': processor.frames_dropped,
+            'dedupe_hits': processor.dedupe_hits,
+            'players': len(self.tracker),
+        }
+    
+    async def _parse_loop(self) -> None:
+        """主循環：取出佇列中已有的資料段，交給解析執行緒，再依序放入事件"""
+        loop = asyncio.get_running_loop()
+        segments = self.segments
+        event_queue = self.event_queue
+        executor = self._executor
+        while True:
+            batch = [await segments.get()]
+            while len(batch) < self.BATCH_SIZE and not segments.empty() and batch[-1] is not _END:
+                batch.append(segments.get_nowait())
+            finished = batch[-1] is _END
+            if finished:
+                batch.pop()
+            
+            if batch:
+                for timestamp, events in await loop.run_in_executor(executor, self._parse_batch, batch):
+                    for event in events:
+                        await event_queue.put(MonitorEvent(timestamp, *event))
+                        self.events_emitted += 1
+            if finished:
+                await event_queue.put(_END)
+                return
+    
+    def _parse_batch(self, batch: list) -> list:
+        """在解析執行緒中處理一批資料段，回傳 [(時間戳記, 名單變動事件), ...]"""
+        processor = self.processor
+        results = []
+        for segment in batch:
+            try:
+                if segment.flow_key is None:
+                    players = processor.process_packet_data(segment.payload)
+                else:
+                    flags = segment.flags
+                    players = processor.process_segment(
+                        segment.flow_key, segment.seq, segment.payload, segment.timestamp,
+                        syn=bool(flags & TCP_SYN), fin=bool(flags & (TCP_FIN | TCP_RST))
+                    )
+            except Exception as e:
+                print(f"解析資料段失敗: {e}")
+                continue
+            self.segments_processed += 1
+            
+            if players:
+                events = self.tracker.update(players)
+                if events:
+                    results.append((segment.timestamp, events))
+        return results 
\ No newline at end of file
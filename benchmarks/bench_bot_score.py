@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+可疑行為評分效能測試
+以合成事件模擬一整天（每秒一份名單）的頻道：數千名在線玩家持續換地圖、升級、
+離開與加入新 ID（另有一批整天不動的機器人），量測每份名單的評分耗時，以及追蹤狀態數與記憶體是否維持固定
+    
+    python benchmarks/bench_bot_score.py [--hours 24] [--online 3000] [--bots 30] [--churn 2] [--memory]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+# 確保可以匯入主程式
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot_score import BotScorer
+from data_manager import CodeBook
+from player import Player
+from roster_delta import JOINED, LEFT, LEVEL_CHANGED, MAP_CHANGED, RosterEvent
+
+CODEBOOK = CodeBook(str, str)
+MAPS = [CODEBOOK.maps.encode(f"맵{i}") for i in range(80)]
+JOB = CODEBOOK.jobs.encode('전사')
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="串流式可疑行為評分的耗時與記憶體")
+    parser.add_argument('--hours', type=float, default=24, help="模擬時數")
+    parser.add_argument('--online', type=int, default=3000, help="同時在線人數")
+    parser.add_argument('--bots', type=int, default=30, help="整天停在同一地圖、等級不變的人數")
+    parser.add_argument('--churn', type=int, default=2, help="每秒離開（並由新 ID 補上）的人數")
+    parser.add_argument('--changes', type=int, default=20, help="每秒換地圖或升級的人數")
+    parser.add_argument('--memory', action='store_true', help="以 tracemalloc 追蹤記憶體（較慢）")
+    args = parser.parse_args(argv)
+    
+    rng = random.Random(7)
+    scorer = BotScorer()
+    online = {}
+    next_id = 0
+    
+    def new_player() -> Player:
+        nonlocal next_id
+        next_id += 1
+        return Player(f"P{next_id}", str(10 ** 16 + next_id), rng.choice(MAPS), rng.randint(1, 150), JOB, CODEBOOK)
+    
+    events = []
+    for _ in range(args.online):
+        player = new_player()
+        online[player.id] = player
+        events.append(RosterEvent(JOINED, player))
+    scorer.update(events, 0.0)
+    ids = list(online)[args.bots:]  # 前 bots 人不換地圖、不升級也不離開
+    
+    if args.memory:
+        tracemalloc.start()
+    seconds = int(args.hours * 3600)
+    timings = []
+    max_tracked = 0
+    flags = 0
+    started = time.perf_counter()
+    for now in range(1, seconds + 1):
+        events = []
+        for _ in range(args.changes):
+            old = online[rng.choice(ids)]
+            if rng.random() < 0.5:
+                player = old._replace(map_code=rng.choice(MAPS))
+                events.append(RosterEvent(MAP_CHANGED, player, old))
+            else:
+                player = old._replace(level=old.level + 1)
+                events.append(RosterEvent(LEVEL_CHANGED, player, old))
+            online[player.id] = player
+        for _ in range(args.churn):
+            # 隨機一人離開，由新 ID 補上（與最後一個交換後移除，保持 O(1)）
+            index = rng.randrange(len(ids))
+            ids[index], ids[-1] = ids[-1], ids[index]
+            events.append(RosterEvent(LEFT, online.pop(ids.pop())))
+            player = new_player()
+            online[player.id] = player
+            ids.append(player.id)
+            events.append(RosterEvent(JOINED, player))
+        
+        t0 = time.perf_counter()
+        flags += len(scorer.update(events, float(now)))
+        timings.append(time.perf_counter() - t0)
+        max_tracked = max(max_tracked, len(scorer))
+        
+        if now % 21600 == 0:
+            line = f"{now / 3600:>5.0f}h  追蹤 {len(scorer):>6}"
+            if args.memory:
+                line += f"  記憶體 {tracemalloc.get_traced_memory()[0] / 1024 / 1024:>6.1f} MB"
+            print(line, flush=True)
+    elapsed = time.perf_counter() - started
+    
+    timings.sort()
+    print("=" * 72)
+    print(f"🤖 可疑行為評分：{args.hours:g} 小時，{args.online} 人在線，累計 {next_id:,} 個 ID")
+    print("=" * 72)
+    print(f"每份名單 平均 {sum(timings) / len(timings) * 1e6:.1f}µs  p99 {timings[int(len(timings) * 0.99)] * 1e6:.1f}µs  "
+          f"最慢 {timings[-1] * 1e3:.2f}ms")
+    print(f"追蹤狀態最多 {max_tracked:,}（捨棄 {scorer.evicted:,}）")
+    if args.memory:
+        print(f"記憶體峰值 {tracemalloc.get_traced_memory()[1] / 1024 / 1024:.1f} MB")
+        tracemalloc.stop()
+    print(f"標記變化 {flags:,} 次（機器人 {args.bots} 人），目前標記 {scorer.stats()['bot_flagged']}，總耗時 {elapsed:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main()) 
\ No newline at end of file
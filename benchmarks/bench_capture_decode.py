@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+擷取後端效能測試
+比較 scapy 完整解析與 AF_PACKET 後端手動解析標頭的每封包 CPU 成本；
+另在 loopback 上送出大量非目標埠的背景流量，比較有無核心 BPF 過濾時交給 Python 的封包數與 CPU 時間
+（需要 root / CAP_NET_RAW，沒有權限時略過）
+"""
+
+import os
+import socket
+import struct
+import sys
+import time
+
+# 確保可以匯入主程式
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from capture_backend import AFPacketCaptureBackend, ScapyCaptureBackend
+from config import Config
+
+PACKET_COUNT = 20000
+BACKGROUND_PACKETS = 50000
+
+
+def build_frames(count: int, payload_size: int = 1400):
+    """建立乙太網路/IPv4/TCP 封包"""
+    payload = b'x' * payload_size
+    frames = []
+    for i in range(count):
+        tcp = struct.pack('>HHIIBBHHH', Config.DEFAULT_PORT, 50000, i * payload_size, 0,
+                          5 << 4, 0x18, 65535, 0, 0) + payload
+        ip = struct.pack('>BBHHHBBH4s4s', 0x45, 0, 20 + len(tcp), i & 0xFFFF, 0, 64, 6, 0,
+                         bytes([10, 0, 0, 1]), bytes([10, 0, 0, 2])) + tcp
+        frames.append(b'\x00\x11\x22\x33\x44\x55\x66\x77\x88\x99\xaa\xbb\x08\x00' + ip)
+    return frames
+
+
+def measure(label: str, func, frames):
+    """量測每封包的 CPU 時間"""
+    start = time.process_time()
+    for frame in frames:
+        func(frame)
+    elapsed = time.process_time() - start
+    per_packet = elapsed / len(frames) * 1e6
+    print(f"  {label:<24} {per_packet:8.2f} µs/封包  ({len(frames) / elapsed:,.0f} 封包/秒)")
+    return per_packet
+
+
+def measure_background(kernel_filter: bool, port: int) -> tuple:
+    """擷取 lo 上的背景 UDP 流量與少量目標埠 TCP 資料，回傳 (交給 Python 的封包數, 目標資料段數, 擷取執行緒 CPU 秒數)"""
+    segments = []
+    backend = AFPacketCaptureBackend('lo', port, segments.append)
+    backend.kernel_filter = kernel_filter
+    frames = 0
+    handle_frame = backend.handle_frame
+    
+    def counting_handle(data, timestamp, raw_ip=False):
+        nonlocal frames
+        frames += 1
+        return handle_frame(data, timestamp, raw_ip)
+    
+    backend.handle_frame = counting_handle
+    cpu = {}
+    capture_loop = backend._capture_loop
+    
+    def timed_loop():
+        start = time.thread_time()
+        capture_loop()
+        cpu['seconds'] = time.thread_time() - start
+    
+    backend._capture_loop = timed_loop
+    backend.start()
+    
+    server = socket.socket()
+    server.bind(('127.0.0.1', port))
+    server.listen()
+    client = socket.create_connection(('127.0.0.1', port))
+    conn, _ = server.accept()
+    noise = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        for i in range(BACKGROUND_PACKETS):
+            noise.sendto(b'n' * 200, ('127.0.0.1', 9))
+            if i % 1000 == 0:
+                client.sendall(b'roster')
+                conn.recv(64)
+        time.sleep(0.5)
+    finally:
+        backend.stop()
+        for sock in (noise, client, conn, server):
+            sock.close()
+    return frames, len(segments), cpu.get('seconds', 0.0)
+
+
+def decode_costs():
+    """scapy 與手動解析在相同封包上的每封包 CPU 成本"""
+    from scapy.all import Ether, IP, IPv6, TCP
+    
+    frames = build_frames(PACKET_COUNT)
+    segments = []
+    
+    scapy_backend = ScapyCaptureBackend(None, Config.DEFAULT_PORT, segments.append)
+    scapy_backend._layers = (IP, IPv6, TCP)
+    af_packet_backend = AFPacketCaptureBackend(None, Config.DEFAULT_PORT, segments.append)
+    
+    def scapy_path(frame):
+        # AsyncSniffer 對每個封包都會做完整的分層解析
+        scapy_backend._process_packet(Ether(frame))
+    
+    def af_packet_path(frame):
+        af_packet_backend.handle_frame(frame, 0.0)
+    
+    print("=" * 60)
+    print(f"📡 擷取後端每封包 CPU 成本（{PACKET_COUNT} 個 1400 位元組資料段）")
+    print("=" * 60)
+    scapy_cost = measure("scapy 解析 + bytes()", scapy_path, frames)
+    segments.clear()
+    af_packet_cost = measure("AF_PACKET 手動解析", af_packet_path, frames)
+    print(f"\n  加速 {scapy_cost / af_packet_cost:.1f}x")
+
+
+def main():
+    decode_costs()
+    print("=" * 60)
+    print(f"🧹 背景流量（lo 上 {BACKGROUND_PACKETS:,} 個非目標埠 UDP 封包）")
+    print("=" * 60)
+    try:
+        for label, kernel_filter in (("無核心過濾", False), ("BPF tcp port", True)):
+            frames, matched, cpu = measure_background(kernel_filter, Config.DEFAULT_PORT)
+            print(f"  {label:<14} 交給 Python {frames:>7,} 個封包  目標資料段 {matched:>4}  "
+                  f"擷取執行緒 CPU {cpu * 1000:7.1f} ms")
+    except PermissionError:
+        print("  需要 root 或 CAP_NET_RAW，略過")
+
+
+if __name__ == '__main__':
+    main() 
\ No newline at end of file
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+封包重組緩衝區效能測試
+比較舊版 bytes 串接/切片與 FrameBuffer 每 MB 輸入的位元組複製量
+"""
+
+import os
+import sys
+import time
+
+# 確保可以匯入主程式
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from packet_processor import FrameBuffer
+
+SEGMENT_SIZE = 1400
+
+
+def build_frame(players: int) -> bytes:
+    """建立一個含指定玩家數的名單封包"""
+    records = []
+    for i in range(players):
+        pid = f"{10000000000000000 + i:017d}"
+        records.append(f"{pid}/0/{pid}/Player{i}#{pid}/버섯동산/0/{i % 200}/전사")
+    body = '/'.join(records).encode('utf-8')
+    return b'TOZ ' + len(body).to_bytes(4, 'little') + body
+
+
+def split_segments(stream: bytes, size: int = SEGMENT_SIZE):
+    """依 MSS 大小切割 TCP 資料"""
+    return [stream[i:i+size] for i in range(0, len(stream), size)]
+
+
+def legacy_copies(segments) -> int:
+    """模擬舊版 bytes 緩衝區的複製量"""
+    buffer = b''
+    copied = 0
+    for segment in segments:
+        copied += len(buffer) + len(segment)
+        buffer += segment
+        while True:
+            start = buffer.find(b'TOZ ')
+            if start < 0 or len(buffer) < start + 8:
+                break
+            length = int.from_bytes(buffer[start+4:start+8], 'little')
+            if len(buffer) < start + 8 + length:
+                break
+            copied += 8 + length  # pkt_bytes 切片
+            copied += len(buffer) - (start + 8 + length)  # 剩餘資料切片
+            buffer = buffer[start+8+length:]
+    return copied
+
+
+def frame_buffer_copies(segments) -> int:
+    """計算 FrameBuffer 的複製量"""
+    buffer = FrameBuffer()
+    for segment in segments:
+        buffer.append(segment)
+        while buffer.next_frame() is not None:
+            pass
+        buffer.compact()
+    return buffer.bytes_copied
+
+
+def measure(label: str, func, segments, total: int):
+    start = time.perf_counter()
+    copied = func(segments)
+    elapsed = time.perf_counter() - start
+    per_mb = copied / (total / (1024 * 1024))
+    print(f"  {label:<12} 複製 {per_mb / (1024 * 1024):10.2f} MB/每MB輸入  耗時 {elapsed * 1000:8.2f} ms")
+
+
+def main():
+    print("=" * 60)
+    print("📦 FrameBuffer 複製量測試（1400 位元組分段）")
+    print("=" * 60)
+    
+    for players in (10, 100, 1000, 5000):
+        frame = build_frame(players)
+        stream = frame * max(1, (4 * 1024 * 1024) // len(frame))
+        segments = split_segments(stream)
+        print(f"\n名單 {players} 人，單一封包 {len(frame) / 1024:.1f} KB，總輸入 {len(stream) / (1024 * 1024):.1f} MB")
+        measure("舊版 bytes", legacy_copies, segments, len(stream))
+        measure("FrameBuffer", frame_buffer_copies, segments, len(stream))
+
+
+if __name__ == '__main__':
+    main() 
\ No newline at end of file
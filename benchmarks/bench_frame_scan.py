@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+標頭搜尋最壞情況測試
+1 MB 封包以 1400 位元組分段到達時，比較每次從讀取位移重新搜尋
+與增量搜尋所檢查的位元組數
+"""
+
+import os
+import sys
+import time
+
+# 確保可以匯入主程式
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from packet_processor import FrameBuffer
+
+SEGMENT_SIZE = 1400
+FRAME_SIZE = 1024 * 1024
+
+
+def build_frame(size: int) -> bytes:
+    """建立一個指定大小、內容不含標頭的封包"""
+    body = bytes(i % 251 for i in range(256)) * (size // 256)
+    return b'TOZ ' + len(body).to_bytes(4, 'little') + body
+
+
+def split_segments(stream: bytes, size: int = SEGMENT_SIZE):
+    """依 MSS 大小切割 TCP 資料"""
+    return [stream[i:i+size] for i in range(0, len(stream), size)]
+
+
+def rescan(segments):
+    """舊版行為：每個分段都從讀取位移重新搜尋標頭，不丟棄雜訊"""
+    data = bytearray()
+    read_offset = 0
+    scanned = frames = 0
+    for segment in segments:
+        data += segment
+        while True:
+            start = data.find(FrameBuffer.MAGIC, read_offset)
+            scanned += (len(data) if start < 0 else start + 4) - read_offset
+            if start < 0 or len(data) < start + 8:
+                break
+            end = start + 8 + int.from_bytes(data[start+4:start+8], 'little')
+            if len(data) < end:
+                break
+            read_offset = end
+            frames += 1
+    return scanned, frames
+
+
+def incremental(segments):
+    """FrameBuffer 的增量搜尋"""
+    buffer = FrameBuffer()
+    frames = 0
+    for segment in segments:
+        buffer.append(segment)
+        while buffer.next_frame() is not None:
+            frames += 1
+        buffer.compact()
+    return buffer.bytes_scanned, frames
+
+
+def measure(label: str, func, segments, total: int):
+    start = time.perf_counter()
+    scanned, frames = func(segments)
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<8} 檢查 {scanned / (1024 * 1024):10.2f} MB（{scanned / total:8.2f} 次/位元組）  "
+          f"封包 {frames}  耗時 {elapsed * 1000:8.2f} ms")
+
+
+def main():
+    frame = build_frame(FRAME_SIZE)
+    scenarios = [
+        # 標頭先到，本體陸續到達
+        ("完整封包", frame),
+        # 從封包中段開始擷取：前半段沒有標頭，直到下一個封包才同步
+        ("中途加入", frame[len(frame) // 2:] + frame),
+    ]
+    
+    print("=" * 60)
+    print(f"🔎 標頭搜尋最壞情況（{FRAME_SIZE // 1024} KB 封包，{SEGMENT_SIZE} 位元組分段）")
+    print("=" * 60)
+    for label, stream in scenarios:
+        segments = split_segments(stream)
+        print(f"\n{label}：{len(segments)} 個分段，{len(stream) / (1024 * 1024):.2f} MB")
+        measure("重新搜尋", rescan, segments, len(stream))
+        measure("增量搜尋", incremental, segments, len(stream))
+
+
+if __name__ == '__main__':
+    main() 
\ No newline at end of file
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+封包解析效能測試組
+以合成流量量測 _extract_channel_players 與 process_packet_data / process_segment 的
+吞吐量與延遲百分位數，並可與 parser_budgets.json 中的預算比較（超出時結束代碼為 1）。
+預算只涵蓋 p50、p95 與吞吐量：p99 只靠少數幾個樣本，一次排程延遲就會讓它翻倍，只列出供參考；
+檢查與寫入預算時整組執行 --rounds 次，每項指標取最好的一次，偶發的干擾不會讓檢查失敗
+    
+    python benchmarks/bench_parser_suite.py                  # 只列出結果
+    python benchmarks/bench_parser_suite.py --check          # 超出預算時失敗
+    python benchmarks/bench_parser_suite.py --write-budgets  # 以本次結果（含餘裕）更新預算
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple
+
+# 確保可以匯入主程式
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_manager import DataManager
+from packet_processor import PacketProcessor
+from synthetic_traffic import TrafficGenerator
+
+BUDGETS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parser_budgets.json')
+BUDGET_HEADROOM = 3.0  # 寫入預算時保留的倍數餘裕
+BUDGET_KEYS = ('p50_us', 'p95_us', 'mb_per_s')  # 列入預算的指標（p99 不穩定，不列入）
+CHECK_ROUNDS = 3  # --check / --write-budgets 預設的執行次數
+FLOW = ('10.0.0.1', 32800, '10.0.0.2', 50000)
+
+
+class Result(NamedTuple):
+    """單一情境的量測結果"""
+    name: str
+    latencies: List[float]  # 每次操作的耗時（秒）
+    total_bytes: int
+    elapsed: float
+    
+    def percentile(self, pct: float) -> float:
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+        return ordered[index]
+    
+    def metrics(self) -> Dict[str, float]:
+        return {
+            'p50_us': self.percentile(50) * 1e6,
+            'p95_us': self.percentile(95) * 1e6,
+            'p99_us': self.percentile(99) * 1e6,
+            'ops_per_s': len(self.latencies) / self.elapsed,
+            'mb_per_s': self.total_bytes / self.elapsed / (1024 * 1024),
+        }
+
+
+def timed(name: str, operations: List[Callable[[], object]], total_bytes: int) -> Result:
+    """依序執行操作並記錄每次的耗時"""
+    clock = time.perf_counter
+    latencies = []
+    started = clock()
+    for operation in operations:
+        t0 = clock()
+        operation()
+        latencies.append(clock() - t0)
+    return Result(name, latencies, total_bytes, clock() - started)
+
+
+def bench_extract(data_manager: DataManager, size: int, repeat: int) -> Result:
+    """單一名單封包的欄位解析"""
+    generator = TrafficGenerator(seed=size)
+    roster = generator.roster(size)
+    frame = generator.roster_frame(roster)
+    processor = PacketProcessor(data_manager)
+    
+    players = processor._extract_channel_players(memoryview(frame))
+    assert [p.id for p in players] == [r.id for r in roster], "解析結果與產生的名單不一致"
+    
+    view = memoryview(frame)
+    operation = lambda: processor._extract_channel_players(view)
+    return timed(f'extract_{size}', [operation] * repeat, len(frame) * repeat)
+
+
+def build_stream(size: int, rosters: int, seed: int):
+    """產生連續變動的名單串流（穿插非名單封包與雜訊）"""
+    generator = TrafficGenerator(seed=seed)
+    roster = generator.roster(size)
+    history = []
+    for _ in range(rosters):
+        history.append(roster)
+        roster = generator.evolve(roster)
+    return generator, history, generator.stream(history, noise_frames=3, garbage=32)
+
+
+def bench_stream(data_manager: DataManager, size: int, rosters: int) -> Result:
+    """單一串流依序送入 1400 位元組分段"""
+    generator, history, data = build_stream(size, rosters, seed=1)
+    segments = [payload for _, payload in generator.segments(data)]
+    processor = PacketProcessor(data_manager)
+    
+    parsed = []
+    operations = [lambda payload=payload: parsed.extend(processor.process_packet_data(payload))
+                  for payload in segments]
+    result = timed(f'stream_{size}x{rosters}', operations, len(data))
+    assert len(parsed) == sum(len(roster) for roster in history), "串流解析的玩家數不正確"
+    return result
+
+
+def bench_reassembly(data_manager: DataManager, size: int, rosters: int) -> Result:
+    """亂序與重傳的 TCP 資料段重組"""
+    generator, history, data = build_stream(size, rosters, seed=2)
+    segments = generator.segments(data, start_seq=1000, reorder=0.1, duplicate=0.02)
+    processor = PacketProcessor(data_manager)
+    processor.process_segment(FLOW, 999, b'', 0.0, syn=True)
+    
+    parsed = []
+    operations = [lambda seq=seq, payload=payload:
+                  parsed.extend(processor.process_segment(FLOW, seq, payload, 0.0))
+                  for seq, payload in segments]
+    result = timed(f'reorder_{size}x{rosters}', operations, len(data))
+    assert len(parsed) == sum(len(roster) for roster in history), "重組後解析的玩家數不正確"
+    return result
+
+
+def run_suite() -> List[Result]:
+    data_manager = DataManager()
+    return [
+        bench_extract(data_manager, 100, 2000),
+        bench_extract(data_manager, 1000, 300),
+        bench_stream(data_manager, 200, 200),
+        bench_reassembly(data_manager, 200, 200),
+    ]
+
+
+def best_metrics(rounds: List[List[Result]]) -> Dict[str, Dict[str, float]]:
+    """多次執行中每個情境、每項指標最好的值（延遲取最小，吞吐量取最大）"""
+    best = {}
+    for results in rounds:
+        for result in results:
+            metrics = result.metrics()
+            current = best.setdefault(result.name, metrics)
+            for key, value in metrics.items():
+                current[key] = max(current[key], value) if key.endswith('_per_s') else min(current[key], value)
+    return best
+
+
+def check_budgets(metrics: Dict[str, Dict[str, float]], budgets: Dict[str, Dict[str, float]]) -> List[str]:
+    """回傳超出預算的項目說明；延遲為上限，吞吐量為下限（預算檔中的其他指標忽略）"""
+    failures = []
+    for name, values in metrics.items():
+        budget = budgets.get(name)
+        if not budget:
+            continue
+        for key in BUDGET_KEYS:
+            limit = budget.get(key)
+            if limit is None:
+                continue
+            value = values[key]
+            is_floor = key.endswith('_per_s')
+            if (value < limit) if is_floor else (value > limit):
+                failures.append(f"{name} {key} = {value:,.1f}（預算 {'≥' if is_floor else '≤'} {limit:,.1f}）")
+    return failures
+
+
+def make_budgets(metrics: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    """以量測結果加上餘裕產生預算"""
+    return {name: {
+        'p50_us': round(values['p50_us'] * BUDGET_HEADROOM, 1),
+        'p95_us': round(values['p95_us'] * BUDGET_HEADROOM, 1),
+        'mb_per_s': round(values['mb_per_s'] / BUDGET_HEADROOM, 2),
+    } for name, values in metrics.items()}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="封包解析效能測試組")
+    parser.add_argument('--check', action='store_true', help="結果超出預算時以代碼 1 結束")
+    parser.add_argument('--write-budgets', action='store_true', help="以本次結果更新預算檔")
+    parser.add_argument('--budgets', default=BUDGETS_FILE, help="預算檔路徑")
+    parser.add_argument('--rounds', type=int, default=None,
+                        help=f"執行次數，每項指標取最好的一次（--check / --write-budgets 預設 {CHECK_ROUNDS}，否則 1）")
+    args = parser.parse_args(argv)
+    
+    rounds = args.rounds or (CHECK_ROUNDS if args.check or args.write_budgets else 1)
+    metrics = best_metrics([run_suite() for _ in range(rounds)])
+    
+    print("=" * 78)
+    print(f"📊 封包解析效能測試組（{rounds} 次中最好的結果）")
+    print("=" * 78)
+    print(f"{'情境':<18} {'p50 (µs)':>10} {'p95 (µs)':>10} {'p99 (µs)':>10} {'次/秒':>12} {'MB/秒':>9}")
+    for name, m in metrics.items():
+        print(f"{name:<18} {m['p50_us']:>10.1f} {m['p95_us']:>10.1f} {m['p99_us']:>10.1f} "
+              f"{m['ops_per_s']:>12,.0f} {m['mb_per_s']:>9.2f}")
+    
+    if args.write_budgets:
+        with open(args.budgets, 'w', encoding='utf-8') as f:
+            json.dump(make_budgets(metrics), f, ensure_ascii=False, indent=2)
+        print(f"\n已更新預算檔：{args.budgets}")
+        return 0
+    
+    if args.check:
+        if not os.path.exists(args.budgets):
+            print(f"\n❌ 找不到預算檔：{args.budgets}")
+            return 1
+        with open(args.budgets, 'r', encoding='utf-8') as f:
+            failures = check_budgets(metrics, json.load(f))
+        if failures:
+            print("\n❌ 超出效能預算：")
+            for failure in failures:
+                print(f"  {failure}")
+            return 1
+        print("\n✅ 所有情境都在預算內")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main()) 
\ No newline at end of file
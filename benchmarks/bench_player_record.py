@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+玩家紀錄記憶體測試
+比較 1000 人名單使用五鍵 dict 與 __slots__ Player 紀錄的記憶體、配置次數與建立耗時
+（Player 為以 Player(...) 建構並編碼地圖與職業；fast path 為解析器的作法：
+原始位元組先查代碼快取，再以 tuple.__new__(Player, ...) 建立；
+(codes) 為代碼預先編好、只量測建構本身；legacy dict 為舊版解析器翻譯後建立 dict 的成本；
+倍數以 dict 字面值為基準）
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+# 確保可以匯入主程式
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_manager import CodeBook
+from player import Player
+
+ROSTER_SIZE = 1000
+
+
+def build_fields(count: int):
+    """預先建立欄位字串，只量測紀錄本身的成本"""
+    fields = []
+    for i in range(count):
+        pid = f"{10000000000000000 + i:017d}"
+        fields.append((f"玩家{i}", pid, "蘑菇山丘", i % 200, "戰士"))
+    return fields
+
+
+def build_dicts(fields):
+    return [{'nickname': n, 'id': i, 'map_zh': m, 'level': str(lv), 'job_zh': j}
+            for n, i, m, lv, j in fields]
+
+
+class LegacyTranslator:
+    """舊版解析器每位玩家都呼叫的 data_manager.translate_map / translate_job"""
+    
+    def __init__(self):
+        self.map_map = {"蘑菇山丘": "蘑菇山丘"}
+        self.job_map = {"戰士": "戰士"}
+    
+    def translate_map(self, korean_map: str) -> str:
+        return self.map_map.get(korean_map, korean_map)
+    
+    def translate_job(self, korean_job: str) -> str:
+        return self.job_map.get(korean_job, korean_job)
+
+
+def build_legacy_dicts(fields):
+    """舊版解析器的作法：每位玩家翻譯地圖與職業後建立 dict"""
+    translator = LegacyTranslator()
+    return [{'nickname': n, 'id': i, 'map_zh': translator.translate_map(m), 'level': str(lv),
+             'job_zh': translator.translate_job(j)}
+            for n, i, m, lv, j in fields]
+
+
+CODEBOOK = CodeBook(str, str)
+
+
+def build_players(fields):
+    encode_map = CODEBOOK.maps.encode
+    encode_job = CODEBOOK.jobs.encode
+    return [Player(n, i, encode_map(m), lv, encode_job(j), CODEBOOK) for n, i, m, lv, j in fields]
+
+
+def build_players_encoded(fields):
+    """代碼預先編好，只量測 Player 建構本身"""
+    return [Player(n, i, m, lv, j, CODEBOOK) for n, i, m, lv, j in fields]
+
+
+def build_players_fast(fields):
+    """解析器的建立方式：先查原始位元組的代碼快取，略過 NamedTuple 的 Python __new__"""
+    new_player = tuple.__new__
+    encode_map = CODEBOOK.maps.encode_raw
+    encode_job = CODEBOOK.jobs.encode_raw
+    lookup_map = CODEBOOK.maps.raw_lookup()
+    lookup_job = CODEBOOK.jobs.raw_lookup()
+    players = []
+    for n, i, m, lv, j in fields:
+        map_code = lookup_map(m)
+        if map_code is None:
+            map_code = encode_map(m)
+        job_code = lookup_job(j)
+        if job_code is None:
+            job_code = encode_job(j)
+        players.append(new_player(Player, (n, i, map_code, lv, job_code, CODEBOOK, None)))
+    return players
+
+
+def build_players_fast_encoded(fields):
+    new_player = tuple.__new__
+    return [new_player(Player, (n, i, m, lv, j, CODEBOOK, None)) for n, i, m, lv, j in fields]
+
+
+def measure(label: str, builder, fields, baseline: float = None) -> float:
+    """量測建立一份名單的記憶體、配置次數與耗時，回傳每份名單的建立秒數"""
+    tracemalloc.start()
+    snapshot_before = tracemalloc.take_snapshot()
+    roster = builder(fields)
+    snapshot_after = tracemalloc.take_snapshot()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    
+    stats = snapshot_after.compare_to(snapshot_before, 'filename')
+    blocks = sum(stat.count_diff for stat in stats)
+    size = sum(stat.size_diff for stat in stats)
+    
+    elapsed = float('inf')
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(50):
+            builder(fields)
+        elapsed = min(elapsed, (time.perf_counter() - start) / 50)
+    
+    ratio = f"  ({elapsed / baseline:.2f}x)" if baseline else ""
+    print(f"  {label:<14} {size / 1024:8.1f} KB  {blocks:6d} 次配置  "
+          f"{size / len(roster):6.1f} B/人  建立 {elapsed * 1000:6.3f} ms{ratio}")
+    return elapsed
+
+
+def main():
+    fields = build_fields(ROSTER_SIZE)
+    print("=" * 60)
+    print(f"🧮 {ROSTER_SIZE} 人名單的玩家紀錄成本")
+    print("=" * 60)
+    baseline = measure("dict", build_dicts, fields)
+    measure("legacy dict", build_legacy_dicts, fields, baseline)
+    measure("Player", build_players, fields, baseline)
+    encoded = [(n, i, CODEBOOK.maps.encode(m), lv, CODEBOOK.jobs.encode(j)) for n, i, m, lv, j in fields]
+    measure("Player (codes)", build_players_encoded, encoded, baseline)
+    raw = [(n, i, m.encode('utf-8'), lv, j.encode('utf-8')) for n, i, m, lv, j in fields]
+    measure("fast path", build_players_fast, raw, baseline)
+    measure("fast (codes)", build_players_fast_encoded, encoded, baseline)
+
+
+if __name__ == '__main__':
+    main() 
\ No newline at end of file
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+解析子行程效能測試
+以合成名單流量比較「解析執行緒」與「解析子行程」兩種模式，在有無模擬錄影負載時：
+- 端到端延遲：資料段送入佇列到介面行程取得名單變動事件
+- 主執行緒卡頓：模擬 Tk 主迴圈的心跳晚到時間，超過 Config.GUI_STALL_MS 記為一次卡頓
+
+錄影負載以純 Python 運算模擬每幀的處理（持有 GIL），依 Config.DEFAULT_FPS 執行。
+    
+    python benchmarks/bench_process_worker.py [--rosters 150] [--players 300] [--interval 0.02]
+"""
+
+import argparse
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+# 確保可以匯入主程式
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from data_manager import DataManager
+from packet_decoder import LINKTYPE_ETHERNET
+from packet_processor import PacketProcessor
+from packet_queue import PacketQueue, ParserWorker
+from process_worker import ProcessParserWorker, WorkerSource, feed_pcap
+from roster_delta import RosterTracker
+from synthetic_traffic import TrafficGenerator
+
+HEARTBEAT = Config.GUI_HEARTBEAT_MS / 1000
+FRAME_WORK = 60000  # 模擬錄影每幀的純 Python 運算量
+
+
+def ethernet_frame(seq: int, payload: bytes, flags: int = 0x18) -> bytes:
+    """組出伺服器送往用戶端的 Ethernet/IPv4/TCP 封包"""
+    tcp = struct.pack('>HHIIBBHHH', Config.DEFAULT_PORT, 50000, seq, 0, 5 << 4, flags, 65535, 0, 0) + payload
+    ip = struct.pack('>BBHHHBBH4s4s', 0x45, 0, 20 + len(tcp), 0, 0, 64, 6, 0,
+                     bytes([10, 0, 0, 1]), bytes([10, 0, 0, 2])) + tcp
+    return b'\x00' * 12 + b'\x08\x00' + ip
+
+
+def write_capture(path: str, rosters: int, players: int, interval: float) -> int:
+    """寫出每 interval 秒一份名單的擷取檔，回傳名單數"""
+    generator = TrafficGenerator(seed=7)
+    roster = generator.roster(players)
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<IHHiIII', 0xA1B2C3D4, 2, 4, 0, 0, 65535, LINKTYPE_ETHERNET))
+        
+        def record(timestamp: float, frame: bytes) -> None:
+            f.write(struct.pack('<IIII', int(timestamp), int(timestamp % 1 * 1e6), len(frame), len(frame)))
+            f.write(frame)
+        
+        record(0.0, ethernet_frame(999, b'', flags=0x02))
+        seq = 1000
+        for index in range(rosters):
+            data = generator.roster_frame(roster)
+            for offset, payload in generator.segments(data, start_seq=seq):
+                record(index * interval, ethernet_frame(offset, payload))
+            seq += len(data)
+            roster = generator.evolve(roster)
+    return rosters
+
+
+def recording_load(stop: threading.Event) -> None:
+    """模擬錄影執行緒：每幀做一段持有 GIL 的運算"""
+    period = 1 / Config.DEFAULT_FPS
+    while not stop.is_set():
+        started = time.perf_counter()
+        sum(i * i for i in range(FRAME_WORK))
+        stop.wait(max(0.0, period - (time.perf_counter() - started)))
+
+
+def run_thread_mode(path: str, on_events) -> None:
+    """解析執行緒模式：擷取（播放）與解析都在本行程"""
+    source = WorkerSource(pcap=path, speed=1.0)
+    tracker = RosterTracker()
+    packet_queue = PacketQueue(policy='block', block_timeout=1.0)
+    
+    def on_players(players):
+        events = tracker.update(players)
+        if events:
+            on_events(events, worker.segment_timestamp)
+    
+    worker = ParserWorker(packet_queue, PacketProcessor(DataManager(interactive=False)), on_players)
+    worker.start()
+    feeder = threading.Thread(target=feed_pcap, args=(source, packet_queue, threading.Event()), daemon=True)
+    feeder.start()
+    feeder.join()
+    worker.stop(timeout=10.0, drain=True)
+
+
+def run_process_mode(path: str, on_events) -> None:
+    """子行程模式：擷取（播放）與解析都在子行程"""
+    worker = ProcessParserWorker(DataManager(interactive=False).codebook, on_events,
+                                 WorkerSource(pcap=path, speed=1.0))
+    worker.start()
+    worker.wait()
+    worker.stop()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+def run_scenario(mode, path: str, recording: bool) -> Dict[str, float]:
+    """執行一個情境，主執行緒模擬介面心跳"""
+    latencies = []
+    lags = []
+    
+    def on_events(events, captured):
+        latencies.append(time.time() - captured)
+    
+    stop = threading.Event()
+    loader = threading.Thread(target=recording_load, args=(stop,), daemon=True)
+    if recording:
+        loader.start()
+    runner = threading.Thread(target=mode, args=(path, on_events), daemon=True)
+    runner.start()
+    
+    expected = time.perf_counter() + HEARTBEAT
+    while runner.is_alive():
+        time.sleep(max(0.0, expected - time.perf_counter()))
+        now = time.perf_counter()
+        lags.append(max(0.0, now - expected))
+        expected = now + HEARTBEAT
+    stop.set()
+    if recording:
+        loader.join()
+    
+    return {
+        'batches': len(latencies),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': max(latencies, default=0.0) * 1000,
+        'lag_p99_ms': percentile(lags, 99) * 1000,
+        'stalls': sum(1 for lag in lags if lag * 1000 >= Config.GUI_STALL_MS),
+        'ticks': len(lags),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="比較解析執行緒與解析子行程的延遲與介面卡頓")
+    parser.add_argument('--rosters', type=int, default=150, help="名單數")
+    parser.add_argument('--players', type=int, default=300, help="每份名單人數")
+    parser.add_argument('--interval', type=float, default=0.02, help="名單間隔（秒）")
+    args = parser.parse_args(argv)
+    
+    temp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(temp_dir, 'synthetic.pcap')
+        write_capture(path, args.rosters, args.players, args.interval)
+        
+        print("=" * 84)
+        print(f"🧵 解析執行緒 vs 子行程（{args.rosters} 份 × {args.players} 人，每 {args.interval * 1000:.0f} ms 一份）")
+        print("=" * 84)
+        print(f"{'模式':<8} {'錄影':<4} {'批次':>6} {'延遲p50':>9} {'延遲p99':>9} {'延遲max':>9} "
+              f"{'心跳p99':>9} {'卡頓':>6}")
+        for name, mode in (('thread', run_thread_mode), ('process', run_process_mode)):
+            for recording in (False, True):
+                r = run_scenario(mode, path, recording)
+                print(f"{name:<8} {'是' if recording else '否':<4} {r['batches']:>6} {r['p50_ms']:>7.2f}ms "
+                      f"{r['p99_ms']:>7.2f}ms {r['max_ms']:>7.2f}ms {r['lag_p99_ms']:>7.2f}ms "
+                      f"{r['stalls']:>3}/{r['ticks']}")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main()) 
\ No newline at end of file
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+同地圖玩家查詢效能測試
+比較掃描整份名單與 RosterTracker 增量索引在 100/1000/10000 人頻道中
+找出「我的角色」與「同地圖玩家」的耗時，以及維護索引對名單更新的額外成本
+"""
+
+import os
+import sys
+import time
+
+# 確保可以匯入主程式
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_manager import CodeBook
+from player import Player
+from roster_delta import RosterTracker
+from synthetic_traffic import TrafficGenerator
+
+CODEBOOK = CodeBook(str, str)
+
+
+def build_rosters(size: int, count: int):
+    """產生連續變動的名單"""
+    generator = TrafficGenerator(seed=size)
+    encode_map = CODEBOOK.maps.encode
+    encode_job = CODEBOOK.jobs.encode
+    records = generator.roster(size)
+    rosters = []
+    for _ in range(count):
+        rosters.append([Player(r.nickname, r.id, encode_map(r.map_kr), r.level, encode_job(r.job_kr), CODEBOOK)
+                        for r in records])
+        records = generator.evolve(records)
+    return rosters
+
+
+def scan_lookup(tracker: RosterTracker, nickname: str):
+    """舊做法：逐一比對暱稱，再以地圖篩選整份名單"""
+    me = next((p for p in tracker.players.values() if p.nickname == nickname), None)
+    return [p for p in tracker.players.values() if p.map_code == me.map_code]
+
+
+def index_lookup(tracker: RosterTracker, nickname: str):
+    """索引：暱稱與地圖都是一次 dict 查詢"""
+    me = tracker.find_nickname(nickname)
+    return tracker.on_map(me.map_code)
+
+
+def best_of(func, repeat: int) -> float:
+    """取多次執行中最快的一次（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print("=" * 72)
+    print("🗺️ 同地圖玩家查詢：掃描 vs 增量索引")
+    print("=" * 72)
+    print(f"{'人數':>7} {'掃描 (µs)':>12} {'索引 (µs)':>12} {'加速':>8} {'每次更新 (ms)':>14}")
+    
+    for size in (100, 1000, 10000):
+        rosters = build_rosters(size, 20)
+        tracker = RosterTracker()
+        start = time.perf_counter()
+        for roster in rosters:
+            tracker.update(roster)
+        update_ms = (time.perf_counter() - start) / len(rosters) * 1000
+        
+        nickname = rosters[-1][size // 2].nickname
+        assert {p.id for p in scan_lookup(tracker, nickname)} == {p.id for p in index_lookup(tracker, nickname)}
+        scan = best_of(lambda: scan_lookup(tracker, nickname), 50)
+        index = best_of(lambda: index_lookup(tracker, nickname), 50)
+        print(f"{size:>7} {scan * 1e6:>12.1f} {index * 1e6:>12.1f} {scan / index:>7.0f}x {update_ms:>14.3f}")
+
+
+if __name__ == '__main__':
+    main() 
\ No newline at end of file
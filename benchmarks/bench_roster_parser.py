@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+名單解析器效能測試
+比較舊版字串切割解析器與位元組單次掃描解析器在 10/100/1000 人名單上的速度
+"""
+
+import os
+import re
+import sys
+import time
+
+# 確保可以匯入主程式
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_manager import DataManager
+from packet_processor import PacketProcessor
+
+
+def build_frame(players: int) -> bytes:
+    """建立一個含指定玩家數的名單封包"""
+    records = []
+    for i in range(players):
+        pid = f"{10000000000000000 + i:017d}"
+        records.append(f"{pid}/0/{pid}/玩家{i}#{pid}/버섯동산/0/{i % 200}/전사")
+    body = '/'.join(records).encode('utf-8')
+    return b'TOZ ' + len(body).to_bytes(4, 'little') + body
+
+
+def legacy_extract(data_manager: DataManager, pkt_bytes: bytes):
+    """舊版解析器（先解碼整個封包，每個 17 位數字都切割一次剩餘字串）"""
+    text = pkt_bytes[8:].decode('utf-8', errors='ignore')
+    players = []
+    for m in re.finditer(r'(\d{17})', text):
+        rest = text[m.end(1):].lstrip('/')
+        parts = rest.split('/')
+        if len(parts) < 7 or '#' not in parts[2]:
+            continue
+        id1, nick2 = parts[1], parts[2]
+        nick, id2 = nick2.split('#', 1)
+        if id1 != id2:
+            continue
+        players.append({
+            'nickname': nick,
+            'id': id1,
+            'map_zh': data_manager.translate_map(parts[3].strip()),
+            'level': parts[5].strip(),
+            'job_zh': data_manager.translate_job(parts[6].strip()),
+        })
+    return players
+
+
+def best_of(func, repeat: int) -> float:
+    """取多次執行中最快的一次（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    data_manager = DataManager()
+    processor = PacketProcessor(data_manager)
+    
+    print("=" * 60)
+    print("🔍 名單解析器效能測試")
+    print("=" * 60)
+    print(f"{'人數':>6} {'舊版 (ms)':>12} {'新版 (ms)':>12} {'加速':>8}")
+    
+    for players in (10, 100, 1000):
+        frame = build_frame(players)
+        expected = legacy_extract(data_manager, frame)
+        actual = processor._extract_channel_players(memoryview(frame))
+        assert [p.to_dict() for p in actual] == expected, "新舊解析器輸出不一致"
+        
+        repeat = 5 if players == 1000 else 50
+        legacy = best_of(lambda: legacy_extract(data_manager, frame), repeat)
+        current = best_of(lambda: processor._extract_channel_players(memoryview(frame)), repeat)
+        print(f"{players:>6} {legacy * 1000:>12.3f} {current * 1000:>12.3f} {legacy / current:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main() 
\ No newline at end of file
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+出現紀錄資料庫效能測試
+以合成名單變動事件寫入數百萬筆紀錄，量測：
+- record() 呼叫端耗時（解析端實際付出的成本）與背景批次寫入的吞吐量
+- 寫入進行中與寫入完成後，「這個 ID 去過哪裡」等查詢的耗時
+    
+    python benchmarks/bench_sighting_store.py [--rows 2000000] [--players 5000]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+# 確保可以匯入主程式
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_manager import CodeBook
+from player import Player
+from roster_delta import RosterEvent
+from sighting_store import SightingStore
+
+CODEBOOK = CodeBook(str, str)
+KINDS = ('joined', 'left', 'map', 'level', 'job')
+
+
+def build_events(players: int, maps: int, count: int) -> list:
+    """產生固定數量的變動事件（重複使用同一批物件，只量測資料庫本身）"""
+    rng = random.Random(7)
+    map_codes = [CODEBOOK.maps.encode(f"맵{i}") for i in range(maps)]
+    job_code = CODEBOOK.jobs.encode('전사')
+    return [RosterEvent(rng.choice(KINDS),
+                        Player(f"P{pid}", str(10 ** 16 + pid), rng.choice(map_codes), rng.randint(1, 200),
+                               job_code, CODEBOOK))
+            for pid in (rng.randrange(players) for _ in range(count))]
+
+
+def time_query(func, repeat: int = 20) -> float:
+    """多次查詢的平均耗時（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="出現紀錄資料庫的寫入與查詢效能")
+    parser.add_argument('--rows', type=int, default=2000000, help="寫入筆數")
+    parser.add_argument('--players', type=int, default=5000, help="不同 ID 數")
+    parser.add_argument('--batch', type=int, default=200, help="每次 record() 的事件數（約一份名單的變動量）")
+    args = parser.parse_args(argv)
+    
+    events = build_events(args.players, 50, args.batch * 50)
+    temp_dir = tempfile.mkdtemp()
+    try:
+        store = SightingStore(os.path.join(temp_dir, 'sightings.db'), max_pending=args.rows)
+        player_id = str(10 ** 16 + 42)
+        
+        print("=" * 72)
+        print(f"🗂️ 出現紀錄資料庫（{args.rows:,} 筆，{args.players:,} 個 ID）")
+        print("=" * 72)
+        
+        record_time = 0.0
+        worst = 0.0
+        start = time.perf_counter()
+        ts = 0.0
+        written = 0
+        while written < args.rows:
+            offset = (written // args.batch) % 50 * args.batch
+            batch = events[offset:offset + min(args.batch, args.rows - written)]
+            t0 = time.perf_counter()
+            store.record(batch, ts)
+            elapsed = time.perf_counter() - t0
+            record_time += elapsed
+            worst = max(worst, elapsed)
+            written += len(batch)
+            ts += 0.5
+        calls = -(-args.rows // args.batch)
+        busy_query = time_query(lambda: store.history(player_id))
+        store.flush()
+        total = time.perf_counter() - start
+        
+        print(f"record() 平均 {record_time / calls * 1e6:.1f}µs / 最慢 {worst * 1e6:.1f}µs（每次 {args.batch} 筆）")
+        print(f"背景寫入 {store.written:,} 筆，{store.batches} 批，{store.written / total:,.0f} 筆/秒，"
+              f"丟棄 {store.dropped}")
+        print(f"寫入進行中 history(ID, 100)：{busy_query:.2f}ms")
+        print(f"history(ID, 100)：{time_query(lambda: store.history(player_id)):.2f}ms")
+        print(f"maps_visited(ID)：{time_query(lambda: store.maps_visited(player_id)):.2f}ms")
+        print(f"on_map(地圖, 最近 10 分鐘)：{time_query(lambda: store.on_map('맵7', ts - 600, ts)):.2f}ms")
+        store.close()
+        size = sum(os.path.getsize(os.path.join(temp_dir, name)) for name in os.listdir(temp_dir))
+        print(f"資料庫大小 {size / 1024 / 1024:.1f} MB（{size / max(1, store.written):.0f} bytes/筆）")
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main()) 
\ No newline at end of file
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+翻譯表快取啟動測試
+以 10,000 筆的翻譯表比較冷啟動（解析 JSON 並寫入快取）與暖啟動（讀取 marshal 快取）
+"""
+
+import json
+import marshal
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# 確保可以匯入主程式
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from data_manager import DataManager, load_translation_mapping
+
+ENTRIES = 10000
+REPEAT = 20
+
+
+def build_table(path: str, entries: int) -> None:
+    """產生指定筆數的翻譯表（九成地圖、一成職業）"""
+    maps = {f"지도{i:05d}동쪽숲": f"地圖{i:05d}東邊森林" for i in range(entries * 9 // 10)}
+    jobs = {f"직업{i:04d}(불,독)": f"職業{i:04d}（火毒）" for i in range(entries - len(maps))}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'職業對照': jobs, '地圖對照': maps}, f, ensure_ascii=False, indent=2)
+
+
+def best_of(func, repeat: int) -> float:
+    """取多次執行中最快的一次（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    temp_dir = tempfile.mkdtemp()
+    path = os.path.join(temp_dir, 'korean_chinese.json')
+    cache_path = path + Config.TRANSLATION_CACHE_SUFFIX
+    build_table(path, ENTRIES)
+    
+    def cold():
+        if os.path.exists(cache_path):
+            os.remove(cache_path)
+        load_translation_mapping(path)
+    
+    def warm():
+        load_translation_mapping(path)
+    
+    def parse_only():
+        with open(path, 'r', encoding='utf-8') as f:
+            json.load(f)
+    
+    original = Config.KOREAN_CHINESE_FILE
+    Config.KOREAN_CHINESE_FILE = path
+    try:
+        print("=" * 60)
+        print(f"🗂️ 翻譯表快取（{ENTRIES:,} 筆，JSON {os.path.getsize(path) / 1024:.0f} KB）")
+        print("=" * 60)
+        
+        timings = [
+            ("只解析 JSON", best_of(parse_only, REPEAT)),
+            ("冷啟動（解析並寫快取）", best_of(cold, REPEAT)),
+            ("暖啟動（讀取快取）", best_of(warm, REPEAT)),
+        ]
+        for label, elapsed in timings:
+            print(f"  {label:<16} {elapsed * 1000:8.2f} ms")
+        print(f"  快取大小 {os.path.getsize(cache_path) / 1024:.0f} KB，"
+              f"載入加速 {timings[1][1] / timings[2][1]:.1f}x")
+        
+        def cold_init():
+            if os.path.exists(cache_path):
+                os.remove(cache_path)
+            DataManager()
+        
+        cold_init = best_of(cold_init, REPEAT)
+        warm_init = best_of(DataManager, REPEAT)
+        print(f"\n  DataManager() 冷啟動 {cold_init * 1000:8.2f} ms，暖啟動 {warm_init * 1000:8.2f} ms")
+        
+        # 修改 JSON 後必須重新解析
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write('\n')
+        assert load_translation_mapping(path) is not None
+        with open(cache_path, 'rb') as f:
+            assert marshal.loads(f.read())[1][1] == os.path.getsize(path), "快取未隨 JSON 更新"
+        print("  JSON 變更後已自動重新解析並更新快取 ✅")
+    finally:
+        Config.KOREAN_CHINESE_FILE = original
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main() 
\ No newline at end of file
@@ -0,0 +1,253 @@
+"""
+可疑行為評分模組
+以名單變動事件增量更新每位玩家的固定大小狀態，依三項指標估算機器人可能性：
+- 同一地圖連續停留時間（短時間重新登入回到同一地圖不中斷）
+- 在線時等級停滯的累計時間
+- 離開後短時間內重新出現的頻率（每 BOT_REJOIN_HALF_LIFE 秒減半）
+"""
+
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from config import Config
+from roster_delta import JOINED, LEFT
+
+DWELL_WEIGHT = 40
+STAGNANT_WEIGHT = 30
+REJOIN_WEIGHT = 30
+
+# 原因代碼（標記狀態以代碼比較，時數增加不會重複回報）
+DWELL = 'dwell'
+STAGNANT = 'stagnant'
+REJOIN = 'rejoin'
+
+
+class BotScore(NamedTuple):
+    """一位玩家的可疑度（0–100）與達到門檻的原因"""
+    player_id: str
+    nickname: str
+    score: int
+    reasons: Tuple[str, ...]
+    flagged: bool
+    
+    def to_dict(self) -> Dict:
+        return {'id': self.player_id, 'nickname': self.nickname, 'score': self.score,
+                'reasons': list(self.reasons), 'flagged': self.flagged}
+
+
+class PlayerState:
+    """單一玩家的評分狀態；欄位固定，不保存歷史紀錄"""
+    __slots__ = ('nickname', 'map_code', 'map_since', 'level', 'level_online', 'online_since',
+                 'left_at', 'rejoins', 'rejoin_at', 'reasons', 'flagged', 'due')
+    
+    def __init__(self, nickname: str, map_code: int, level: int, now: float):
+        self.nickname = nickname
+        self.map_code = map_code
+        self.map_since = now  # 進入目前地圖的時間
+        self.level = level
+        self.level_online = 0.0  # 目前等級在先前登入期間累計的在線秒數
+        self.online_since: Optional[float] = now  # 本次登入時間（離線時為 None）
+        self.left_at = 0.0
+        self.rejoins = 0.0  # 快速重現次數（隨時間衰減）
+        self.rejoin_at = 0.0
+        self.reasons: Tuple[str, ...] = ()  # 上次回報時的原因代碼
+        self.flagged = False
+        self.due = now  # 未標記的玩家最早可能達到標記分數的時間
+
+
+def _hours(seconds: float) -> str:
+    return f"{seconds / 3600:.1f} 小時"
+
+
+class BotScorer:
+    """串流式機器人可能性評分
+    
+    update() 只處理有事件的玩家，另外每 sweep_interval 秒檢查一次在線玩家，
+    讓停留與停滯這類隨時間成長的指標即使沒有事件也能越過門檻
+    （頻道安靜時名單封包會被去重、不產生事件，呼叫端需定時以 update((), now) 推進時間）；
+    分數的成長速度有上限，未標記的玩家在最早可能達到標記分數之前不會重新計算。
+    只在玩家的標記狀態或原因改變時回傳結果。
+    離開超過 state_ttl 秒的玩家狀態會被捨棄，追蹤的玩家數另有 max_tracked 上限，
+    整天監控數千個 ID 時記憶體仍維持固定。
+    """
+    
+    def __init__(self, dwell_seconds: float = Config.BOT_DWELL_SECONDS,
+                 stagnant_seconds: float = Config.BOT_STAGNANT_SECONDS,
+                 rejoin_seconds: float = Config.BOT_REJOIN_SECONDS,
+                 rejoin_count: float = Config.BOT_REJOIN_COUNT,
+                 rejoin_half_life: float = Config.BOT_REJOIN_HALF_LIFE,
+                 flag_score: int = Config.BOT_FLAG_SCORE,
+                 sweep_interval: float = Config.BOT_SWEEP_INTERVAL,
+                 state_ttl: float = Config.BOT_STATE_TTL,
+                 max_tracked: int = Config.BOT_MAX_TRACKED):
+        self.dwell_seconds = dwell_seconds
+        self.stagnant_seconds = stagnant_seconds
+        self.rejoin_seconds = rejoin_seconds
+        self.rejoin_count = rejoin_count
+        self.rejoin_half_life = rejoin_half_life
+        self.flag_score = flag_score
+        self.sweep_interval = sweep_interval
+        self.state_ttl = state_ttl
+        self.max_tracked = max_tracked
+        # 分數每秒最多成長的量（停留與停滯同時累積；重現次數只會衰減）
+        self.max_rate = DWELL_WEIGHT / dwell_seconds + STAGNANT_WEIGHT / stagnant_seconds
+        self.states: Dict[str, PlayerState] = {}
+        self.online: Dict[str, None] = {}
+        self.offline: 'OrderedDict[str, None]' = OrderedDict()  # 依離開時間排序
+        self.last_sweep = None
+        self.evicted = 0
+    
+    def __len__(self) -> int:
+        return len(self.states)
+    
+    def reset(self) -> None:
+        """清空所有玩家狀態（名單來源重新開始、無法得知誰在中斷期間離開時使用）"""
+        self.states = {}
+        self.online = {}
+        self.offline = OrderedDict()
+        self.last_sweep = None
+    
+    def is_flagged(self, player_id: str) -> bool:
+        state = self.states.get(player_id)
+        return bool(state and state.flagged)
+    
+    def score(self, player_id: str, now: float) -> Optional[BotScore]:
+        """指定玩家目前的分數（不改變標記狀態）"""
+        state = self.states.get(player_id)
+        if state is None:
+            return None
+        score, _, reasons = self._evaluate(state, now)
+        return BotScore(player_id, state.nickname, score, reasons, score >= self.flag_score)
+    
+    def flagged(self, now: float) -> List[BotScore]:
+        """目前被標記的在線玩家（分數高到低）"""
+        scores = [self.score(player_id, now) for player_id in self.online
+                  if self.states[player_id].flagged]
+        return sorted(scores, key=lambda s: s.score, reverse=True)
+    
+    def update(self, events: Iterable, now: float) -> List[BotScore]:
+        """套用一批名單變動事件（RosterEvent 或 MonitorEvent），回傳標記狀態或原因改變的玩家"""
+        touched = {}
+        for event in events:
+            player = event.player
+            self._apply(event.kind, player, now)
+            touched[player.id] = None
+        
+        if self.last_sweep is None or now - self.last_sweep >= self.sweep_interval:
+            self.last_sweep = now
+            states = self.states
+            for player_id in self.online:
+                state = states[player_id]
+                if state.flagged or now >= state.due:
+                    touched[player_id] = None
+            self._evict(now)
+        
+        changes = []
+        for player_id in touched:
+            state = self.states.get(player_id)
+            if state is None:
+                continue
+            score, keys, reasons = self._evaluate(state, now)
+            flagged = score >= self.flag_score
+            if not flagged:
+                state.due = now + max(0, self.flag_score - score - 1) / self.max_rate
+            if flagged != state.flagged or (flagged and keys != state.reasons):
+                state.flagged = flagged
+                state.reasons = keys
+                changes.append(BotScore(player_id, state.nickname, score, reasons, flagged))
+        return changes
+    
+    def _apply(self, kind: str, player, now: float) -> None:
+        """依單一事件更新狀態"""
+        player_id = player.id
+        state = self.states.get(player_id)
+        if state is None:
+            if kind == LEFT:
+                return
+            self.states[player_id] = PlayerState(player.nickname, player.map_code, player.level, now)
+            self.online[player_id] = None
+            return
+        
+        state.nickname = player.nickname
+        if kind == LEFT:
+            if state.online_since is not None:
+                state.level_online += now - state.online_since
+                state.online_since = None
+            state.left_at = now
+            self.online.pop(player_id, None)
+            self.offline[player_id] = None
+            self.offline.move_to_end(player_id)
+            return
+        
+        if kind == JOINED:
+            self.offline.pop(player_id, None)
+            self.online[player_id] = None
+            if state.online_since is None:
+                state.online_since = now
+                if now - state.left_at <= self.rejoin_seconds:
+                    state.rejoins = self._decayed_rejoins(state, now) + 1
+                    state.rejoin_at = now
+                else:
+                    # 離開夠久才回來，停留重新計算
+                    state.map_since = now
+        
+        # 換地圖、升級事件，以及加入事件帶來的新地圖或等級
+        if player.map_code != state.map_code:
+            state.map_code = player.map_code
+            state.map_since = now
+        if player.level != state.level:
+            state.level = player.level
+            state.level_online = 0.0
+            state.online_since = now
+    
+    def _decayed_rejoins(self, state: PlayerState, now: float) -> float:
+        if not state.rejoins:
+            return 0.0
+        return state.rejoins * 0.5 ** ((now - state.rejoin_at) / self.rejoin_half_life)
+    
+    def _evaluate(self, state: PlayerState, now: float) -> Tuple[int, Tuple[str, ...], Tuple[str, ...]]:
+        """計算分數、原因代碼與原因說明"""
+        keys = []
+        reasons = []
+        online = state.online_since is not None
+        
+        dwell = now - state.map_since if online else 0.0
+        dwell_part = min(1.0, dwell / self.dwell_seconds)
+        if dwell_part >= 1.0:
+            keys.append(DWELL)
+            reasons.append(f"同一地圖停留 {_hours(dwell)}")
+        
+        stagnant = state.level_online + (now - state.online_since if online else 0.0)
+        stagnant_part = min(1.0, stagnant / self.stagnant_seconds)
+        if stagnant_part >= 1.0:
+            keys.append(STAGNANT)
+            reasons.append(f"在線 {_hours(stagnant)} 等級未變")
+        
+        rejoins = self._decayed_rejoins(state, now)
+        rejoin_part = min(1.0, rejoins / self.rejoin_count)
+        if round(rejoins) >= self.rejoin_count:
+            keys.append(REJOIN)
+            reasons.append(f"短時間內重新出現 {round(rejoins)} 次")
+        
+        score = round(DWELL_WEIGHT * dwell_part + STAGNANT_WEIGHT * stagnant_part + REJOIN_WEIGHT * rejoin_part)
+        return score, tuple(keys), tuple(reasons)
+    
+    def _evict(self, now: float) -> None:
+        """捨棄離開太久（或超過追蹤上限時最早離開）的玩家狀態"""
+        offline = self.offline
+        states = self.states
+        while offline:
+            player_id = next(iter(offline))
+            if now - states[player_id].left_at < self.state_ttl and len(states) <= self.max_tracked:
+                break
+            del offline[player_id]
+            del states[player_id]
+            self.evicted += 1
+    
+    def stats(self) -> Dict[str, int]:
+        """統計快照"""
+        return {
+            'bot_tracked': len(self.states),
+            'bot_online': len(self.online),
+            'bot_flagged': sum(1 for player_id in self.online if self.states[player_id].flagged),
+            'bot_evicted': self.evicted,
+        } 
\ No newline at end of file
@@ -0,0 +1,317 @@
+"""
+封包擷取後端模組
+提供可替換的擷取實作：Linux AF_PACKET 原始 socket（只手動解析必要標頭）
+與 scapy AsyncSniffer（跨平台備援）
+"""
+
+import ctypes
+import socket
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Type
+from packet_decoder import decode_frame, decode_ip, LINKTYPE_ETHERNET
+from packet_queue import QueuedSegment
+
+ETH_P_ALL = 0x0003
+ARPHRD_ETHER = 1
+ARPHRD_LOOPBACK = 772
+RECV_BUFFER_SIZE = 65535
+SO_ATTACH_FILTER = 26
+
+# classic BPF 指令碼
+BPF_LD_W_ABS = 0x20
+BPF_LD_H_ABS = 0x28
+BPF_LD_B_ABS = 0x30
+BPF_LD_H_IND = 0x48
+BPF_LDX_B_MSH = 0xb1
+BPF_ALU_AND_K = 0x54
+BPF_JEQ_K = 0x15
+BPF_JSET_K = 0x45
+BPF_RET_K = 0x06
+SKF_AD_HATYPE = (-0x1000 + 28) & 0xFFFFFFFF  # 輔助資料：網卡的 ARPHRD 類型
+ACCEPT_LENGTH = 262144
+
+
+def _tcp_port_checks(port: int, link: int, prefix: str) -> List[tuple]:
+    """鏈路層標頭長度為 link 時，IPv4/IPv6 TCP 任一端為 port 的判斷（標籤以 prefix 區分）"""
+    return [
+        # IPv6：下一個標頭直接是 TCP（與 tcpdump 的 tcp port 相同，不展開延伸標頭）
+        (prefix + 'v6', BPF_LD_B_ABS, link + 6), (None, BPF_JEQ_K, 6, None, 'drop'),
+        (None, BPF_LD_H_ABS, link + 40), (None, BPF_JEQ_K, port, 'accept', None),
+        (None, BPF_LD_H_ABS, link + 42), (None, BPF_JEQ_K, port, 'accept', 'drop'),
+        # IPv4：只看第一個分片，依 IHL 找到 TCP 標頭
+        (prefix + 'v4', BPF_LD_B_ABS, link + 9), (None, BPF_JEQ_K, 6, None, 'drop'),
+        (None, BPF_LD_H_ABS, link + 6), (None, BPF_JSET_K, 0x1FFF, 'drop', None),
+        (None, BPF_LDX_B_MSH, link), (None, BPF_LD_H_IND, link),
+        (None, BPF_JEQ_K, port, 'accept', None),
+        (None, BPF_LD_H_IND, link + 2), (None, BPF_JEQ_K, port, 'accept', 'drop'),
+    ]
+
+
+def tcp_port_filter(port: int) -> List[Tuple[int, int, int, int]]:
+    """編譯等同 `tcp port N` 的 classic BPF 程式，回傳 (code, jt, jf, k) 指令列表
+    
+    依網卡類型分流：乙太網路與 loopback 有 14 位元組的鏈路層標頭，tun 等裝置直接是 IP 封包，
+    未綁定網卡、同時擷取多種裝置時也能在核心內正確過濾。
+    """
+    program = [
+        (None, BPF_LD_W_ABS, SKF_AD_HATYPE),
+        (None, BPF_JEQ_K, ARPHRD_ETHER, 'ether', None),
+        (None, BPF_JEQ_K, ARPHRD_LOOPBACK, 'ether', 'raw'),
+        ('ether', BPF_LD_H_ABS, 12),
+        (None, BPF_JEQ_K, 0x86DD, 'ether_v6', None),
+        (None, BPF_JEQ_K, 0x0800, 'ether_v4', 'drop'),
+        ('raw', BPF_LD_B_ABS, 0),
+        (None, BPF_ALU_AND_K, 0xF0),
+        (None, BPF_JEQ_K, 0x60, 'raw_v6', None),
+        (None, BPF_JEQ_K, 0x40, 'raw_v4', 'drop'),
+    ]
+    program += _tcp_port_checks(port, 14, 'ether_')
+    program += _tcp_port_checks(port, 0, 'raw_')
+    program += [('accept', BPF_RET_K, ACCEPT_LENGTH), ('drop', BPF_RET_K, 0)]
+    
+    labels = {entry[0]: index for index, entry in enumerate(program) if entry[0]}
+    compiled = []
+    for index, entry in enumerate(program):
+        _, code, k = entry[:3]
+        jt = jf = 0
+        if code in (BPF_JEQ_K, BPF_JSET_K):
+            # 跳躍是相對於下一個指令的位移；None 表示繼續執行下一個指令
+            jt, jf = (0 if target is None else labels[target] - index - 1 for target in entry[3:])
+        compiled.append((code, jt, jf, k))
+    return compiled
+
+
+def attach_filter(sock: socket.socket, program: List[Tuple[int, int, int, int]]) -> None:
+    """以 SO_ATTACH_FILTER 將 BPF 程式掛到 socket 上（核心會複製一份）"""
+    instructions = b''.join(struct.pack('HBBI', *instruction) for instruction in program)
+    buffer = ctypes.create_string_buffer(instructions)
+    fprog = struct.pack('HL', len(program), ctypes.addressof(buffer))
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+
+
+class CaptureBackend:
+    """封包擷取後端介面
+    
+    擷取到目標埠的 TCP 資料段後，以 QueuedSegment 呼叫 on_segment。
+    """
+    
+    name = ''
+    
+    def __init__(self, iface: Optional[str], port: int,
+                 on_segment: Callable[[QueuedSegment], object]):
+        self.iface = iface
+        self.port = port
+        self.on_segment = on_segment
+        self.packets = 0
+    
+    @classmethod
+    def available(cls) -> bool:
+        """此平台是否可使用這個後端"""
+        return True
+    
+    @property
+    def running(self) -> bool:
+        raise NotImplementedError
+    
+    def start(self) -> None:
+        raise NotImplementedError
+    
+    def stop(self) -> None:
+        raise NotImplementedError
+
+
+class ScapyCaptureBackend(CaptureBackend):
+    """以 scapy AsyncSniffer 擷取（完整解析每個封包，跨平台）"""
+    
+    name = 'scapy'
+    
+    def __init__(self, iface, port, on_segment):
+        super().__init__(iface, port, on_segment)
+        self.sniffer = None
+        self._layers = None
+    
+    @property
+    def running(self) -> bool:
+        return bool(self.sniffer and self.sniffer.thread and self.sniffer.thread.is_alive())
+    
+    def start(self) -> None:
+        from scapy.all import AsyncSniffer, IP, IPv6, TCP
+        self._layers = (IP, IPv6, TCP)
+        self.sniffer = AsyncSniffer(
+            iface=self.iface,
+            filter=f'tcp port {self.port}',
+            prn=self._process_packet,
+            store=False
+        )
+        self.sniffer.start()
+    
+    def stop(self) -> None:
+        if self.running:
+            self.sniffer.stop()
+    
+    def _process_packet(self, pkt):
+        """處理 scapy 解析後的封包"""
+        IP, IPv6, TCP = self._layers
+        if TCP not in pkt:
+            return
+        
+        ip = pkt[IP] if IP in pkt else pkt[IPv6] if IPv6 in pkt else None
+        if ip is None:
+            return
+        
+        self.packets += 1
+        tcp = pkt[TCP]
+        self.on_segment(QueuedSegment(
+            float(pkt.time), (ip.src, tcp.sport, ip.dst, tcp.dport),
+            tcp.seq, int(tcp.flags), bytes(tcp.payload)
+        ))
+
+
+class AFPacketCaptureBackend(CaptureBackend):
+    """Linux AF_PACKET 原始 socket 擷取
+    
+    每個封包只用一次 recv 取得，手動解析 IPv4/IPv6 與 TCP 標頭，
+    payload 以 memoryview 指向該次 recv 的資料，不再額外複製。
+    socket 掛上 `tcp port N` 的 BPF 過濾程式，其他流量在核心內就被丟棄，不會喚醒擷取執行緒；
+    掛載失敗時只印出警告，改由 handle_frame 過濾。
+    """
+    
+    name = 'af_packet'
+    kernel_filter = True
+    
+    def __init__(self, iface, port, on_segment):
+        super().__init__(iface, port, on_segment)
+        self.sock = None
+        self._thread = None
+        self._running = False
+    
+    @classmethod
+    def available(cls) -> bool:
+        return sys.platform.startswith('linux') and hasattr(socket, 'AF_PACKET')
+    
+    @property
+    def running(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+    
+    def start(self) -> None:
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(ETH_P_ALL))
+        if self.kernel_filter:
+            try:
+                attach_filter(sock, tcp_port_filter(self.port))
+            except OSError as e:
+                print(f"無法掛載 BPF 過濾程式，改在程式內過濾: {e}")
+        if self.iface:
+            sock.bind((self.iface, 0))
+        sock.settimeout(0.2)
+        self.sock = sock
+        self._running = True
+        self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._thread.start()
+    
+    def stop(self) -> None:
+        self._running = False
+        if self._thread:
+            self._thread.join(1.0)
+            self._thread = None
+        if self.sock:
+            self.sock.close()
+            self.sock = None
+    
+    def _capture_loop(self) -> None:
+        """擷取循環"""
+        recvfrom = self.sock.recvfrom
+        handle = self.handle_frame
+        while self._running:
+            try:
+                data, address = recvfrom(RECV_BUFFER_SIZE)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            # tun 等沒有乙太網路標頭的裝置直接是 IP 封包
+            handle(data, time.time(), address[3] not in (ARPHRD_ETHER, ARPHRD_LOOPBACK))
+    
+    def handle_frame(self, data: bytes, timestamp: float, raw_ip: bool = False) -> bool:
+        """解析一個鏈路層封包，符合目標埠時交給 on_segment"""
+        segment = decode_ip(memoryview(data), None) if raw_ip else decode_frame(LINKTYPE_ETHERNET, data)
+        if segment is None:
+            return False
+        flow_key = segment.flow_key
+        if flow_key[1] != self.port and flow_key[3] != self.port:
+            return False
+        
+        self.packets += 1
+        self.on_segment(QueuedSegment(timestamp, flow_key, segment.seq, segment.flags, segment.payload))
+        return True
+
+
+class AutoCaptureBackend(CaptureBackend):
+    """自動選擇的擷取後端
+    
+    start() 時優先使用 AF_PACKET；平台不支援，或開啟原始 socket 失敗（例如沒有 root 權限）時改用 scapy。
+    其餘操作都轉給實際啟動的後端。
+    """
+    
+    def __init__(self, iface, port, on_segment):
+        # 不呼叫 CaptureBackend.__init__：packets 由實際的後端計數
+        self.iface = iface
+        self.port = port
+        self.on_segment = on_segment
+        self.backend: Optional[CaptureBackend] = None
+    
+    @property
+    def name(self) -> str:
+        return self.backend.name if self.backend else 'auto'
+    
+    @property
+    def packets(self) -> int:
+        return self.backend.packets if self.backend else 0
+    
+    @property
+    def running(self) -> bool:
+        return bool(self.backend and self.backend.running)
+    
+    def start(self) -> None:
+        if AFPacketCaptureBackend.available():
+            backend = AFPacketCaptureBackend(self.iface, self.port, self.on_segment)
+            try:
+                backend.start()
+                self.backend = backend
+                return
+            except OSError as e:
+                backend.stop()
+                print(f"AF_PACKET 擷取無法啟動，改用 scapy: {e}")
+        backend = ScapyCaptureBackend(self.iface, self.port, self.on_segment)
+        backend.start()
+        self.backend = backend
+    
+    def stop(self) -> None:
+        if self.backend:
+            self.backend.stop()
+
+
+CAPTURE_BACKENDS: Dict[str, Type[CaptureBackend]] = {
+    AFPacketCaptureBackend.name: AFPacketCaptureBackend,
+    ScapyCaptureBackend.name: ScapyCaptureBackend,
+}
+
+
+def register_capture_backend(backend: Type[CaptureBackend]) -> None:
+    """註冊新的擷取後端"""
+    CAPTURE_BACKENDS[backend.name] = backend
+
+
+def create_capture_backend(name: str, iface: Optional[str], port: int,
+                           on_segment: Callable[[QueuedSegment], object]) -> CaptureBackend:
+    """建立擷取後端；'auto' 時優先使用 AF_PACKET，平台不支援或啟動失敗時退回 scapy"""
+    if name == 'auto':
+        return AutoCaptureBackend(iface, port, on_segment)
+    backend = CAPTURE_BACKENDS.get(name)
+    if backend is None:
+        raise ValueError(f"未知的擷取後端: {name}")
+    if not backend.available():
+        raise RuntimeError(f"此平台不支援擷取後端: {name}")
+    return backend(iface, port, on_segment) 
\ No newline at end of file
@@ -8,6 +8,16 @@ class Config:
     
     # 網路設定
     DEFAULT_PORT = 32800
+    FLOW_IDLE_TIMEOUT = 120  # 秒，閒置超過此時間的 TCP 連線會被移除
+    PACKET_QUEUE_SIZE = 4096  # 擷取與解析之間的佇列長度
+    PACKET_QUEUE_POLICY = 'drop_oldest'  # 佇列滿時：drop_newest / drop_oldest / block
+    PARSER_BATCH_SIZE = 64  # 解析執行緒每批處理的資料段數
+    EVENT_QUEUE_SIZE = 1024  # asyncio 監控介面的事件佇列長度
+    CAPTURE_BACKEND = 'auto'  # auto / af_packet (Linux) / scapy
+    MAX_FRAME_LENGTH = 2 * 1024 * 1024  # 標頭宣告長度的上限，超過視為損毀並重新同步
+    ROSTER_PROBE_WINDOW = 256  # 名單特徵（第一筆紀錄）只在封包本體前這麼多位元組內尋找，0 為整個封包
+    ROSTER_DEDUPE = True  # 同一連線重送、內容完全相同的名單封包不再解析
+    PARSER_MODE = 'thread'  # thread：解析執行緒 / process：擷取與解析在子行程執行，不與介面共用 GIL
     
     # 視頻錄製設定
     DEFAULT_FPS = 15
@@ -17,7 +27,15 @@ class Config:
     
     # 檔案路徑
     KOREAN_CHINESE_FILE = 'korean_chinese.json'
+    TRANSLATION_CACHE_SUFFIX = '.cache'  # 翻譯表二進位快取（與 JSON 放在同一目錄）
+    TRANSLATION_POLL_INTERVAL = 2.0  # 秒，檢查翻譯檔是否變更的間隔
+    VOCAB_MAX_NAMES = 20000  # 地圖／職業各自最多配置的名稱數，之後的未知名稱一律記為「未知」
+    VOCAB_RAW_CACHE_SIZE = 8192  # 原始位元組 → 代碼快取的上限筆數，超過時清空
+    FUZZY_CACHE_SIZE = 4096  # 模糊查詢結果快取的名稱數上限
+    FUZZY_MAX_SUFFIX = 3  # 已知名稱後多出的後綴最多幾個字仍視為同一名稱
+    FUZZY_MAX_DISTANCE = 1  # 模糊比對允許的編輯距離
     USER_CONFIG_FILE = 'user_config.json'
+    SETTINGS_SAVE_DELAY = 1.0  # 秒，設定變更後延遲寫入，期間的變更合併為一次寫入
     RECORDINGS_DIR = "recordings"
     
     # 視頻編碼設定
@@ -33,4 +51,25 @@ class Config:
     WINDOW_TITLE = "同地圖玩家查找器 + 視窗錄影"
     WINDOW_SIZE = "900x700"
     PLAYER_TAB_TITLE = "🎯 玩家監控"
-    RECORDING_TAB_TITLE = "🎬 視窗錄影" 
\ No newline at end of file
+    RECORDING_TAB_TITLE = "🎬 視窗錄影"
+    SHOW_DIAGNOSTICS = False  # 啟動時是否顯示診斷面板
+    DIAGNOSTICS_REFRESH_MS = 1000  # 診斷面板更新間隔（毫秒）
+    GUI_HEARTBEAT_MS = 50  # 主迴圈心跳間隔（毫秒），用來量測介面卡頓
+    GUI_STALL_MS = 100  # 心跳晚到超過此毫秒數視為一次卡頓
+    
+    # 出現紀錄設定
+    SIGHTINGS_DB = 'sightings.db'  # 名單變動事件的 SQLite 資料庫（空字串則不記錄）
+    SIGHTING_FLUSH_INTERVAL = 0.5  # 秒，背景執行緒批次寫入的間隔
+    SIGHTING_BATCH_SIZE = 5000  # 佇列累積到此筆數時立即寫入
+    SIGHTING_MAX_PENDING = 200000  # 佇列上限（筆），超過時丟棄最舊的事件，不讓記錄拖慢解析
+    
+    # 可疑行為評分設定
+    BOT_DWELL_SECONDS = 2 * 60 * 60  # 同一地圖連續停留超過此秒數記為可疑原因
+    BOT_STAGNANT_SECONDS = 4 * 60 * 60  # 在線累計超過此秒數等級未變記為可疑原因
+    BOT_REJOIN_SECONDS = 300  # 離開後在此秒數內重新出現記為一次快速重現
+    BOT_REJOIN_COUNT = 3  # 快速重現次數達此值記為可疑原因
+    BOT_REJOIN_HALF_LIFE = 60 * 60  # 秒，快速重現次數的衰減半衰期
+    BOT_FLAG_SCORE = 60  # 分數（0–100）達此值標記為可疑
+    BOT_SWEEP_INTERVAL = 5.0  # 秒，檢查在線玩家停留與停滯時間的間隔
+    BOT_STATE_TTL = 6 * 60 * 60  # 秒，離開超過此時間的玩家不再追蹤
+    BOT_MAX_TRACKED = 50000  # 追蹤玩家數上限，超過時先捨棄最早離開的玩家 
\ No newline at end of file
@@ -5,55 +5,322 @@
 
 import os
 import json
-import tkinter.messagebox as messagebox
+import marshal
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 from config import Config
+from name_index import NameIndex
+from settings import SettingsStore
+
+TRANSLATION_CACHE_VERSION = 1
+
+
+def _file_signature(path) -> Optional[Tuple[int, int]]:
+    """檔案的 (修改時間 ns, 大小)，無法取得時回傳 None"""
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError, ValueError):
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _pack_tables(mapping: Dict) -> Dict:
+    """將字串對照表轉為欄式格式（鍵與值各串成一個字串），載入時只需一次解碼與切割"""
+    packed = {}
+    for table, entries in mapping.items():
+        if (isinstance(entries, dict)
+                and all(isinstance(k, str) and isinstance(v, str) and '\0' not in k and '\0' not in v
+                        for k, v in entries.items())):
+            packed[table] = ('\0'.join(entries), '\0'.join(entries.values()), len(entries))
+        else:
+            packed[table] = (None, entries, 0)
+    return packed
+
+
+def _unpack_tables(packed: Dict) -> Dict:
+    """還原 _pack_tables 的欄式格式"""
+    mapping = {}
+    for table, (keys, values, count) in packed.items():
+        if keys is None:
+            mapping[table] = values
+        else:
+            mapping[table] = dict(zip(keys.split('\0'), values.split('\0'))) if count else {}
+    return mapping
+
+
+def load_translation_mapping(path: str) -> Dict[str, Dict[str, str]]:
+    """載入翻譯對照表，優先使用二進位快取
+    
+    快取（marshal 格式）記錄來源 JSON 的修改時間與大小，兩者都相符才使用；
+    JSON 變更後會重新解析並更新快取。快取無法讀寫時直接解析 JSON。
+    """
+    signature = _file_signature(path)
+    cache_path = f"{path}{Config.TRANSLATION_CACHE_SUFFIX}"
+    if signature is not None:
+        try:
+            with open(cache_path, 'rb') as f:
+                version, cached_signature, packed = marshal.loads(f.read())
+            if version == TRANSLATION_CACHE_VERSION and tuple(cached_signature) == signature:
+                return _unpack_tables(packed)
+        except Exception:
+            pass  # 快取不存在或已損毀
+    
+    with open(path, 'r', encoding='utf-8') as f:
+        mapping = json.load(f)
+    
+    if signature is not None and isinstance(mapping, dict):
+        try:
+            temp_path = f"{cache_path}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(marshal.dumps((TRANSLATION_CACHE_VERSION, signature, _pack_tables(mapping))))
+            os.replace(temp_path, cache_path)
+        except Exception as e:
+            print(f"寫入翻譯快取失敗: {e}")
+    return mapping
+
+
+class Vocabulary:
+    """韓文名稱的字典編碼表
+    
+    將名稱對應到從 0 起算的小整數代碼，未知名稱在執行期間動態配置代碼；
+    中文翻譯依代碼快取，只在顯示或匯出時才查詢。
+    
+    代碼一經配置就不能回收（Player 紀錄只存代碼），因此名稱總數超過 max_names 後，
+    新的未知名稱（通常是解析到的雜訊）一律對應到 OVERFLOW_NAME 的代碼並計入 overflow；
+    原始位元組的快取只是加速用，超過 raw_cache_size 筆時整個清空。
+    """
+    
+    OVERFLOW_NAME = '未知'
+    
+    def __init__(self, translate: Callable[[str], str], names: Iterable[str] = (),
+                 max_names: int = Config.VOCAB_MAX_NAMES, raw_cache_size: int = Config.VOCAB_RAW_CACHE_SIZE):
+        self._translate = translate
+        self._lock = threading.Lock()
+        self._codes: Dict[str, int] = {}
+        self._raw_codes: Dict[bytes, int] = {}
+        self.names: List[str] = []
+        self._translated: List[Optional[str]] = []
+        self.max_names = max_names
+        self.raw_cache_size = raw_cache_size
+        self.overflow = 0  # 超過上限而未配置代碼的名稱次數
+        self.refresh(names)
+    
+    def __len__(self) -> int:
+        return len(self.names)
+    
+    def encode(self, name: str) -> int:
+        """取得名稱的代碼（必要時配置新代碼）"""
+        code = self._codes.get(name)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(name)
+                if code is None:
+                    if len(self.names) >= self.max_names and name != self.OVERFLOW_NAME:
+                        self.overflow += 1
+                        return self._overflow_code()
+                    code = self._add(name)
+        return code
+    
+    def _add(self, name: str) -> int:
+        """配置新代碼（呼叫端需持有 _lock）"""
+        code = len(self.names)
+        self.names.append(name)
+        self._translated.append(None)
+        self._codes[name] = code
+        return code
+    
+    def _overflow_code(self) -> int:
+        """OVERFLOW_NAME 的代碼（呼叫端需持有 _lock；上限之外額外保留這一個）"""
+        code = self._codes.get(self.OVERFLOW_NAME)
+        return self._add(self.OVERFLOW_NAME) if code is None else code
+    
+    def encode_raw(self, raw: bytes) -> int:
+        """直接以封包中的原始位元組取得代碼，重複出現的名稱不需再解碼"""
+        raw_codes = self._raw_codes
+        code = raw_codes.get(raw)
+        if code is None:
+            code = self.encode(raw.decode('utf-8', 'ignore').strip())
+            if len(raw_codes) >= self.raw_cache_size:
+                # 空白變化與雜訊會讓不同位元組對應到同一代碼，快取清空後由 encode() 重建即可
+                raw_codes.clear()
+            raw_codes[raw] = code
+        return code
+    
+    def raw_lookup(self) -> Callable[[bytes], Optional[int]]:
+        """原始位元組快取的查詢函式，未命中時回傳 None（需改用 encode_raw）；
+        解析迴圈以它先查快取，每位玩家省下一次 Python 方法呼叫"""
+        return self._raw_codes.get
+    
+    def name(self, code: int) -> str:
+        """代碼對應的原始韓文名稱"""
+        return self.names[code]
+    
+    def translate(self, code: int) -> str:
+        """代碼對應的中文名稱（查詢結果會快取）"""
+        translated = self._translated
+        text = translated[code]
+        if text is None:
+            text = translated[code] = self._translate(self.names[code])
+        return text
+    
+    def refresh(self, names: Iterable[str] = ()) -> None:
+        """翻譯表變更時登錄新名稱並清除翻譯快取，既有代碼保持不變"""
+        with self._lock:
+            codes = self._codes
+            known = self.names
+            for name in names:
+                if name not in codes:
+                    codes[name] = len(known)
+                    known.append(name)
+            self._translated = [None] * len(known)
+
+
+class CodeBook:
+    """地圖與職業的代碼表"""
+    
+    def __init__(self, translate_map: Callable[[str], str], translate_job: Callable[[str], str]):
+        self.maps = Vocabulary(translate_map)
+        self.jobs = Vocabulary(translate_job)
 
 
 class DataManager:
     """處理資料載入、儲存和翻譯"""
     
-    def __init__(self):
-        self.job_map = {}
-        self.map_map = {}
+    def __init__(self, interactive: bool = True, settings_store: Optional[SettingsStore] = None):
+        self.interactive = interactive  # False 時不使用 tkinter 對話框（無介面模式）
+        # (職業對照, 地圖對照, 職業索引, 地圖索引)：放在同一個 tuple，重新載入時一次替換
+        self._tables = ({}, {}, NameIndex({}), NameIndex({}))
+        self.codebook = CodeBook(self.translate_map, self.translate_job)
+        self.translation_signature = None  # 目前載入的翻譯檔 (修改時間, 大小)
+        self.reloads = 0
+        self._reload_listeners: List[Callable[[], None]] = []
+        self._watch_stop = threading.Event()
+        self._watcher = None
+        # 使用者設定在第一次使用時才載入；重播、子行程等只需要翻譯的用途不會讀寫 user_config.json
+        self._settings_store = settings_store
         self.load_translation_data()
     
+    @property
+    def settings_store(self) -> SettingsStore:
+        if self._settings_store is None:
+            self._settings_store = SettingsStore()
+        return self._settings_store
+    
+    @property
+    def job_map(self) -> Dict[str, str]:
+        return self._tables[0]
+    
+    @job_map.setter
+    def job_map(self, mapping: Dict[str, str]):
+        self._swap_tables(mapping, self._tables[1])
+    
+    @property
+    def map_map(self) -> Dict[str, str]:
+        return self._tables[1]
+    
+    @map_map.setter
+    def map_map(self, mapping: Dict[str, str]):
+        self._swap_tables(self._tables[0], mapping)
+    
+    def _swap_tables(self, job_map: Dict[str, str], map_map: Dict[str, str]) -> None:
+        """替換對照表：新表與索引完整建好後才以單一參照指派，讀取端不會看到半成品"""
+        old = self._tables
+        job_index = old[2] if job_map is old[0] else NameIndex(job_map)
+        map_index = old[3] if map_map is old[1] else NameIndex(map_map)
+        self._tables = (job_map, map_map, job_index, map_index)
+        # 先替換再清除翻譯快取，之後的查詢都會使用新表
+        self.codebook.jobs.refresh(job_map)
+        self.codebook.maps.refresh(map_map)
+    
     def load_translation_data(self):
         """載入韓文-中文翻譯對照表"""
         try:
             if os.path.exists(Config.KOREAN_CHINESE_FILE):
-                with open(Config.KOREAN_CHINESE_FILE, 'r', encoding='utf-8') as f:
-                    mapping = json.load(f)
-                    self.job_map = mapping.get('職業對照', {})
-                    self.map_map = mapping.get('地圖對照', {})
-            else:
+                signature = _file_signature(Config.KOREAN_CHINESE_FILE)
+                mapping = load_translation_mapping(Config.KOREAN_CHINESE_FILE)
+                self._swap_tables(mapping.get('職業對照', {}), mapping.get('地圖對照', {}))
+                self.translation_signature = signature
+            elif self.interactive:
+                # 延遲匯入：無介面模式不載入 tkinter
+                from tkinter import messagebox
                 messagebox.showwarning("警告", f"找不到 {Config.KOREAN_CHINESE_FILE} 檔案，將使用原始韓文顯示")
+            else:
+                print(f"找不到 {Config.KOREAN_CHINESE_FILE} 檔案，將使用原始韓文顯示")
         except Exception as e:
             print(f"載入翻譯資料失敗: {e}")
     
-    def load_user_config(self) -> str:
-        """載入使用者配置"""
+    def check_translation_file(self) -> bool:
+        """翻譯檔變更時重新載入，回傳是否已重新載入
+        
+        解析在呼叫端執行緒進行；解析失敗（例如檔案寫到一半）時保留舊表，下次檢查再試。
+        """
+        signature = _file_signature(Config.KOREAN_CHINESE_FILE)
+        if signature is None or signature == self.translation_signature:
+            return False
+        
         try:
-            if os.path.exists(Config.USER_CONFIG_FILE):
-                with open(Config.USER_CONFIG_FILE, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    return config.get('last_character_name', '')
+            mapping = load_translation_mapping(Config.KOREAN_CHINESE_FILE)
         except Exception as e:
-            print(f"載入設定失敗: {e}")
-        return ''
+            print(f"重新載入翻譯資料失敗: {e}")
+            return False
+        
+        self._swap_tables(mapping.get('職業對照', {}), mapping.get('地圖對照', {}))
+        self.translation_signature = signature
+        self.reloads += 1
+        for listener in list(self._reload_listeners):
+            try:
+                listener()
+            except Exception as e:
+                print(f"翻譯表更新通知失敗: {e}")
+        return True
+    
+    def add_reload_listener(self, listener: Callable[[], None]) -> None:
+        """註冊翻譯表重新載入後的通知（在監看執行緒中呼叫）"""
+        self._reload_listeners.append(listener)
+    
+    def start_watching(self, interval: float = Config.TRANSLATION_POLL_INTERVAL) -> None:
+        """啟動背景執行緒定期檢查翻譯檔"""
+        if self._watcher and self._watcher.is_alive():
+            return
+        self._watch_stop.clear()
+        
+        def watch():
+            while not self._watch_stop.wait(interval):
+                self.check_translation_file()
+        
+        self._watcher = threading.Thread(target=watch, daemon=True)
+        self._watcher.start()
+    
+    def stop_watching(self) -> None:
+        """停止檢查翻譯檔"""
+        self._watch_stop.set()
+        if self._watcher:
+            self._watcher.join(1.0)
+            self._watcher = None
+    
+    def load_user_config(self) -> str:
+        """載入使用者配置（上次的角色名稱）"""
+        return self.settings_store.settings.last_character_name
     
     def save_user_config(self, character_name: str):
-        """儲存使用者配置"""
+        """儲存使用者配置（背景延遲寫入，不阻塞呼叫端）"""
         try:
-            config = {'last_character_name': character_name}
-            with open(Config.USER_CONFIG_FILE, 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=2)
-        except Exception as e:
+            self.settings_store.update(last_character_name=character_name)
+        except ValueError as e:
             print(f"儲存設定失敗: {e}")
     
     def translate_job(self, korean_job: str) -> str:
-        """翻譯韓文職業名稱為中文"""
-        return self.job_map.get(korean_job, korean_job)
+        """翻譯韓文職業名稱為中文（找不到時以正規化索引模糊查詢，仍找不到則保留韓文）"""
+        tables = self._tables
+        translated = tables[0].get(korean_job)
+        if translated is None:
+            translated = tables[2].lookup(korean_job)
+        return korean_job if translated is None else translated
     
     def translate_map(self, korean_map: str) -> str:
-        """翻譯韓文地圖名稱為中文"""
-        return self.map_map.get(korean_map, korean_map) 
\ No newline at end of file
+        """翻譯韓文地圖名稱為中文（找不到時以正規化索引模糊查詢，仍找不到則保留韓文）"""
+        tables = self._tables
+        translated = tables[1].get(korean_map)
+        if translated is None:
+            translated = tables[3].lookup(korean_map)
+        return korean_map if translated is None else translated 
\ No newline at end of file
@@ -0,0 +1,56 @@
+"""
+封包分類模組
+只檢查 TOZ 封包的長度、本體前綴與本體前段的少量特徵，決定封包類型，
+讓不相關的封包（聊天、移動等）不必解碼就能丟棄
+"""
+
+from typing import List, NamedTuple, Optional, Pattern
+
+FRAME_ROSTER = 'roster'
+
+
+class FrameRule(NamedTuple):
+    """封包類型的判斷規則"""
+    frame_type: str
+    prefix: bytes  # 本體（標頭之後）必須以此開頭，空字串表示不限
+    probe: Optional[Pattern]  # 封包中必須找得到的特徵（位元組正規表示式）
+    min_length: int  # 含標頭的最小封包長度
+    probe_window: int  # 特徵只在本體前這麼多位元組內搜尋（整段特徵需落在範圍內），0 表示整個封包
+
+
+class FrameClassifier:
+    """依序套用規則判斷封包類型，都不符合時回傳 None"""
+    
+    HEADER_SIZE = 8
+    
+    def __init__(self):
+        self.rules: List[FrameRule] = []
+    
+    def add_rule(self, frame_type: str, prefix: bytes = b'', probe: Optional[Pattern] = None,
+                 min_length: int = 0, first: bool = False, probe_window: int = 0) -> None:
+        """新增判斷規則；first=True 時優先於既有規則檢查
+        
+        probe_window 限制特徵的搜尋範圍，讓分類成本與封包大小無關；
+        不限制時，不符合的大封包要整段掃描，成本與直接解析相當。
+        """
+        rule = FrameRule(frame_type, prefix, probe, max(min_length, self.HEADER_SIZE + len(prefix)),
+                         probe_window)
+        if first:
+            self.rules.insert(0, rule)
+        else:
+            self.rules.append(rule)
+    
+    def classify(self, frame) -> Optional[str]:
+        """判斷一個完整封包（bytes 或 memoryview，含標頭）的類型"""
+        size = len(frame)
+        header = self.HEADER_SIZE
+        for frame_type, prefix, probe, min_length, probe_window in self.rules:
+            if size < min_length:
+                continue
+            if prefix and frame[header:header + len(prefix)] != prefix:
+                continue
+            if probe is not None and probe.search(frame, header,
+                                                  header + probe_window if probe_window else size) is None:
+                continue
+            return frame_type
+        return None 
\ No newline at end of file
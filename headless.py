@@ -0,0 +1,193 @@
+"""
+無介面監控模組
+不載入 tkinter、cv2 與 pygetwindow，直接串接擷取後端、PacketProcessor 與名單差異，
+將玩家事件以 JSONL 輸出到標準輸出或檔案，適合沒有桌面環境的 Linux 擷取主機
+    
+    python main.py --headless --output events.jsonl
+    python main.py --headless --pcap capture.pcapng   # 以擷取檔代替即時擷取
+    python main.py --headless --db sightings.db       # 同時寫入出現紀錄資料庫
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import signal
+import sys
+import time
+from typing import Dict, Optional, TextIO
+from async_monitor import AsyncPlayerMonitor, MonitorEvent
+from bot_score import BotScore, BotScorer
+from config import Config
+from data_manager import DataManager
+from packet_processor import PacketProcessor
+from sighting_store import SightingStore
+
+
+def event_record(event: MonitorEvent) -> Dict:
+    """事件轉為 JSONL 的一筆紀錄"""
+    record = {'ts': event.timestamp, 'event': event.kind}
+    record.update(event.player.to_dict())
+    if event.previous is not None:
+        record['previous'] = event.previous.to_dict()
+    return record
+
+
+def score_record(timestamp: float, result: BotScore) -> Dict:
+    """可疑度標記改變轉為 JSONL 的一筆紀錄"""
+    record = {'ts': timestamp, 'event': 'bot_score'}
+    record.update(result.to_dict())
+    return record
+
+
+def _write_scores(output: TextIO, results, timestamp: float) -> None:
+    for result in results:
+        output.write(json.dumps(score_record(timestamp, result), ensure_ascii=False) + '\n')
+
+
+class StreamClock:
+    """事件串流的時間：最近一筆事件的時間戳記加上之後經過的真實時間
+    
+    重播擷取檔時事件時間是擷取當時的時間，定時評分也要使用同一個時間基準。
+    """
+    
+    def __init__(self):
+        self.offset = 0.0
+    
+    def sync(self, timestamp: float) -> None:
+        self.offset = timestamp - time.time()
+    
+    def now(self) -> float:
+        return time.time() + self.offset
+
+
+def _install_signal_handlers(loop: asyncio.AbstractEventLoop, stop: asyncio.Event) -> None:
+    """SIGTERM / SIGINT 時設定 stop，讓主循環正常收尾"""
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            # Windows 的事件迴圈不支援 add_signal_handler
+            signal.signal(sig, lambda *_: loop.call_soon_threadsafe(stop.set))
+
+
+async def _write_events(monitor: AsyncPlayerMonitor, output: TextIO,
+                        sightings: Optional[SightingStore] = None, scorer: Optional[BotScorer] = None,
+                        clock: Optional[StreamClock] = None) -> None:
+    """將事件逐筆寫出；佇列暫時清空時才評分並 flush，避免每筆事件都做系統呼叫"""
+    pending = []
+    async for event in monitor.events():
+        if sightings:
+            sightings.record((event,), event.timestamp)
+        output.write(json.dumps(event_record(event), ensure_ascii=False) + '\n')
+        if scorer:
+            pending.append(event)
+        if monitor.event_queue.empty():
+            if pending:
+                # 一批（通常是同一份名單的）事件一起評分
+                _write_scores(output, scorer.update(pending, event.timestamp), event.timestamp)
+                pending = []
+            if clock:
+                clock.sync(event.timestamp)
+            output.flush()
+    output.flush()
+
+
+async def _tick_scores(scorer: BotScorer, output: TextIO, clock: StreamClock,
+                       interval: float = Config.BOT_SWEEP_INTERVAL) -> None:
+    """定時評分：頻道安靜、沒有任何事件時，停留與停滯時間仍會持續累積"""
+    while True:
+        await asyncio.sleep(interval)
+        now = clock.now()
+        results = scorer.update((), now)
+        if results:
+            _write_scores(output, results, now)
+            output.flush()
+
+
+async def run(data_manager: DataManager, output: TextIO, port: int, iface: Optional[str] = None,
+              backend: str = 'auto', pcap: Optional[str] = None, speed: Optional[float] = None,
+              sightings: Optional[SightingStore] = None) -> Dict:
+    """執行監控直到收到 SIGTERM / SIGINT（或擷取檔播放完畢），回傳統計；擷取失敗時統計含 error"""
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    errors = []
+    _install_signal_handlers(loop, stop)
+    
+    async with AsyncPlayerMonitor(PacketProcessor(data_manager)) as monitor:
+        if pcap:
+            source = loop.create_task(monitor.replay_pcap(pcap, port, speed))
+        else:
+            source = loop.create_task(monitor.run_capture(backend, iface, port))
+        
+        def source_done(task: asyncio.Task) -> None:
+            # 擷取檔播完時由事件寫出端收尾；即時擷取結束或任何失敗則直接停止
+            if task.cancelled():
+                return
+            if task.exception() is not None:
+                errors.append(f"擷取失敗: {task.exception()}")
+                stop.set()
+            elif not pcap:
+                stop.set()
+        
+        source.add_done_callback(source_done)
+        scorer = BotScorer()
+        clock = StreamClock()
+        writer = loop.create_task(_write_events(monitor, output, sightings, scorer, clock))
+        ticker = loop.create_task(_tick_scores(scorer, output, clock))
+        stopper = loop.create_task(stop.wait())
+        
+        await asyncio.wait({writer, stopper}, return_when=asyncio.FIRST_COMPLETED)
+        for task in (source, writer, ticker, stopper):
+            task.cancel()
+        await asyncio.gather(source, writer, ticker, stopper, return_exceptions=True)
+        output.flush()
+        stats = monitor.stats()
+        if errors:
+            stats['error'] = errors[0]
+        return stats
+
+
+def main(argv=None) -> int:
+    """無介面模式進入點"""
+    events_out = sys.stdout
+    # 其他模組的 print 訊息改到標準錯誤，標準輸出只留給事件串流
+    with contextlib.redirect_stdout(sys.stderr):
+        data_manager = DataManager(interactive=False)
+        settings = data_manager.settings_store.settings
+        
+        parser = argparse.ArgumentParser(description="無介面玩家監控：以 JSONL 輸出名單變動事件")
+        parser.add_argument('--output', '-o', default='-', help="JSONL 輸出檔（預設為標準輸出）")
+        parser.add_argument('--port', type=int, default=settings.port, help="遊戲伺服器 TCP 埠")
+        parser.add_argument('--iface', default=settings.iface or None, help="擷取的網卡名稱")
+        parser.add_argument('--backend', default=settings.capture_backend,
+                            help="擷取後端：auto / af_packet / scapy")
+        parser.add_argument('--pcap', default=None, help="以 pcap/pcapng 檔代替即時擷取")
+        parser.add_argument('--speed', type=float, default=None,
+                            help="擷取檔以 N 倍真實時間播放（預設全速）")
+        parser.add_argument('--db', default=None, help="同時將事件寫入此 SQLite 出現紀錄資料庫")
+        args = parser.parse_args(argv)
+        
+        output = events_out if args.output == '-' else open(args.output, 'a', encoding='utf-8')
+        sightings = SightingStore(args.db) if args.db else None
+        data_manager.start_watching()
+        try:
+            stats = asyncio.run(run(data_manager, output, args.port, args.iface,
+                                    args.backend, args.pcap, args.speed, sightings))
+        finally:
+            data_manager.stop_watching()
+            if sightings:
+                sightings.close()
+            if output is not events_out:
+                output.close()
+        
+        if sightings:
+            stats.update(sightings.stats())
+        
+        # 統計寫到標準錯誤，不混入事件串流
+        print(json.dumps(stats, ensure_ascii=False))
+    return 1 if 'error' in stats else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main()) 
\ No newline at end of file
@@ -1,13 +1,23 @@
 """
 主程式入口檔案
 同地圖玩家查找器 + 視窗錄影工具
+加上 --headless 參數時改為無介面監控（見 headless.py）
 """
 
+import sys
+
+if __name__ == '__main__' and '--headless' in sys.argv[1:]:
+    # 無介面模式在匯入 tkinter 之前分流，不載入任何介面與錄影模組
+    from headless import main as headless_main
+    sys.exit(headless_main([arg for arg in sys.argv[1:] if arg != '--headless']))
+
+import multiprocessing
 import tkinter as tk
 from tkinter import ttk
 from config import Config
 from data_manager import DataManager
 from packet_processor import PacketProcessor
+from settings import SettingsStore
 from ui import PlayerMonitorTab, RecordingTab
 
 
@@ -20,7 +30,8 @@ class ArtaleApplication(tk.Tk):
         self.geometry(Config.WINDOW_SIZE)
         
         # 初始化核心元件
-        self.data_manager = DataManager()
+        self.data_manager = DataManager(settings_store=SettingsStore())
+        self.data_manager.start_watching()  # 翻譯檔變更時自動重新載入
         self.packet_processor = PacketProcessor(self.data_manager)
         
         # 創建UI
@@ -40,17 +51,21 @@ class ArtaleApplication(tk.Tk):
         # 視頻錄製頁籤
         record_frame = ttk.Frame(notebook)
         notebook.add(record_frame, text=Config.RECORDING_TAB_TITLE)
-        self.recording_tab = RecordingTab(record_frame)
+        self.recording_tab = RecordingTab(record_frame, self.data_manager.settings_store)
+        self.player_tab.recording_active = lambda: self.recording_tab.recorder.recording
     
     def on_closing(self):
         """處理應用程式關閉"""
         self.player_tab.cleanup()
         self.recording_tab.cleanup()
+        self.data_manager.stop_watching()
+        self.data_manager.settings_store.close()  # 寫入尚未儲存的設定
         self.destroy()
 
 
 def main():
     """主函數"""
+    multiprocessing.freeze_support()  # 打包成執行檔時，解析子行程需要
     app = ArtaleApplication()
     app.protocol("WM_DELETE_WINDOW", app.on_closing)
     app.mainloop()
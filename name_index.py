@@ -0,0 +1,116 @@
+"""
+名稱正規化索引模組
+地圖與職業名稱的模糊查詢：NFKC 正規化、去除空白、數字統一為半形，
+找不到完全相同的名稱時，再以前綴（名稱多了短後綴）與編輯距離找候選
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from config import Config
+
+_DIGIT = re.compile(r'\d')
+_DIGITS = re.compile(r'\d+')
+_NON_ASCII_DIGIT = re.compile(r'(?![0-9])\d')
+
+
+def normalize_name(name: str) -> str:
+    """正規化名稱：NFKC、去除所有空白、Unicode 數字轉為 ASCII、忽略大小寫"""
+    text = name if unicodedata.is_normalized('NFKC', name) else unicodedata.normalize('NFKC', name)
+    text = ''.join(text.split())
+    if _NON_ASCII_DIGIT.search(text):
+        text = _DIGIT.sub(lambda m: str(unicodedata.decimal(m.group(), 0)), text)
+    return text.casefold()
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein 距離；超過 limit 時提早結束並回傳 limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class NameIndex:
+    """對照表的正規化索引
+    
+    查詢順序：正規化後完全相同 → 最長的已知名稱前綴（剩餘後綴不超過 max_suffix 字
+    且不含文字，只有數字或符號，翻譯結果附上該後綴）→ 同前綴分桶內、數字相同且編輯距離不超過 max_distance 的名稱。
+    結果（包含找不到）以有上限的 LRU 快取記住，同一名稱之後只需一次快取查詢。
+    """
+    
+    BUCKET_PREFIX = 2  # 編輯距離候選依正規化名稱的前幾個字分桶
+    MIN_FUZZY_LENGTH = 4  # 正規化後至少這麼長才做編輯距離比對
+    
+    def __init__(self, mapping: Dict[str, str], cache_size: int = Config.FUZZY_CACHE_SIZE,
+                 max_suffix: int = Config.FUZZY_MAX_SUFFIX,
+                 max_distance: int = Config.FUZZY_MAX_DISTANCE):
+        self.max_suffix = max_suffix
+        self.max_distance = max_distance
+        normalized: Dict[str, str] = {}
+        for name, translated in mapping.items():
+            key = normalize_name(name)
+            if key and key not in normalized:
+                normalized[key] = translated
+        
+        buckets: Dict[str, List[Tuple[str, str]]] = {}
+        prefix = self.BUCKET_PREFIX
+        for key, translated in normalized.items():
+            bucket = buckets.get(key[:prefix])
+            if bucket is None:
+                buckets[key[:prefix]] = [(key, translated)]
+            else:
+                bucket.append((key, translated))
+        
+        self.normalized = normalized
+        self.buckets = buckets
+        self.lengths = sorted(set(map(len, normalized)), reverse=True)
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+    
+    def __len__(self) -> int:
+        return len(self.normalized)
+    
+    def _lookup(self, name: str) -> Optional[str]:
+        """找出最接近的翻譯，沒有可信的候選時回傳 None"""
+        key = normalize_name(name)
+        if not key:
+            return None
+        
+        translated = self.normalized.get(key)
+        if translated is not None:
+            return translated
+        
+        # 已知名稱後面多了數字或符號後綴（例如「…森林 2」、「…(1)」）
+        for length in self.lengths:
+            suffix = len(key) - length
+            if suffix > self.max_suffix:
+                break
+            if suffix <= 0:
+                continue
+            rest = key[length:]
+            if any(c.isalpha() for c in rest):
+                continue
+            translated = self.normalized.get(key[:length])
+            if translated is not None:
+                return translated + rest
+        
+        # 拼寫略有差異；太短的名稱或數字不同（通常是不同地圖）不做模糊比對
+        if len(key) < self.MIN_FUZZY_LENGTH:
+            return None
+        digits = _DIGITS.findall(key)
+        best, best_distance = None, self.max_distance + 1
+        for candidate, translated in self.buckets.get(key[:self.BUCKET_PREFIX], ()):
+            if _DIGITS.findall(candidate) != digits:
+                continue
+            distance = edit_distance(key, candidate, self.max_distance)
+            if distance < best_distance:
+                best, best_distance = translated, distance
+        return best 
\ No newline at end of file
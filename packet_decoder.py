@@ -0,0 +1,116 @@
+"""
+封包標頭解析模組
+直接解析鏈路層、IPv4/IPv6 與 TCP 標頭，不經過 scapy 的完整解析
+"""
+
+import socket
+from typing import NamedTuple, Optional
+from tcp_stream import FlowKey
+
+# 鏈路層類型（pcap LINKTYPE_*）
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_LINUX_SLL2 = 276
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+
+# TCP 旗標
+TCP_FIN = 0x01
+TCP_SYN = 0x02
+TCP_RST = 0x04
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86DD
+ETHERTYPE_VLAN = (0x8100, 0x88A8)
+
+IPV6_EXTENSION_HEADERS = (0, 43, 60)  # 不含分段標頭 (44)
+IPPROTO_TCP = 6
+
+
+class TcpSegment(NamedTuple):
+    """解析後的 TCP 資料段"""
+    flow_key: FlowKey
+    seq: int
+    flags: int
+    payload: memoryview
+
+
+def decode_frame(linktype: int, frame) -> Optional[TcpSegment]:
+    """解析一個鏈路層封包，非 TCP 封包回傳 None"""
+    view = memoryview(frame)
+    try:
+        if linktype == LINKTYPE_ETHERNET:
+            if len(view) < 14:
+                return None
+            ethertype = int.from_bytes(view[12:14], 'big')
+            offset = 14
+            while ethertype in ETHERTYPE_VLAN and len(view) >= offset + 4:
+                ethertype = int.from_bytes(view[offset+2:offset+4], 'big')
+                offset += 4
+            return decode_ip(view[offset:], ethertype)
+        if linktype == LINKTYPE_LINUX_SLL:
+            if len(view) < 16:
+                return None
+            return decode_ip(view[16:], int.from_bytes(view[14:16], 'big'))
+        if linktype == LINKTYPE_LINUX_SLL2:
+            if len(view) < 20:
+                return None
+            return decode_ip(view[20:], int.from_bytes(view[0:2], 'big'))
+        if linktype == LINKTYPE_NULL:
+            return decode_ip(view[4:], None)
+        if linktype in (LINKTYPE_RAW, LINKTYPE_IPV4, LINKTYPE_IPV6):
+            return decode_ip(view, None)
+    except (IndexError, ValueError, OSError):
+        pass
+    return None
+
+
+def decode_ip(view: memoryview, ethertype: Optional[int]) -> Optional[TcpSegment]:
+    """解析 IPv4/IPv6 標頭（ethertype 為 None 時依版本欄位判斷）"""
+    if len(view) < 20:
+        return None
+    
+    version = view[0] >> 4
+    if version == 4 and ethertype in (None, ETHERTYPE_IPV4):
+        header_len = (view[0] & 0x0F) * 4
+        total_len = int.from_bytes(view[2:4], 'big')
+        # 分段的 IP 封包（非第一段）不含 TCP 標頭
+        if view[9] != IPPROTO_TCP or int.from_bytes(view[6:8], 'big') & 0x1FFF:
+            return None
+        src = socket.inet_ntoa(view[12:16])
+        dst = socket.inet_ntoa(view[16:20])
+        # 依總長度截斷，去除乙太網路補齊的位元組（TSO 擷取時總長度可能為 0）
+        end = total_len if total_len >= header_len else len(view)
+        return decode_tcp(view[header_len:end], src, dst)
+    
+    if version == 6 and ethertype in (None, ETHERTYPE_IPV6):
+        if len(view) < 40:
+            return None
+        payload_len = int.from_bytes(view[4:6], 'big')
+        next_header = view[6]
+        src = socket.inet_ntop(socket.AF_INET6, view[8:24])
+        dst = socket.inet_ntop(socket.AF_INET6, view[24:40])
+        payload = view[40:40+payload_len]
+        while next_header in IPV6_EXTENSION_HEADERS and len(payload) >= 8:
+            next_header, ext_len = payload[0], (payload[1] + 1) * 8
+            payload = payload[ext_len:]
+        if next_header != IPPROTO_TCP:
+            return None
+        return decode_tcp(payload, src, dst)
+    
+    return None
+
+
+def decode_tcp(view: memoryview, src: str, dst: str) -> Optional[TcpSegment]:
+    """解析 TCP 標頭，回傳資料段（payload 為原始資料的 memoryview）"""
+    if len(view) < 20:
+        return None
+    sport = int.from_bytes(view[0:2], 'big')
+    dport = int.from_bytes(view[2:4], 'big')
+    seq = int.from_bytes(view[4:8], 'big')
+    data_offset = (view[12] >> 4) * 4
+    if data_offset < 20 or data_offset > len(view):
+        return None
+    return TcpSegment((src, sport, dst, dport), seq, view[13], view[data_offset:]) 
\ No newline at end of file
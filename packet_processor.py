@@ -3,75 +3,361 @@
 處理網路封包解析和玩家資訊提取
 """
 
+import hashlib
 import re
-from typing import List, Dict
+import time
+from typing import Callable, Dict, List, Optional, Pattern, Tuple
+from config import Config
 from data_manager import DataManager
+from frame_dispatch import FRAME_ROSTER, FrameClassifier
+from player import Player
+from profiling import StageProfiler
+from tcp_stream import FlowKey, FlowTable
 
+# 名單紀錄：17 位數字後接 `/欄位0/ID/暱稱#ID/地圖/欄位4/等級/職業`
+# 欄位以零寬度前瞻擷取，比對只消耗 17 位數字，與逐一切割字串的舊解析器結果一致；
+# 前瞻不成立時以空分支仍消耗這 17 位數字（group 為 None）
+ROSTER_PATTERN = re.compile(
+    rb'\d{17}'
+    rb'(?:(?=/*(?!/)[^/]*/([^/]*)/([^/#]*)#([^/]*)/([^/]*)/[^/]*/([^/]*)/([^/]*))|)'
+)
 
-class PacketProcessor:
-    """處理網路封包解析"""
+# 名單封包的必要特徵：至少一筆紀錄的 `17 位數字/.../ID/暱稱#` 前段。
+# 名單的第一筆紀錄緊接在本體開頭，只在前 Config.ROSTER_PROBE_WINDOW 位元組內尋找，
+# 找不到時視為其他封包直接丟棄，大型的非名單封包不必整段掃描
+ROSTER_PROBE = re.compile(rb'\d{17}/*(?!/)[^/]*/[^/]*/[^/#]*#')
+ROSTER_MIN_LENGTH = 8 + 17 + 7  # 標頭 + ID + 紀錄中的 7 個分隔符號
+
+
+class FrameBuffer:
+    """TOZ 封包重組緩衝區
     
-    def __init__(self, data_manager: DataManager):
-        self.data_manager = data_manager
-        self.data_buffer = b''
+    以可成長的 bytearray 原地追加資料，消費封包時只推進讀取位移，
+    已消費的前段資料累積到一定份量後才壓縮一次。
     
-    def process_packet_data(self, packet_data: bytes) -> List[Dict]:
-        """處理封包資料並提取玩家資訊"""
-        self.data_buffer += packet_data
-        players = []
+    掃描是增量的：記住上次搜尋標頭停下的位置與目前未完成封包的起點／終點，
+    每個位元組只被搜尋一次；標頭之前的雜訊直接視為已消費。
+    
+    標頭宣告的長度超過 max_frame_length 時，視為誤判或損毀的標頭：
+    從該標頭的下一個位元組重新同步到下一個標頭，其間的資料丟棄。
+    長度合法的封包在累積到 max_frame_length + HEADER_SIZE 位元組時一定已經收齊並被消費，
+    因此未消費的資料不會超過這個大小（加上最後一次追加的資料段），長時間執行時記憶體用量維持固定。
+    """
+    
+    MAGIC = b'TOZ '
+    HEADER_SIZE = 8
+    COMPACT_THRESHOLD = 64 * 1024  # 已消費資料超過此大小才考慮壓縮
+    
+    def __init__(self, max_frame_length: int = Config.MAX_FRAME_LENGTH):
+        self.max_frame_length = max_frame_length
+        self.data = bytearray()
+        self.read_offset = 0
+        self.scan_offset = 0  # 下次搜尋標頭的起點
+        self.frame_start = -1  # 未完成封包的起點（-1 表示尚未找到標頭）
+        self.frame_end = -1  # 未完成封包的終點（-1 表示標頭尚未收齊）
+        self.bytes_copied = 0  # 追加與壓縮時實際搬移的位元組數
+        self.bytes_scanned = 0  # 搜尋標頭時檢查過的位元組數
+        self.garbage_dropped = 0  # 標頭之前（含重新同步時）被丟棄的位元組數
+        self.resyncs = 0  # 放棄目前標頭、重新同步的次數
+        self.oversized_headers = 0  # 宣告長度超過上限的標頭數
+        self.last_roster_digest: Optional[bytes] = None  # 此連線上一份名單的雜湊
+    
+    def __len__(self) -> int:
+        return len(self.data) - self.read_offset
+    
+    def append(self, packet_data) -> None:
+        """原地追加一段 TCP 資料"""
+        self.data += packet_data
+        self.bytes_copied += len(packet_data)
+    
+    def next_frame(self) -> Optional[Tuple[int, int]]:
+        """找出下一個完整封包，回傳 (起點, 終點) 並推進讀取位移"""
+        data = self.data
+        size = len(data)
         
         while True:
-            start = self.data_buffer.find(b'TOZ ')
-            if start < 0 or len(self.data_buffer) < start + 8:
-                break
+            start = self.frame_start
+            if start < 0:
+                scan = self.scan_offset
+                start = data.find(self.MAGIC, scan)
+                if start < 0:
+                    # 保留結尾可能是半個標頭的位元組，其餘都是雜訊
+                    keep = max(scan, size - len(self.MAGIC) + 1)
+                    self.bytes_scanned += size - scan
+                    self.garbage_dropped += keep - self.read_offset
+                    self.scan_offset = self.read_offset = keep
+                    return None
+                
+                self.bytes_scanned += start + len(self.MAGIC) - scan
+                self.garbage_dropped += start - self.read_offset
+                self.frame_start = self.read_offset = start
             
-            length = int.from_bytes(self.data_buffer[start+4:start+8], 'little')
-            if len(self.data_buffer) < start + 8 + length:
-                break
+            end = self.frame_end
+            if end < 0:
+                if size < start + self.HEADER_SIZE:
+                    return None
+                length = int.from_bytes(data[start+4:start+8], 'little')
+                if length > self.max_frame_length:
+                    self.oversized_headers += 1
+                    self._resync(start)
+                    continue
+                end = self.frame_end = start + self.HEADER_SIZE + length
             
-            pkt_bytes = self.data_buffer[start:start+8+length]
-            self.data_buffer = self.data_buffer[start+8+length:]
+            if size < end:
+                return None
             
-            extracted_players = self._extract_channel_players(pkt_bytes)
-            if extracted_players:
-                players.extend(extracted_players)
+            self.read_offset = self.scan_offset = end
+            self.frame_start = self.frame_end = -1
+            return start, end
+    
+    def _resync(self, start: int) -> None:
+        """放棄 start 處的標頭，從下一個位元組重新搜尋；到下一個標頭之前的資料計入雜訊"""
+        self.resyncs += 1
+        self.read_offset = start
+        self.scan_offset = start + 1
+        self.frame_start = self.frame_end = -1
+    
+    def compact(self) -> None:
+        """丟棄已消費的前段資料（僅在必要時）"""
+        offset = self.read_offset
+        if offset == 0:
+            return
+        
+        if offset == len(self.data):
+            self.data.clear()
+            self.read_offset = self.scan_offset = 0
+        elif offset >= self.COMPACT_THRESHOLD and offset * 2 >= len(self.data):
+            self.bytes_copied += len(self.data) - offset
+            del self.data[:offset]
+            self.read_offset = 0
+            self.scan_offset -= offset
+            if self.frame_start >= 0:
+                self.frame_start -= offset
+            if self.frame_end >= 0:
+                self.frame_end -= offset
+    
+    def reset(self) -> None:
+        """清空緩衝區（串流出現無法還原的缺口時使用）"""
+        self.data.clear()
+        self.read_offset = 0
+        self.scan_offset = 0
+        self.frame_start = self.frame_end = -1
+        self.last_roster_digest = None
+    
+    def pending(self) -> bytes:
+        """回傳尚未消費的資料副本（除錯用）"""
+        return bytes(self.data[self.read_offset:])
+
+
+class PacketProcessor:
+    """處理網路封包解析"""
+    
+    def __init__(self, data_manager: DataManager):
+        self.data_manager = data_manager
+        self.frame_buffer = FrameBuffer()
+        self.flows = FlowTable(FrameBuffer, Config.FLOW_IDLE_TIMEOUT)
+        self.frames_processed = 0
+        self.frames_dropped = 0  # 無法分類而未解碼的封包數
+        self.frame_counts: Dict[str, int] = {}
+        
+        # 名單去重：與同一連線上一份名單位元組完全相同時跳過解析
+        self.dedupe_rosters = Config.ROSTER_DEDUPE
+        self.dedupe_hits = 0  # 因內容相同而跳過的名單封包數
+        self.dedupe_bytes_skipped = 0  # 跳過解析的名單位元組數
+        
+        # 緩衝區保護：所有連線累計
+        self.resyncs = 0
+        self.oversized_headers = 0
+        self.bytes_discarded = 0  # 標頭前的雜訊與重新同步時丟棄的位元組數
+        
+        self.classifier = FrameClassifier()
+        self.classifier.add_rule(FRAME_ROSTER, probe=ROSTER_PROBE, min_length=ROSTER_MIN_LENGTH,
+                                 probe_window=Config.ROSTER_PROBE_WINDOW)
+        self.frame_handlers: Dict[str, Callable] = {FRAME_ROSTER: self._extract_channel_players}
+        
+        # 常駐的各階段耗時統計
+        self.profiler = StageProfiler()
+        self._buffer_stage = self.profiler.stage('buffer')
+        self._scan_stage = self.profiler.stage('scan')
+        self._classify_stage = self.profiler.stage('classify')
+        self._dedupe_stage = self.profiler.stage('dedupe')
+        self._compact_stage = self.profiler.stage('compact')
+        self._parse_stages = {}
+    
+    def register_handler(self, frame_type: str, handler: Callable, prefix: bytes = b'',
+                         probe: Optional[Pattern] = None, min_length: int = 0) -> None:
+        """註冊封包類型與處理函式
         
+        新類型的規則優先於名單規則檢查。處理函式收到整個封包的 memoryview
+        （呼叫結束後即失效，需要保留時請自行複製），回傳的玩家列表會併入輸出。
+        只更換既有類型的處理函式時不必提供規則。
+        """
+        if frame_type not in self.frame_handlers or prefix or probe is not None or min_length:
+            self.classifier.add_rule(frame_type, prefix, probe, min_length, first=True)
+        self.frame_handlers[frame_type] = handler
+    
+    @property
+    def data_buffer(self) -> bytes:
+        """尚未處理完的資料"""
+        return self.frame_buffer.pending()
+    
+    def process_packet_data(self, packet_data: bytes) -> List[Player]:
+        """處理封包資料並提取玩家資訊（單一串流，不檢查序號）"""
+        start = time.perf_counter()
+        self.frame_buffer.append(packet_data)
+        self._buffer_stage.record(time.perf_counter() - start)
+        return self._drain_frames(self.frame_buffer)
+    
+    def process_segment(self, flow_key: FlowKey, seq: int, payload: bytes,
+                        timestamp: Optional[float] = None,
+                        syn: bool = False, fin: bool = False) -> List[Player]:
+        """依連線與序號重組 TCP 資料段並提取玩家資訊"""
+        start = time.perf_counter()
+        now = time.time() if timestamp is None else timestamp
+        self.flows.evict_idle(now)
+        
+        stream = self.flows.get(flow_key, now)
+        chunks = stream.add_segment(seq, payload, syn)
+        for chunk in chunks:
+            stream.frame_buffer.append(chunk)
+        self._buffer_stage.record(time.perf_counter() - start)
+        players = self._drain_frames(stream.frame_buffer) if chunks else []
+        
+        if fin:
+            self.flows.remove(flow_key)
         return players
     
-    def _extract_channel_players(self, pkt_bytes: bytes) -> List[Dict]:
-        """從封包位元組中提取玩家資訊"""
-        if len(pkt_bytes) < 8:
-            return []
+    def _drain_frames(self, buffer: FrameBuffer) -> List[Player]:
+        """解析緩衝區內所有完整的封包"""
+        players = []
+        classify = self.classifier.classify
+        handlers = self.frame_handlers
+        counts = self.frame_counts
+        clock = time.perf_counter
+        
+        resyncs = buffer.resyncs
+        oversized = buffer.oversized_headers
+        discarded = buffer.garbage_dropped
         
+        # 封包以 memoryview 切片交給解析器，不另外複製；
+        # 所有 view 必須在壓縮（調整 bytearray 大小）之前釋放
+        view = memoryview(buffer.data)
         try:
-            text = pkt_bytes[8:].decode('utf-8', errors='ignore')
-        except:
+            while True:
+                t0 = clock()
+                span = buffer.next_frame()
+                t1 = clock()
+                self._scan_stage.record(t1 - t0)
+                if span is None:
+                    break
+                
+                self.frames_processed += 1
+                with view[span[0]:span[1]] as pkt_view:
+                    frame_type = classify(pkt_view)
+                    t2 = clock()
+                    self._classify_stage.record(t2 - t1)
+                    if frame_type is None:
+                        self.frames_dropped += 1
+                        continue
+                    
+                    counts[frame_type] = counts.get(frame_type, 0) + 1
+                    if frame_type == FRAME_ROSTER and self.dedupe_rosters:
+                        digest = hashlib.blake2b(pkt_view, digest_size=16).digest()
+                        duplicate = digest == buffer.last_roster_digest
+                        buffer.last_roster_digest = digest
+                        t3 = clock()
+                        self._dedupe_stage.record(t3 - t2)
+                        if duplicate:
+                            self.dedupe_hits += 1
+                            self.dedupe_bytes_skipped += len(pkt_view)
+                            continue
+                        t2 = t3
+                    
+                    extracted_players = handlers[frame_type](pkt_view)
+                    self._parse_stage(frame_type).record(clock() - t2)
+                if extracted_players:
+                    players.extend(extracted_players)
+        finally:
+            view.release()
+        
+        self.resyncs += buffer.resyncs - resyncs
+        self.oversized_headers += buffer.oversized_headers - oversized
+        self.bytes_discarded += buffer.garbage_dropped - discarded
+        
+        t0 = clock()
+        buffer.compact()
+        self._compact_stage.record(clock() - t0)
+        return players
+    
+    def _parse_stage(self, frame_type: str):
+        """各封包類型處理函式的耗時直方圖"""
+        histogram = self._parse_stages.get(frame_type)
+        if histogram is None:
+            histogram = self._parse_stages[frame_type] = self.profiler.stage(f'parse:{frame_type}')
+        return histogram
+    
+    def stats(self) -> Dict[str, Dict]:
+        """處理統計快照：計數器與各階段耗時"""
+        counters = {
+            'frames_processed': self.frames_processed,
+            'frames_dropped': self.frames_dropped,
+            'dedupe_hits': self.dedupe_hits,
+            'dedupe_bytes_skipped': self.dedupe_bytes_skipped,
+            'resyncs': self.resyncs,
+            'oversized_headers': self.oversized_headers,
+            'bytes_discarded': self.bytes_discarded,
+            'flows': len(self.flows.flows),
+            'flows_evicted': self.flows.evicted,
+        }
+        counters.update(('frames:' + name, count) for name, count in self.frame_counts.items())
+        snapshot = self.profiler.snapshot()
+        snapshot['counters'].update(counters)
+        return snapshot
+    
+    def _extract_channel_players(self, pkt_bytes) -> List[Player]:
+        """從封包位元組中提取玩家資訊（直接掃描位元組，只解碼保留的欄位）"""
+        if len(pkt_bytes) < 8:
             return []
         
+        codebook = self.data_manager.codebook
+        encode_map = codebook.maps.encode_raw
+        encode_job = codebook.jobs.encode_raw
+        lookup_map = codebook.maps.raw_lookup()
+        lookup_job = codebook.jobs.raw_lookup()
+        new_player = tuple.__new__  # 略過 NamedTuple 以 Python 實作的 __new__
         players = []
-        for m in re.finditer(r'(\d{17})', text):
-            rest = text[m.end(1):].lstrip('/')
-            parts = rest.split('/')
-            if len(parts) < 7 or '#' not in parts[2]:
-                continue
-            
-            id1, nick2 = parts[1], parts[2]
-            nick, id2 = nick2.split('#', 1)
-            if id1 != id2:
+        for m in ROSTER_PATTERN.finditer(pkt_bytes, 8):
+            id1, nick, id2 = m.group(1, 2, 3)
+            if nick is None or id1 != id2:
                 continue
             
-            kr_map = parts[3].strip()
-            zh_map = self.data_manager.translate_map(kr_map)
+            kr_map, level_raw, kr_job = m.group(4, 5, 6)
+            try:
+                level = int(level_raw)
+            except ValueError:
+                level = 0
+            level_text = None
+            if b'%d' % level != level_raw:
+                # 空白、非數字或非標準寫法：保留舊版 dict 介面的等級原文
+                level_text = level_raw.decode('utf-8', 'ignore').strip()
+                if level_text == str(level):
+                    level_text = None
             
-            kr_job = parts[6].strip()
-            zh_job = self.data_manager.translate_job(kr_job)
+            map_code = lookup_map(kr_map)
+            if map_code is None:
+                map_code = encode_map(kr_map)
+            job_code = lookup_job(kr_job)
+            if job_code is None:
+                job_code = encode_job(kr_job)
             
-            players.append({
-                'nickname': nick,
-                'id': id1,
-                'map_zh': zh_map,
-                'level': parts[5].strip(),
-                'job_zh': zh_job,
-            })
+            players.append(new_player(Player, (
+                nick.decode('utf-8', 'ignore'),
+                id1.decode('utf-8', 'ignore'),
+                map_code,
+                level,
+                job_code,
+                codebook,
+                level_text,
+            )))
         
         return players 
\ No newline at end of file
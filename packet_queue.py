@@ -0,0 +1,195 @@
+"""
+封包佇列模組
+將擷取執行緒與解析工作分離：擷取端只把原始資料段放入有界佇列，
+由獨立的解析執行緒批次取出處理
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+from config import Config
+from packet_decoder import TCP_FIN, TCP_RST, TCP_SYN
+from packet_processor import PacketProcessor
+from player import Player
+from tcp_stream import FlowKey
+
+
+class QueuedSegment(NamedTuple):
+    """佇列中的原始 TCP 資料段"""
+    timestamp: float
+    flow_key: FlowKey
+    seq: int
+    flags: int
+    payload: bytes
+
+
+class PacketQueue:
+    """有界的資料段佇列
+    
+    佇列滿時的處理方式：
+    - drop_newest：丟棄新進的資料段
+    - drop_oldest：丟棄最舊的資料段，保留最新狀態
+    - block：等待解析端騰出空間（最多 block_timeout 秒，逾時仍丟棄）
+    """
+    
+    POLICIES = ('drop_newest', 'drop_oldest', 'block')
+    
+    def __init__(self, maxsize: int = Config.PACKET_QUEUE_SIZE,
+                 policy: str = Config.PACKET_QUEUE_POLICY, block_timeout: float = 0.1):
+        if policy not in self.POLICIES:
+            raise ValueError(f"未知的佇列溢位策略: {policy}")
+        if maxsize <= 0:
+            raise ValueError("佇列大小必須大於 0")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self.closed = False
+        
+        # 統計
+        self.attempts = 0
+        self.enqueued = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.enqueue_time = 0.0
+        self.max_enqueue_latency = 0.0
+    
+    def __len__(self) -> int:
+        return len(self._items)
+    
+    def put(self, item: Any) -> bool:
+        """放入一筆資料，這筆資料被丟棄時回傳 False"""
+        start = time.perf_counter()
+        accepted = True
+        with self._lock:
+            if len(self._items) >= self.maxsize:
+                if self.policy == 'drop_oldest':
+                    self._items.popleft()
+                    self.dropped += 1
+                elif self.policy == 'block':
+                    deadline = start + self.block_timeout
+                    while len(self._items) >= self.maxsize and not self.closed:
+                        remaining = deadline - time.perf_counter()
+                        if remaining <= 0:
+                            break
+                        self._not_full.wait(remaining)
+                    accepted = len(self._items) < self.maxsize
+                else:
+                    accepted = False
+            
+            if accepted:
+                self._items.append(item)
+                self.enqueued += 1
+                depth = len(self._items)
+                if depth > self.max_depth:
+                    self.max_depth = depth
+                self._not_empty.notify()
+            else:
+                self.dropped += 1
+            
+            latency = time.perf_counter() - start
+            self.attempts += 1
+            self.enqueue_time += latency
+            if latency > self.max_enqueue_latency:
+                self.max_enqueue_latency = latency
+        return accepted
+    
+    def get_batch(self, max_items: int, timeout: Optional[float] = None) -> List:
+        """取出最多 max_items 筆資料，佇列為空時最多等待 timeout 秒"""
+        with self._lock:
+            if not self._items and not self.closed:
+                self._not_empty.wait(timeout)
+            items = self._items
+            count = min(max_items, len(items))
+            batch = [items.popleft() for _ in range(count)]
+            if batch:
+                self._not_full.notify_all()
+            return batch
+    
+    def close(self) -> None:
+        """關閉佇列並喚醒所有等待中的執行緒"""
+        with self._lock:
+            self.closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+    
+    def stats(self) -> Dict[str, float]:
+        """佇列統計快照"""
+        with self._lock:
+            return {
+                'depth': len(self._items),
+                'max_depth': self.max_depth,
+                'enqueued': self.enqueued,
+                'dropped': self.dropped,
+                'avg_enqueue_latency': self.enqueue_time / self.attempts if self.attempts else 0.0,
+                'max_enqueue_latency': self.max_enqueue_latency,
+            }
+
+
+class ParserWorker:
+    """解析執行緒：從佇列批次取出資料段並交給 PacketProcessor"""
+    
+    def __init__(self, packet_queue: PacketQueue, processor: PacketProcessor,
+                 on_players: Callable[[List[Player]], None],
+                 batch_size: int = Config.PARSER_BATCH_SIZE):
+        self.queue = packet_queue
+        self.processor = processor
+        self.on_players = on_players
+        self.batch_size = batch_size
+        self.batches = 0
+        self.segments = 0
+        self.segment_timestamp = 0.0  # 目前處理中資料段的擷取時間（on_players 可用來計算延遲）
+        self._running = False
+        self._thread = None
+    
+    def start(self) -> None:
+        """啟動解析執行緒"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = 1.0, drain: bool = False) -> None:
+        """停止解析執行緒；drain 為 True 時先處理完佇列中剩下的資料段"""
+        if not drain:
+            self._running = False
+        self.queue.close()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self._running = False
+    
+    def _run(self) -> None:
+        """主解析循環"""
+        process_segment = self.processor.process_segment
+        queue_wait = self.processor.profiler.stage('queue_wait')
+        while self._running:
+            batch = self.queue.get_batch(self.batch_size, timeout=0.2)
+            if not batch:
+                if self.queue.closed:
+                    break
+                continue
+            
+            self.batches += 1
+            self.segments += len(batch)
+            now = time.time()
+            for segment in batch:
+                # 從擷取到開始解析的等待時間
+                queue_wait.record(now - segment.timestamp)
+                self.segment_timestamp = segment.timestamp
+                try:
+                    flags = segment.flags
+                    players = process_segment(
+                        segment.flow_key, segment.seq, segment.payload, segment.timestamp,
+                        syn=bool(flags & TCP_SYN), fin=bool(flags & (TCP_FIN | TCP_RST))
+                    )
+                except Exception as e:
+                    print(f"解析資料段失敗: {e}")
+                    continue
+                if players:
+                    self.on_players(players) 
\ No newline at end of file
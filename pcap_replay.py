@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""
+離線封包重播模組
+將 pcap/pcapng 檔案送入與即時監控相同的重組與解析流程，並統計處理效能
+"""
+
+import argparse
+import json
+import struct
+import sys
+import time
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+from config import Config
+from data_manager import DataManager
+from packet_decoder import decode_frame, TCP_FIN, TCP_RST, TCP_SYN
+from packet_processor import PacketProcessor
+
+PCAP_MAGIC = {
+    b'\xd4\xc3\xb2\xa1': ('<', 1e-6),
+    b'\xa1\xb2\xc3\xd4': ('>', 1e-6),
+    b'\x4d\x3c\xb2\xa1': ('<', 1e-9),
+    b'\xa1\xb2\x3c\x4d': ('>', 1e-9),
+}
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_IDB = 1
+PCAPNG_OPB = 2
+PCAPNG_SPB = 3
+PCAPNG_EPB = 6
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+PCAPNG_OPT_TSRESOL = 9
+
+
+def iter_capture(path: str) -> Iterator[Tuple[float, int, bytes]]:
+    """逐一讀取擷取檔中的封包，回傳 (時間戳記, 鏈路層類型, 封包資料)"""
+    with open(path, 'rb') as f:
+        magic = f.read(4)
+        if magic in PCAP_MAGIC:
+            yield from _iter_pcap(f, magic)
+        elif len(magic) == 4 and struct.unpack('<I', magic)[0] == PCAPNG_SHB:
+            f.seek(0)
+            yield from _iter_pcapng(f)
+        else:
+            raise ValueError(f"不支援的擷取檔格式: {path}")
+
+
+def _iter_pcap(f: BinaryIO, magic: bytes) -> Iterator[Tuple[float, int, bytes]]:
+    """讀取傳統 pcap 格式"""
+    endian, resolution = PCAP_MAGIC[magic]
+    header = f.read(20)
+    if len(header) < 20:
+        return
+    linktype = struct.unpack(endian + 'HHiIII', header)[5] & 0x0FFFFFFF
+    record = struct.Struct(endian + 'IIII')
+    
+    while True:
+        head = f.read(16)
+        if len(head) < 16:
+            return
+        ts_sec, ts_frac, incl_len, _ = record.unpack(head)
+        data = f.read(incl_len)
+        if len(data) < incl_len:
+            return
+        yield ts_sec + ts_frac * resolution, linktype, data
+
+
+def _iter_pcapng(f: BinaryIO) -> Iterator[Tuple[float, int, bytes]]:
+    """讀取 pcapng 格式（SHB/IDB/EPB/SPB/OPB 區塊）"""
+    endian = '<'
+    interfaces = []  # [(鏈路層類型, 時間解析度)]
+    
+    while True:
+        head = f.read(8)
+        if len(head) < 8:
+            return
+        block_type = struct.unpack(endian + 'I', head[:4])[0]
+        
+        if block_type == PCAPNG_SHB:
+            # 區段標頭決定之後區塊的位元組順序
+            byte_order = f.read(4)
+            endian = '<' if struct.unpack('<I', byte_order)[0] == PCAPNG_BYTE_ORDER_MAGIC else '>'
+            block_len = struct.unpack(endian + 'I', head[4:])[0]
+            f.read(block_len - 12)
+            interfaces = []
+            continue
+        
+        block_len = struct.unpack(endian + 'I', head[4:])[0]
+        body = f.read(block_len - 8)
+        if len(body) < block_len - 8:
+            return
+        body = body[:-4]  # 去除結尾的區塊長度
+        
+        if block_type == PCAPNG_IDB:
+            linktype = struct.unpack(endian + 'H', body[:2])[0]
+            interfaces.append((linktype, _pcapng_tsresol(body[8:], endian)))
+        elif block_type == PCAPNG_EPB:
+            iface, ts_high, ts_low, cap_len, _ = struct.unpack(endian + 'IIIII', body[:20])
+            linktype, resolution = interfaces[iface]
+            yield ((ts_high << 32) | ts_low) * resolution, linktype, body[20:20+cap_len]
+        elif block_type == PCAPNG_SPB and interfaces:
+            linktype, _ = interfaces[0]
+            yield 0.0, linktype, body[4:]
+        elif block_type == PCAPNG_OPB:
+            iface, _, ts_high, ts_low, cap_len, _ = struct.unpack(endian + 'HHIIII', body[:20])
+            linktype, resolution = interfaces[iface]
+            yield ((ts_high << 32) | ts_low) * resolution, linktype, body[20:20+cap_len]
+
+
+def _pcapng_tsresol(options: bytes, endian: str) -> float:
+    """從介面選項中取得時間戳記解析度"""
+    offset = 0
+    while offset + 4 <= len(options):
+        code, length = struct.unpack(endian + 'HH', options[offset:offset+4])
+        if code == 0:
+            break
+        if code == PCAPNG_OPT_TSRESOL and length >= 1:
+            value = options[offset+4]
+            return 2.0 ** -(value & 0x7F) if value & 0x80 else 10.0 ** -value
+        offset += 4 + ((length + 3) & ~3)
+    return 1e-6
+
+
+class ReplayStats:
+    """重播統計資料"""
+    
+    STAGES = ('讀取', '標頭解析', '重組與解析', '輸出')
+    
+    def __init__(self):
+        self.packets = 0
+        self.tcp_segments = 0
+        self.frames = 0
+        self.players = 0
+        self.wall_time = 0.0
+        self.stage_time: Dict[str, float] = {stage: 0.0 for stage in self.STAGES}
+    
+    def report(self) -> str:
+        """產生統計報告"""
+        elapsed = self.wall_time or 1e-9
+        lines = [
+            f"封包數: {self.packets} ({self.packets / elapsed:,.0f} 封包/秒)",
+            f"TCP 資料段: {self.tcp_segments}",
+            f"TOZ 封包: {self.frames} ({self.frames / elapsed:,.0f} 封包/秒)",
+            f"玩家: {self.players} ({self.players / elapsed:,.0f} 玩家/秒)",
+            f"總耗時: {self.wall_time:.3f} 秒",
+            "各階段耗時:",
+        ]
+        for stage in self.STAGES:
+            spent = self.stage_time[stage]
+            lines.append(f"  {stage:<8} {spent:8.3f} 秒 ({spent / elapsed * 100:5.1f}%)")
+        return '\n'.join(lines)
+
+
+def replay(path: str, processor: PacketProcessor, port: int = Config.DEFAULT_PORT,
+           speed: Optional[float] = None, output: Optional[BinaryIO] = None) -> ReplayStats:
+    """重播擷取檔；speed 為 None 時全速執行，否則以 N 倍真實時間播放"""
+    stats = ReplayStats()
+    stage = stats.stage_time
+    frames_before = processor.frames_processed
+    clock = time.perf_counter
+    first_ts = None
+    started = clock()
+    
+    packets = iter_capture(path)
+    while True:
+        t0 = clock()
+        item = next(packets, None)
+        t1 = clock()
+        stage['讀取'] += t1 - t0
+        if item is None:
+            break
+        
+        timestamp, linktype, data = item
+        stats.packets += 1
+        
+        if speed:
+            # 依封包時間戳記控制播放速度
+            if first_ts is None:
+                first_ts = timestamp
+            delay = (timestamp - first_ts) / speed - (clock() - started)
+            if delay > 0:
+                time.sleep(delay)
+            t1 = clock()
+        
+        segment = decode_frame(linktype, data)
+        t2 = clock()
+        stage['標頭解析'] += t2 - t1
+        if segment is None or port not in (segment.flow_key[1], segment.flow_key[3]):
+            continue
+        
+        stats.tcp_segments += 1
+        flags = segment.flags
+        players = processor.process_segment(
+            segment.flow_key, segment.seq, segment.payload, timestamp,
+            syn=bool(flags & TCP_SYN), fin=bool(flags & (TCP_FIN | TCP_RST))
+        )
+        t3 = clock()
+        stage['重組與解析'] += t3 - t2
+        
+        if players:
+            stats.players += len(players)
+            if output is not None:
+                record = {
+                    'ts': timestamp,
+                    'flow': '{}:{}>{}:{}'.format(*segment.flow_key),
+                    'players': [player.to_dict() for player in players],
+                }
+                output.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n')
+            stage['輸出'] += clock() - t3
+    
+    stats.wall_time = clock() - started
+    stats.frames = processor.frames_processed - frames_before
+    return stats
+
+
+def main(argv=None) -> int:
+    """命令列進入點"""
+    parser = argparse.ArgumentParser(description="離線重播 pcap/pcapng 並統計封包解析效能")
+    parser.add_argument('capture', help="pcap 或 pcapng 擷取檔")
+    parser.add_argument('--port', type=int, default=Config.DEFAULT_PORT, help="遊戲伺服器 TCP 埠")
+    parser.add_argument('--speed', type=float, default=None,
+                        help="以 N 倍真實時間播放（預設全速）")
+    parser.add_argument('--jsonl', default=None, help="將解析出的玩家名單寫入 JSONL 檔")
+    args = parser.parse_args(argv)
+    
+    processor = PacketProcessor(DataManager())
+    output = open(args.jsonl, 'wb') if args.jsonl else None
+    try:
+        stats = replay(args.capture, processor, args.port, args.speed, output)
+    finally:
+        if output:
+            output.close()
+    
+    print(stats.report())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main()) 
\ No newline at end of file
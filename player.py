@@ -0,0 +1,76 @@
+"""
+玩家資料模組
+定義解析後的玩家紀錄
+"""
+
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from data_manager import CodeBook
+
+
+class Player(NamedTuple):
+    """不可變的玩家紀錄
+    
+    以 NamedTuple（__slots__ = ()）取代每位玩家一個 dict，欄位存取走 C 實作的
+    描述器；地圖與職業只存整數代碼，中文名稱在顯示或匯出時才經由 CodeBook 查詢。
+    記憶體約為五鍵 dict 的一半。NamedTuple 的 __new__ 是 Python 函式，以 Player(...) 建構
+    約為 dict 字面值的 1.5 倍；每個封包都要建立整份名單的解析與跨行程還原改以
+    tuple.__new__(Player, (全部 7 個欄位,)) 直接建立（不檢查欄位數，需依序給齊），
+    約與 dict 字面值相當，連同代碼查詢仍低於舊版翻譯後建立 dict 的成本
+    （見 benchmarks/bench_player_record.py）。
+    同時保留舊版 dict 的唯讀介面（player['nickname']、player.get(...)），
+    dict 介面中的等級仍以字串表示。
+    
+    封包中的等級欄位空白、不是數字或不是標準寫法（例如 042）時，level 為可比較的整數（無法解析為 0），
+    原文另存於 level_text，dict 介面回傳與舊版相同的原文；以 _replace 變更 level 時需一併清除 level_text。
+    """
+    
+    nickname: str
+    id: str
+    map_code: int
+    level: int
+    job_code: int
+    codebook: CodeBook
+    level_text: Optional[str] = None  # 無法由 level 還原的等級原文
+    
+    DICT_KEYS = ('nickname', 'id', 'map_zh', 'level', 'job_zh')
+    
+    @property
+    def map_zh(self) -> str:
+        return self.codebook.maps.translate(self.map_code)
+    
+    @property
+    def job_zh(self) -> str:
+        return self.codebook.jobs.translate(self.job_code)
+    
+    @property
+    def map_kr(self) -> str:
+        return self.codebook.maps.name(self.map_code)
+    
+    @property
+    def job_kr(self) -> str:
+        return self.codebook.jobs.name(self.job_code)
+    
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key not in self.DICT_KEYS:
+                raise KeyError(key)
+            if key == 'level':
+                return str(self.level) if self.level_text is None else self.level_text
+            return getattr(self, key)
+        return tuple.__getitem__(self, key)
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """dict 相容的取值"""
+        return self[key] if key in self.DICT_KEYS else default
+    
+    def keys(self) -> Tuple[str, ...]:
+        """dict 相容的鍵列表"""
+        return self.DICT_KEYS
+    
+    def items(self) -> List[Tuple[str, Any]]:
+        """dict 相容的鍵值列表"""
+        return [(key, self[key]) for key in self.DICT_KEYS]
+    
+    def to_dict(self) -> Dict[str, str]:
+        """轉換為舊版的玩家 dict"""
+        return {key: self[key] for key in self.DICT_KEYS} 
\ No newline at end of file
@@ -0,0 +1,230 @@
+"""
+子行程解析模組
+擷取與 PacketProcessor 解析移到獨立的子行程執行，不與 Tk 主迴圈和錄影執行緒搶同一個 GIL；
+子行程只把精簡的名單變動事件經由 Pipe 傳回，由介面端的 RosterTracker 套用
+"""
+
+import multiprocessing
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+from config import Config
+from data_manager import CodeBook, DataManager
+from packet_processor import PacketProcessor
+from packet_queue import PacketQueue, ParserWorker, QueuedSegment
+from player import Player
+from profiling import StageProfiler
+from roster_delta import RosterEvent, RosterTracker
+
+MSG_EVENTS = 'events'
+MSG_STATS = 'stats'
+MSG_ERROR = 'error'
+
+STATS_INTERVAL = 1.0  # 秒，子行程回報統計的間隔
+
+# 傳送用的事件格式：(事件類型, 暱稱, ID, 韓文地圖, 等級, 韓文職業, 等級原文或 None)
+EventRecord = Tuple[str, str, str, str, int, str, Optional[str]]
+
+
+class WorkerSource(NamedTuple):
+    """子行程的資料來源：即時擷取，或指定 pcap 時改為播放擷取檔"""
+    backend: str = Config.CAPTURE_BACKEND
+    iface: Optional[str] = None
+    port: int = Config.DEFAULT_PORT
+    pcap: Optional[str] = None
+    speed: Optional[float] = None  # 擷取檔以 N 倍真實時間播放（None 為全速）
+
+
+def encode_events(events: List[RosterEvent]) -> List[EventRecord]:
+    """事件轉為只含字串與整數的 tuple（代碼只在各自的行程內有效，改傳原始韓文名稱）
+    
+    不傳送 RosterEvent.previous：介面端只需要變動後的紀錄，還原後的事件 previous 一律為 None。
+    """
+    records = []
+    for kind, player, _ in events:
+        records.append((kind, player.nickname, player.id, player.map_kr, player.level, player.job_kr,
+                        player.level_text))
+    return records
+
+
+def decode_events(records: List[EventRecord], codebook: CodeBook) -> List[RosterEvent]:
+    """以本行程的代碼表還原事件"""
+    encode_map = codebook.maps.encode
+    encode_job = codebook.jobs.encode
+    new_player = tuple.__new__
+    return [RosterEvent(kind, new_player(Player, (nickname, player_id, encode_map(map_kr), level,
+                                                  encode_job(job_kr), codebook, level_text)))
+            for kind, nickname, player_id, map_kr, level, job_kr, level_text in records]
+
+
+def feed_pcap(source: WorkerSource, packet_queue: PacketQueue, stop_event) -> None:
+    """播放擷取檔；資料段以送入當下的時間標記，與即時擷取的延遲量測方式一致"""
+    from packet_decoder import decode_frame
+    from pcap_replay import iter_capture
+    
+    first_ts = None
+    started = time.perf_counter()
+    for timestamp, linktype, data in iter_capture(source.pcap):
+        if stop_event.is_set():
+            return
+        if source.speed:
+            if first_ts is None:
+                first_ts = timestamp
+            delay = (timestamp - first_ts) / source.speed - (time.perf_counter() - started)
+            if delay > 0 and stop_event.wait(delay):
+                return
+        segment = decode_frame(linktype, data)
+        if segment is None or source.port not in (segment.flow_key[1], segment.flow_key[3]):
+            continue
+        packet_queue.put(QueuedSegment(time.time(), segment.flow_key, segment.seq,
+                                       segment.flags, bytes(segment.payload)))
+
+
+def _child_main(conn, stop_event, source: WorkerSource) -> None:
+    """子行程進入點：擷取 → 佇列 → 解析 → 名單差異 → Pipe"""
+    send_lock = threading.Lock()
+    
+    def send(message) -> None:
+        with send_lock:
+            try:
+                conn.send(message)
+            except (OSError, ValueError):
+                # 介面端已關閉
+                stop_event.set()
+    
+    processor = PacketProcessor(DataManager(interactive=False))
+    tracker = RosterTracker()
+    capture = None
+    # 播放擷取檔時以等待取代丟棄，結果才能重現
+    packet_queue = PacketQueue(policy='block', block_timeout=1.0) if source.pcap else PacketQueue()
+    
+    def on_players(players: List[Player]) -> None:
+        events = tracker.update(players)
+        if events:
+            send((MSG_EVENTS, worker.segment_timestamp, time.time(), encode_events(events)))
+    
+    def snapshot() -> Dict:
+        stats = processor.stats()
+        stats['queue'] = packet_queue.stats()
+        if capture is not None:
+            stats['counters']['captured'] = capture.packets
+        return stats
+    
+    worker = ParserWorker(packet_queue, processor, on_players)
+    worker.start()
+    try:
+        if source.pcap:
+            feed_pcap(source, packet_queue, stop_event)
+        else:
+            from capture_backend import create_capture_backend
+            capture = create_capture_backend(source.backend, source.iface, source.port, packet_queue.put)
+            capture.start()
+            while not stop_event.wait(STATS_INTERVAL):
+                if not capture.running:
+                    break
+                send((MSG_STATS, snapshot()))
+    except Exception as e:
+        send((MSG_ERROR, str(e)))
+    finally:
+        if capture is not None:
+            capture.stop()
+        worker.stop(timeout=5.0, drain=True)
+        send((MSG_STATS, snapshot()))
+        conn.close()
+
+
+class ProcessParserWorker:
+    """在子行程執行擷取與解析，於背景執行緒接收事件
+    
+    on_events(events, captured) 在接收執行緒中呼叫，captured 是觸發這批事件的資料段擷取時間
+    （time.time()），可用來計算擷取到畫面更新的端到端延遲。
+    """
+    
+    def __init__(self, codebook: CodeBook, on_events: Callable[[List[RosterEvent], float], None],
+                 source: WorkerSource = WorkerSource(), profiler: Optional[StageProfiler] = None):
+        self.codebook = codebook
+        self.on_events = on_events
+        self.source = source
+        self.profiler = profiler or StageProfiler()
+        self.process = None
+        self.messages = 0
+        self.events = 0
+        self.child_stats: Dict = {}
+        self.error: Optional[str] = None
+        self._conn = None
+        self._stop_event = None
+        self._reader = None
+    
+    @property
+    def running(self) -> bool:
+        return bool(self.process and self.process.is_alive())
+    
+    def start(self) -> None:
+        """啟動子行程與接收執行緒"""
+        if self.running:
+            return
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        self._stop_event = multiprocessing.Event()
+        self.process = multiprocessing.Process(target=_child_main, daemon=True,
+                                               args=(sender, self._stop_event, self.source))
+        self.process.start()
+        sender.close()  # 只留子行程持有傳送端，子行程結束時接收端才會收到 EOF
+        self._conn = receiver
+        self._reader = threading.Thread(target=self._read_loop, daemon=True)
+        self._reader.start()
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待子行程自行結束（擷取檔播放完畢），回傳是否已結束"""
+        if self._reader:
+            self._reader.join(timeout)
+            return not self._reader.is_alive()
+        return True
+    
+    def stop(self, timeout: float = 2.0) -> None:
+        """通知子行程結束；逾時未結束則強制終止"""
+        if self._stop_event is not None:
+            self._stop_event.set()
+        if self.process:
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(timeout)
+        if self._reader:
+            self._reader.join(timeout)
+            self._reader = None
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+    
+    def _read_loop(self) -> None:
+        """接收子行程訊息直到 Pipe 關閉"""
+        ipc = self.profiler.stage('ipc')
+        recv = self._conn.recv
+        while True:
+            try:
+                message = recv()
+            except (EOFError, OSError):
+                break
+            self.messages += 1
+            kind = message[0]
+            if kind == MSG_EVENTS:
+                _, captured, sent, records = message
+                ipc.record(time.time() - sent)
+                events = decode_events(records, self.codebook)
+                self.events += len(events)
+                try:
+                    self.on_events(events, captured)
+                except Exception as e:
+                    print(f"處理子行程事件失敗: {e}")
+            elif kind == MSG_STATS:
+                self.child_stats = message[1]
+            elif kind == MSG_ERROR:
+                self.error = message[1]
+                print(f"解析子行程錯誤: {self.error}")
+    
+    def stats(self) -> Dict:
+        """子行程最近一次回報的統計（stages / counters / queue），加上傳輸計數"""
+        stats = {'stages': {}, 'counters': {}}
+        stats.update(self.child_stats)
+        stats['counters'] = dict(stats['counters'], ipc_messages=self.messages, ipc_events=self.events)
+        return stats 
\ No newline at end of file
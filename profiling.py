@@ -0,0 +1,111 @@
+"""
+效能剖析模組
+常駐開啟的輕量各階段計數器與耗時直方圖（以 2 的次方微秒分桶）
+"""
+
+import threading
+from typing import Dict, List
+
+
+class Histogram:
+    """耗時直方圖：第 k 桶收集 [2^(k-1), 2^k) 微秒的樣本，第 0 桶為 1 微秒以下"""
+    
+    BUCKETS = 32
+    
+    __slots__ = ('buckets', 'count', 'total', 'max')
+    
+    def __init__(self):
+        self.reset()
+    
+    def reset(self) -> None:
+        """清除所有樣本"""
+        self.buckets: List[int] = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+    
+    def record(self, seconds: float) -> None:
+        """記錄一次耗時（秒）"""
+        index = int(seconds * 1e6).bit_length()
+        self.buckets[index if index < self.BUCKETS else self.BUCKETS - 1] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+    
+    def percentile(self, pct: float) -> float:
+        """以所在分桶的上界估計百分位數（秒）"""
+        if not self.count:
+            return 0.0
+        target = self.count * pct / 100
+        seen = 0
+        for index, hits in enumerate(self.buckets):
+            seen += hits
+            if seen >= target:
+                return min((1 << index) / 1e6, self.max)
+        return self.max
+    
+    def snapshot(self) -> Dict[str, float]:
+        """統計快照（時間單位：微秒）"""
+        count = self.count
+        return {
+            'count': count,
+            'total_ms': self.total * 1e3,
+            'avg_us': self.total / count * 1e6 if count else 0.0,
+            'p50_us': self.percentile(50) * 1e6,
+            'p95_us': self.percentile(95) * 1e6,
+            'p99_us': self.percentile(99) * 1e6,
+            'max_us': self.max * 1e6,
+        }
+
+
+class StageProfiler:
+    """各處理階段的耗時直方圖與計數器
+    
+    記錄端只做幾次整數與浮點運算，不加鎖（由單一執行緒寫入）；
+    snapshot 可從其他執行緒呼叫，取得的是近似一致的快照。
+    """
+    
+    def __init__(self):
+        self.stages: Dict[str, Histogram] = {}
+        self.counters: Dict[str, int] = {}
+        self._lock = threading.Lock()  # 只保護新增階段
+    
+    def stage(self, name: str) -> Histogram:
+        """取得（必要時建立）階段的直方圖；熱路徑可先取得後重複使用"""
+        histogram = self.stages.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.stages.setdefault(name, Histogram())
+        return histogram
+    
+    def record(self, name: str, seconds: float) -> None:
+        """記錄某階段的一次耗時"""
+        self.stage(name).record(seconds)
+    
+    def count(self, name: str, amount: int = 1) -> None:
+        """累加計數器"""
+        self.counters[name] = self.counters.get(name, 0) + amount
+    
+    def snapshot(self) -> Dict[str, Dict]:
+        """回傳 {'stages': {階段: 統計}, 'counters': {名稱: 數值}}"""
+        return {
+            'stages': {name: histogram.snapshot() for name, histogram in list(self.stages.items())},
+            'counters': dict(self.counters),
+        }
+    
+    def reset(self) -> None:
+        """清除所有統計（直方圖原地清除，先前取得的參照仍然有效）"""
+        with self._lock:
+            for histogram in self.stages.values():
+                histogram.reset()
+            self.counters = {}
+
+
+def format_stats(stages: Dict[str, Dict[str, float]]) -> List[str]:
+    """將階段統計排成文字表格（診斷面板與命令列共用）"""
+    lines = [f"{'階段':<12} {'次數':>8} {'平均µs':>9} {'p95µs':>9} {'p99µs':>9} {'最大µs':>10} {'總計ms':>9}"]
+    for name, s in stages.items():
+        lines.append(f"{name:<12} {s['count']:>8} {s['avg_us']:>9.1f} {s['p95_us']:>9.0f} "
+                     f"{s['p99_us']:>9.0f} {s['max_us']:>10.0f} {s['total_ms']:>9.1f}")
+    return lines 
\ No newline at end of file
@@ -0,0 +1,141 @@
+"""
+名單差異模組
+保存上一份名單（以玩家 ID 索引），將新名單轉換為精簡的變動事件
+"""
+
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from player import Player
+
+JOINED = 'joined'
+LEFT = 'left'
+MAP_CHANGED = 'map'
+LEVEL_CHANGED = 'level'
+JOB_CHANGED = 'job'
+RENAMED = 'nickname'
+
+
+class RosterEvent(NamedTuple):
+    """名單變動事件；LEFT 事件的 player 是離開前的紀錄
+    
+    previous 是變動前的紀錄（JOINED / LEFT 為 None）；經由解析子行程傳回的事件不含 previous，一律為 None。
+    """
+    kind: str
+    player: Player
+    previous: Optional[Player] = None
+
+
+class RosterTracker:
+    """比對連續的名單並產生加入／離開／變動事件
+    
+    Player 紀錄不可變，未變動的玩家與上一份紀錄相等，只需一次 tuple 比較；
+    下游（介面、日誌、儲存）只處理事件，成本與變動數量成正比而非頻道人數。
+    
+    同時維護地圖 → 玩家 ID 與暱稱 → 玩家 ID 的索引，只在玩家有變動時調整，
+    「我的角色」與「同地圖玩家」的查詢成本與頻道人數無關。
+    """
+    
+    def __init__(self):
+        self.players: Dict[str, Player] = {}
+        self.by_map: Dict[int, Dict[str, None]] = {}  # 地圖代碼 → 玩家 ID（dict 保留加入順序）
+        self.by_nickname: Dict[str, str] = {}
+        self.updates = 0
+        self.events = 0
+    
+    def __len__(self) -> int:
+        return len(self.players)
+    
+    def get(self, player_id: str) -> Optional[Player]:
+        """依 ID 取得目前名單中的玩家"""
+        return self.players.get(player_id)
+    
+    def find_nickname(self, nickname: str) -> Optional[Player]:
+        """依暱稱尋找目前名單中的玩家"""
+        player_id = self.by_nickname.get(nickname)
+        return None if player_id is None else self.players.get(player_id)
+    
+    def on_map(self, map_code: int) -> List[Player]:
+        """目前在指定地圖的玩家（依進入地圖的順序）"""
+        players = self.players
+        return [players[player_id] for player_id in self.by_map.get(map_code, ())]
+    
+    def map_population(self, map_code: int) -> int:
+        """指定地圖的玩家人數"""
+        return len(self.by_map.get(map_code, ()))
+    
+    def _reindex(self, old: Optional[Player], new: Optional[Player]) -> None:
+        """玩家加入、離開或變動時調整索引"""
+        if old is not None:
+            if new is None or old.map_code != new.map_code:
+                ids = self.by_map.get(old.map_code)
+                if ids is not None:
+                    ids.pop(old.id, None)
+                    if not ids:
+                        del self.by_map[old.map_code]
+            if (new is None or old.nickname != new.nickname) and self.by_nickname.get(old.nickname) == old.id:
+                del self.by_nickname[old.nickname]
+        if new is not None:
+            if old is None or old.map_code != new.map_code:
+                self.by_map.setdefault(new.map_code, {})[new.id] = None
+            if old is None or old.nickname != new.nickname:
+                self.by_nickname[new.nickname] = new.id
+    
+    def update(self, players: Iterable[Player]) -> List[RosterEvent]:
+        """以新的完整名單取代目前名單，回傳變動事件"""
+        current = {p.id: p for p in players}
+        previous = self.players
+        reindex = self._reindex
+        events = []
+        joined = 0
+        
+        for player_id, player in current.items():
+            old = previous.get(player_id)
+            if old is None:
+                events.append(RosterEvent(JOINED, player))
+                reindex(None, player)
+                joined += 1
+            elif old != player:
+                reindex(old, player)
+                if old.map_code != player.map_code:
+                    events.append(RosterEvent(MAP_CHANGED, player, old))
+                if old.level != player.level:
+                    events.append(RosterEvent(LEVEL_CHANGED, player, old))
+                if old.job_code != player.job_code:
+                    events.append(RosterEvent(JOB_CHANGED, player, old))
+                if old.nickname != player.nickname:
+                    events.append(RosterEvent(RENAMED, player, old))
+        
+        # 留下的人數少於上一份名單時才需要找出離開的玩家
+        if len(current) - joined < len(previous):
+            for player_id in previous.keys() - current.keys():
+                old = previous[player_id]
+                events.append(RosterEvent(LEFT, old))
+                reindex(old, None)
+        
+        self.players = current
+        self.updates += 1
+        self.events += len(events)
+        return events
+    
+    def apply(self, events: Iterable[RosterEvent]) -> List[RosterEvent]:
+        """套用其他地方（例如解析子行程）算好的變動事件，回傳同一批事件"""
+        events = list(events)
+        players = self.players
+        for event in events:
+            player = event.player
+            old = players.get(player.id)
+            if event.kind == LEFT:
+                if old is not None:
+                    del players[player.id]
+                    self._reindex(old, None)
+            elif old != player:
+                players[player.id] = player
+                self._reindex(old, player)
+        self.updates += 1
+        self.events += len(events)
+        return events
+    
+    def reset(self) -> None:
+        """清空名單狀態"""
+        self.players = {}
+        self.by_map = {}
+        self.by_nickname = {} 
\ No newline at end of file
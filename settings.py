@@ -0,0 +1,183 @@
+"""
+使用者設定模組
+型別化的設定紀錄（角色名稱、埠號、網卡、錄影參數）、效能設定檔與驗證，
+以及在背景執行緒延遲合併、以暫存檔加改名原子寫入的設定儲存
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, NamedTuple, Optional
+from config import Config
+
+FPS_CHOICES = (15, 20, 25, 30)
+SCALE_CHOICES = ("50%", "60%", "75%", "85%", "100%")
+
+
+class Settings(NamedTuple):
+    """使用者設定"""
+    last_character_name: str = ''
+    port: int = Config.DEFAULT_PORT
+    iface: str = ''  # 上次選擇的網卡顯示名稱（空字串表示使用第一張）
+    capture_backend: str = Config.CAPTURE_BACKEND
+    fps: int = Config.DEFAULT_FPS
+    quality: str = Config.DEFAULT_QUALITY
+    scale: str = Config.DEFAULT_SCALE
+    max_file_size: int = Config.MAX_FILE_SIZE
+    profile: str = ''  # 最後套用的效能設定檔
+
+
+# 效能設定檔：只覆寫列出的欄位
+PROFILES: Dict[str, Dict[str, Any]] = {
+    'low_cpu': {'fps': 15, 'quality': "低", 'scale': "50%"},
+    'balanced': {'fps': 20, 'quality': "中等", 'scale': "75%"},
+    'high_fidelity': {'fps': 30, 'quality': "超高", 'scale': "100%",
+                      'max_file_size': 200 * 1024 * 1024},
+}
+
+
+def _check_field(name: str, value: Any) -> Any:
+    """驗證單一欄位，不合法時引發 ValueError，回傳轉換後的值"""
+    default = Settings._field_defaults[name]
+    if isinstance(default, int):
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError(f"設定 {name} 必須是整數: {value!r}")
+        try:
+            value = int(value)
+        except ValueError:
+            raise ValueError(f"設定 {name} 必須是整數: {value!r}") from None
+    elif not isinstance(value, str):
+        raise ValueError(f"設定 {name} 必須是字串: {value!r}")
+    
+    if name == 'port' and not 0 < value < 65536:
+        raise ValueError(f"埠號超出範圍: {value}")
+    if name == 'fps' and value not in FPS_CHOICES:
+        raise ValueError(f"不支援的 FPS: {value}")
+    if name == 'quality' and value not in Config.QUALITY_SETTINGS:
+        raise ValueError(f"未知的錄影品質: {value}")
+    if name == 'scale' and value not in SCALE_CHOICES:
+        raise ValueError(f"不支援的解析度縮放: {value}")
+    if name == 'max_file_size' and value < 1024 * 1024:
+        raise ValueError(f"檔案分割大小至少 1MB: {value}")
+    if name == 'profile' and value and value not in PROFILES:
+        raise ValueError(f"未知的效能設定檔: {value}")
+    return value
+
+
+def validate_settings(settings: Settings, **changes) -> Settings:
+    """套用變更並驗證，回傳新的設定；任一欄位不合法時引發 ValueError"""
+    for name in changes:
+        if name not in Settings._fields:
+            raise ValueError(f"未知的設定: {name}")
+    return settings._replace(**{name: _check_field(name, value) for name, value in changes.items()})
+
+
+def settings_from_dict(data: Dict[str, Any]) -> Settings:
+    """由設定檔內容建立設定；缺少或不合法的欄位使用預設值"""
+    values = {}
+    for name in Settings._fields:
+        if name not in data:
+            continue
+        try:
+            values[name] = _check_field(name, data[name])
+        except ValueError as e:
+            print(f"忽略不合法的設定: {e}")
+    return Settings(**values)
+
+
+def write_settings(path: str, settings: Settings) -> None:
+    """原子寫入設定檔：先寫暫存檔再改名，中途失敗時舊檔保持完整"""
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(settings._asdict(), f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+class SettingsStore:
+    """設定儲存
+    
+    變更立即反映在記憶體中的設定；寫入檔案延後 save_delay 秒在背景執行緒進行，
+    期間的多次變更合併為一次寫入。
+    """
+    
+    def __init__(self, path: Optional[str] = None, save_delay: float = Config.SETTINGS_SAVE_DELAY):
+        self.path = path
+        self.save_delay = save_delay
+        self.saves = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._timer = None
+        self._dirty = False
+        self.settings = self.load()
+    
+    def _resolve_path(self) -> str:
+        return self.path if self.path is not None else Config.USER_CONFIG_FILE
+    
+    def load(self) -> Settings:
+        """讀取設定檔，不存在或無法讀取時使用預設值"""
+        path = self._resolve_path()
+        try:
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    return settings_from_dict(data)
+        except Exception as e:
+            print(f"載入設定失敗: {e}")
+        return Settings()
+    
+    def update(self, **changes) -> Settings:
+        """驗證並套用變更，有實際變動時排程寫入"""
+        with self._lock:
+            settings = validate_settings(self.settings, **changes)
+            profile = PROFILES.get(settings.profile)
+            if 'profile' not in changes and profile and any(
+                    getattr(settings, name) != value for name, value in profile.items()):
+                # 手動調整了設定檔涵蓋的欄位，不再標示為該設定檔
+                settings = settings._replace(profile='')
+            if settings != self.settings:
+                self.settings = settings
+                self._schedule_save()
+        return settings
+    
+    def apply_profile(self, name: str) -> Settings:
+        """套用效能設定檔"""
+        if name not in PROFILES:
+            raise ValueError(f"未知的效能設定檔: {name}")
+        return self.update(profile=name, **PROFILES[name])
+    
+    def _schedule_save(self) -> None:
+        """排程寫入（呼叫端需持有 _lock）；已有排程時沿用，寫入的是當時最新的設定"""
+        self._dirty = True
+        if self._timer is None:
+            self._timer = threading.Timer(self.save_delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+    
+    def flush(self) -> bool:
+        """立即寫入尚未儲存的變更，回傳是否有寫入"""
+        with self._write_lock:
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty:
+                    return False
+                settings = self.settings
+                self._dirty = False
+            
+            try:
+                write_settings(self._resolve_path(), settings)
+            except Exception as e:
+                print(f"儲存設定失敗: {e}")
+                with self._lock:
+                    self._dirty = True
+                return False
+            self.saves += 1
+            return True
+    
+    def close(self) -> None:
+        """結束前寫入尚未儲存的變更"""
+        self.flush() 
\ No newline at end of file
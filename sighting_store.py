@@ -0,0 +1,224 @@
+"""
+玩家出現紀錄模組
+將名單變動事件（加入、離開、換地圖、升級、轉職、改名）寫入本機 SQLite 資料庫（WAL 模式）；
+寫入由背景執行緒批次進行，呼叫端只把事件放入記憶體佇列，不會被磁碟 I/O 卡住
+"""
+
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import List, NamedTuple, Optional
+from config import Config
+
+SCHEMA = (
+    '''CREATE TABLE IF NOT EXISTS sightings (
+        ts REAL NOT NULL,
+        event TEXT NOT NULL,
+        player_id TEXT NOT NULL,
+        nickname TEXT NOT NULL,
+        map TEXT NOT NULL,
+        level INTEGER NOT NULL,
+        job TEXT NOT NULL
+    )''',
+    'CREATE INDEX IF NOT EXISTS idx_sightings_player ON sightings (player_id, ts)',
+    'CREATE INDEX IF NOT EXISTS idx_sightings_map ON sightings (map, ts)',
+    'CREATE INDEX IF NOT EXISTS idx_sightings_ts ON sightings (ts)',
+)
+INSERT = 'INSERT INTO sightings (ts, event, player_id, nickname, map, level, job) VALUES (?, ?, ?, ?, ?, ?, ?)'
+COLUMNS = 'ts, event, player_id, nickname, map, level, job'
+
+
+class Sighting(NamedTuple):
+    """一筆出現紀錄（地圖與職業為原始韓文名稱，翻譯表更新後仍可對應）"""
+    ts: float
+    event: str
+    player_id: str
+    nickname: str
+    map: str
+    level: int
+    job: str
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """開啟資料庫並設定 WAL 模式（讀取不會被寫入擋住）"""
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    for statement in SCHEMA:
+        conn.execute(statement)
+    conn.commit()
+    return conn
+
+
+class SightingStore:
+    """出現紀錄儲存
+    
+    record() 只把 (時間, 事件) 放入佇列；背景執行緒每 flush_interval 秒，
+    或累積 batch_size 筆時，以單一交易批次寫入。
+    佇列中的事件超過 max_pending 筆時丟棄最舊的一批，解析端永遠不必等待磁碟。
+    """
+    
+    def __init__(self, path: str = Config.SIGHTINGS_DB,
+                 flush_interval: float = Config.SIGHTING_FLUSH_INTERVAL,
+                 batch_size: int = Config.SIGHTING_BATCH_SIZE,
+                 max_pending: int = Config.SIGHTING_MAX_PENDING):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._batches = deque()
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flushed = threading.Condition(self._lock)
+        self._queued = 0  # 累計放入佇列的事件數
+        self._done = 0  # 累計已寫入或丟棄的事件數
+        self._closed = False
+        self._flush_requested = False
+        self._local = threading.local()
+        
+        # 統計
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.write_time = 0.0
+        self.errors = 0
+        
+        connect(path).close()  # 先建立資料表，開檔失敗時在呼叫端就會拋出
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+    
+    def record(self, events: list, timestamp: Optional[float] = None) -> None:
+        """加入一批名單變動事件（RosterEvent 或 MonitorEvent，只用到 kind 與 player；不做任何 I/O）"""
+        if not events:
+            return
+        batch = (time.time() if timestamp is None else timestamp, events)
+        with self._lock:
+            if self._closed:
+                return
+            self._batches.append(batch)
+            self._pending += len(events)
+            self._queued += len(events)
+            while self._pending > self.max_pending:
+                _, dropped = self._batches.popleft()
+                self._pending -= len(dropped)
+                self.dropped += len(dropped)
+                self._done += len(dropped)
+            if self._pending >= self.batch_size:
+                self._wakeup.notify()
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待目前佇列中的事件寫入完成，回傳是否在時限內完成"""
+        with self._lock:
+            target = self._queued
+            self._flush_requested = True
+            self._wakeup.notify()
+            return self._flushed.wait_for(lambda: self._done >= target or not self._thread.is_alive(),
+                                          timeout)
+    
+    def close(self, timeout: float = 5.0) -> None:
+        """寫入剩餘事件並停止背景執行緒"""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        self._thread.join(timeout)
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+    
+    def _take_batches(self) -> list:
+        """取出最多約 batch_size 筆事件（呼叫端需持有 _lock）；
+        每次交易筆數有上限，組裝資料列時持有 GIL 的時間才不會拖慢解析執行緒"""
+        batches = []
+        taken = 0
+        while self._batches and taken < self.batch_size:
+            batch = self._batches.popleft()
+            batches.append(batch)
+            taken += len(batch[1])
+        self._pending -= taken
+        if not self._batches:
+            self._flush_requested = False
+        return batches
+    
+    def _write_loop(self) -> None:
+        """背景寫入循環"""
+        conn = connect(self.path)
+        try:
+            while True:
+                with self._lock:
+                    self._wakeup.wait_for(lambda: self._closed or self._flush_requested
+                                          or self._pending >= self.batch_size, self.flush_interval)
+                    batches = self._take_batches()
+                    if not batches and self._closed:
+                        return
+                if batches:
+                    self._write(conn, batches)
+        finally:
+            conn.close()
+            with self._lock:
+                self._flushed.notify_all()
+    
+    def _write(self, conn: sqlite3.Connection, batches: list) -> None:
+        """以單一交易寫入多批事件"""
+        start = time.perf_counter()
+        rows = []
+        for ts, events in batches:
+            for event in events:
+                player = event.player
+                rows.append((ts, event.kind, player.id, player.nickname, player.map_kr,
+                             player.level, player.job_kr))
+        try:
+            with conn:
+                conn.executemany(INSERT, rows)
+            self.written += len(rows)
+        except sqlite3.Error as e:
+            self.errors += 1
+            print(f"寫入出現紀錄失敗: {e}")
+        self.batches += 1
+        self.write_time += time.perf_counter() - start
+        with self._lock:
+            self._done += len(rows)
+            self._flushed.notify_all()
+    
+    def _reader(self) -> sqlite3.Connection:
+        """目前執行緒的唯讀查詢連線（WAL 模式下查詢與背景寫入互不阻擋）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path)
+        return conn
+    
+    def history(self, player_id: str, limit: int = 100) -> List[Sighting]:
+        """某個 ID 最近的出現紀錄（新到舊）"""
+        rows = self._reader().execute(
+            f'SELECT {COLUMNS} FROM sightings WHERE player_id = ? ORDER BY ts DESC LIMIT ?',
+            (player_id, limit)).fetchall()
+        return [Sighting(*row) for row in rows]
+    
+    def maps_visited(self, player_id: str) -> List[tuple]:
+        """某個 ID 出現過的地圖：(地圖, 次數, 最早時間, 最後時間)，依最後時間排序"""
+        return self._reader().execute(
+            'SELECT map, COUNT(*), MIN(ts), MAX(ts) FROM sightings WHERE player_id = ? '
+            'GROUP BY map ORDER BY MAX(ts) DESC', (player_id,)).fetchall()
+    
+    def on_map(self, map_kr: str, since: float, until: Optional[float] = None,
+               limit: int = 1000) -> List[Sighting]:
+        """某段時間內在指定地圖的出現紀錄（新到舊）"""
+        rows = self._reader().execute(
+            f'SELECT {COLUMNS} FROM sightings WHERE map = ? AND ts >= ? AND ts <= ? '
+            'ORDER BY ts DESC LIMIT ?',
+            (map_kr, since, time.time() if until is None else until, limit)).fetchall()
+        return [Sighting(*row) for row in rows]
+    
+    def stats(self) -> dict:
+        """統計快照"""
+        with self._lock:
+            pending = self._pending
+        return {
+            'sightings_pending': pending,
+            'sightings_written': self.written,
+            'sightings_dropped': self.dropped,
+            'sightings_batches': self.batches,
+            'sightings_errors': self.errors,
+        } 
\ No newline at end of file
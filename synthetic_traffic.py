@@ -0,0 +1,127 @@
+"""
+合成封包產生模組
+產生擬真的 TOZ 名單封包與 TCP 資料段，供測試與效能測試使用：
+名單人數、地圖與職業分佈（取自 korean_chinese.json）、MSS 分段、
+穿插的非名單封包與雜訊、亂序與重傳都可調整
+"""
+
+import json
+import os
+import random
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+from config import Config
+
+DEFAULT_MAPS = ('버섯동산', '헤네시스동쪽숲', '자유시장')
+DEFAULT_JOBS = ('전사', '매지션', '궁수', '도적')
+
+
+class RosterRecord(NamedTuple):
+    """一筆名單紀錄（也是解析後應得到的欄位）"""
+    id: str
+    nickname: str
+    map_kr: str
+    level: int
+    job_kr: str
+
+
+def load_vocabulary(path: str = Config.KOREAN_CHINESE_FILE) -> Tuple[List[str], List[str]]:
+    """從翻譯檔取得韓文地圖與職業名稱，檔案不存在時使用內建名稱"""
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            mapping = json.load(f)
+        maps = list(mapping.get('地圖對照', {})) or list(DEFAULT_MAPS)
+        jobs = list(mapping.get('職業對照', {})) or list(DEFAULT_JOBS)
+        return maps, jobs
+    return list(DEFAULT_MAPS), list(DEFAULT_JOBS)
+
+
+class TrafficGenerator:
+    """可重現（固定亂數種子）的 TOZ 流量產生器
+    
+    map_skew 控制地圖分佈的集中程度：第 k 個地圖的權重為 1 / k^map_skew，
+    0 表示均勻分佈，越大玩家越集中在少數熱門地圖。
+    """
+    
+    def __init__(self, seed: int = 0, maps: Optional[Sequence[str]] = None,
+                 jobs: Optional[Sequence[str]] = None, map_skew: float = 1.0):
+        if maps is None or jobs is None:
+            default_maps, default_jobs = load_vocabulary()
+            maps = default_maps if maps is None else maps
+            jobs = default_jobs if jobs is None else jobs
+        self.random = random.Random(seed)
+        self.maps = list(maps)
+        self.jobs = list(jobs)
+        self.map_weights = [1 / (rank ** map_skew) for rank in range(1, len(self.maps) + 1)]
+        self._next_id = 10000000000000000
+    
+    def roster(self, size: int) -> List[RosterRecord]:
+        """產生指定人數的名單"""
+        rng = self.random
+        maps = rng.choices(self.maps, self.map_weights, k=size)
+        records = []
+        for i in range(size):
+            self._next_id += 1
+            player_id = f"{self._next_id:017d}"
+            records.append(RosterRecord(player_id, f"玩家{self._next_id % 100000}",
+                                        maps[i], rng.randint(1, 200), rng.choice(self.jobs)))
+        return records
+    
+    def evolve(self, roster: List[RosterRecord], churn: float = 0.05) -> List[RosterRecord]:
+        """模擬下一次名單：部分玩家換地圖或升級，少數離開並由新玩家取代"""
+        rng = self.random
+        result = []
+        for record in roster:
+            roll = rng.random()
+            if roll < churn:
+                record = self.roster(1)[0]
+            elif roll < churn * 3:
+                record = record._replace(map_kr=rng.choices(self.maps, self.map_weights)[0])
+            elif roll < churn * 4:
+                record = record._replace(level=min(record.level + 1, 200))
+            result.append(record)
+        return result
+    
+    @staticmethod
+    def roster_frame(roster: Sequence[RosterRecord]) -> bytes:
+        """將名單編碼為 TOZ 封包"""
+        body = '/'.join(f"{r.id}/0/{r.id}/{r.nickname}#{r.id}/{r.map_kr}/0/{r.level}/{r.job_kr}"
+                        for r in roster).encode('utf-8')
+        return b'TOZ ' + len(body).to_bytes(4, 'little') + body
+    
+    def noise_frame(self, size: int = 64) -> bytes:
+        """產生不含名單紀錄的 TOZ 封包（聊天、移動等）"""
+        text = ''.join(self.random.choice('abcdefghij 가나다라마/#') for _ in range(size))
+        body = ('chat/' + text).encode('utf-8')
+        return b'TOZ ' + len(body).to_bytes(4, 'little') + body
+    
+    def stream(self, rosters: Sequence[Sequence[RosterRecord]], noise_frames: int = 0,
+               garbage: int = 0) -> bytes:
+        """將多份名單串成一條 TCP 資料流，每份名單之間穿插非名單封包與雜訊位元組"""
+        parts = []
+        for roster in rosters:
+            for _ in range(noise_frames):
+                parts.append(self.noise_frame(self.random.randint(16, 256)))
+            if garbage:
+                parts.append(bytes(self.random.getrandbits(8) for _ in range(garbage)).replace(b'T', b't'))
+            parts.append(self.roster_frame(roster))
+        return b''.join(parts)
+    
+    def segments(self, data: bytes, mss: int = 1400, start_seq: int = 1000,
+                 reorder: float = 0.0, duplicate: float = 0.0) -> List[Tuple[int, bytes]]:
+        """依 MSS 切割為 (序號, 資料) 資料段；reorder 為與下一段交換順序的機率，
+        duplicate 為重傳（重複送出）的機率"""
+        rng = self.random
+        segments = [((start_seq + i) % (1 << 32), data[i:i+mss]) for i in range(0, len(data), mss)]
+        
+        i = 0
+        while i < len(segments) - 1:
+            if rng.random() < reorder:
+                segments[i], segments[i + 1] = segments[i + 1], segments[i]
+                i += 2
+            else:
+                i += 1
+        
+        if duplicate:
+            segments = [segment for segment in segments
+                        for _ in range(2 if rng.random() < duplicate else 1)]
+        return segments 
\ No newline at end of file
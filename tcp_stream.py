@@ -0,0 +1,138 @@
+"""
+TCP 串流重組模組
+依連線 4-tuple 分流，並依序號排序、去除重傳的 TCP 資料段
+"""
+
+from typing import Callable, Dict, List, Optional, Tuple
+
+# (來源位址, 來源埠, 目的位址, 目的埠)
+FlowKey = Tuple[str, int, str, int]
+
+SEQ_MOD = 1 << 32
+
+
+def seq_diff(a: int, b: int) -> int:
+    """計算 a - b 的序號差（考慮 32 位元回繞）"""
+    diff = (a - b) % SEQ_MOD
+    return diff - SEQ_MOD if diff >= SEQ_MOD // 2 else diff
+
+
+class TcpStream:
+    """單一方向 TCP 連線的序號重組狀態"""
+    
+    MAX_PENDING_SEGMENTS = 64  # 亂序資料段上限，超過視為遺失而跳過缺口
+    
+    def __init__(self, frame_buffer, now: float):
+        self.frame_buffer = frame_buffer
+        self.next_seq: Optional[int] = None
+        self.pending: Dict[int, bytes] = {}
+        self.last_seen = now
+        self.duplicates = 0
+        self.out_of_order = 0
+        self.gaps = 0
+    
+    def add_segment(self, seq: int, payload, syn: bool = False) -> List:
+        """加入一個資料段，回傳可依序交付的資料"""
+        if syn:
+            # SYN 佔用一個序號
+            self.next_seq = (seq + 1) % SEQ_MOD
+            self.pending.clear()
+            seq = self.next_seq
+        
+        if not payload:
+            return []
+        
+        if self.next_seq is None:
+            # 中途加入的連線，以第一個看到的資料段為起點
+            self.next_seq = seq
+        
+        diff = seq_diff(seq, self.next_seq)
+        if diff < 0:
+            if diff + len(payload) <= 0:
+                self.duplicates += 1
+                return []
+            # 部分重疊的重傳，只保留新的部分
+            payload = payload[-diff:]
+            diff = 0
+        
+        if diff > 0:
+            if seq not in self.pending or len(self.pending[seq]) < len(payload):
+                self.pending[seq] = bytes(payload)
+                self.out_of_order += 1
+            else:
+                self.duplicates += 1
+            if len(self.pending) <= self.MAX_PENDING_SEGMENTS:
+                return []
+            return self._skip_gap()
+        
+        self.next_seq = (self.next_seq + len(payload)) % SEQ_MOD
+        return [payload] + self._drain_pending()
+    
+    def _drain_pending(self) -> List:
+        """交付已接續上的亂序資料段"""
+        chunks = []
+        while self.pending:
+            ready = None
+            for seq in list(self.pending):
+                diff = seq_diff(seq, self.next_seq)
+                if diff > 0:
+                    continue
+                data = self.pending.pop(seq)
+                if diff + len(data) <= 0:
+                    self.duplicates += 1
+                    continue
+                ready = data[-diff:] if diff else data
+                break
+            if ready is None:
+                break
+            chunks.append(ready)
+            self.next_seq = (self.next_seq + len(ready)) % SEQ_MOD
+        return chunks
+    
+    def _skip_gap(self) -> List:
+        """放棄等待遺失的資料段，從最早的亂序資料段繼續"""
+        self.gaps += 1
+        self.next_seq = min(self.pending, key=lambda s: seq_diff(s, self.next_seq))
+        # 缺口前的半個封包已無法還原
+        self.frame_buffer.reset()
+        return self._drain_pending()
+
+
+class FlowTable:
+    """以 4-tuple 為鍵的 TCP 連線表"""
+    
+    def __init__(self, buffer_factory: Callable, idle_timeout: float = 120.0):
+        self.buffer_factory = buffer_factory
+        self.idle_timeout = idle_timeout
+        self.flows: Dict[FlowKey, TcpStream] = {}
+        self.last_eviction = 0.0
+        self.evicted = 0
+    
+    def __len__(self) -> int:
+        return len(self.flows)
+    
+    def get(self, key: FlowKey, now: float) -> TcpStream:
+        """取得（必要時建立）連線狀態"""
+        stream = self.flows.get(key)
+        if stream is None:
+            stream = TcpStream(self.buffer_factory(), now)
+            self.flows[key] = stream
+        stream.last_seen = now
+        return stream
+    
+    def remove(self, key: FlowKey) -> None:
+        """移除已關閉的連線"""
+        self.flows.pop(key, None)
+    
+    def evict_idle(self, now: float) -> int:
+        """移除閒置超時的連線，每個超時週期最多掃描一次"""
+        if now - self.last_eviction < self.idle_timeout:
+            return 0
+        self.last_eviction = now
+        
+        expired = [key for key, stream in self.flows.items()
+                   if now - stream.last_seen > self.idle_timeout]
+        for key in expired:
+            del self.flows[key]
+        self.evicted += len(expired)
+        return len(expired) 
\ No newline at end of file
@@ -3,6 +3,7 @@ import unittest.mock as mock
 import tempfile
 import os
 import json
+import asyncio
 import threading
 import time
 from unittest.mock import patch, MagicMock, mock_open
@@ -10,8 +11,23 @@ import tkinter as tk
 
 # Import the classes to test from new modular structure
 from config import Config
-from data_manager import DataManager
+from data_manager import DataManager, CodeBook, Vocabulary, load_translation_mapping
+from name_index import NameIndex, normalize_name
 from packet_processor import PacketProcessor
+from player import Player
+from profiling import Histogram, StageProfiler
+from roster_delta import RosterEvent, RosterTracker
+from settings import Settings, SettingsStore
+from sighting_store import SightingStore, connect
+from synthetic_traffic import TrafficGenerator
+from tcp_stream import TcpStream, FlowTable
+from packet_decoder import decode_frame, LINKTYPE_ETHERNET
+from pcap_replay import replay
+from packet_queue import PacketQueue, ParserWorker, QueuedSegment
+from async_monitor import AsyncPlayerMonitor
+from bot_score import BotScorer
+from process_worker import ProcessParserWorker, WorkerSource, decode_events, encode_events
+from capture_backend import AFPacketCaptureBackend, ScapyCaptureBackend, create_capture_backend
 from video_recorder import VideoRecorder
 from ui import PlayerMonitorTab, RecordingTab
 from main import ArtaleApplication as Artale_Bot_Reporter
@@ -109,20 +125,74 @@ class TestDataManager(unittest.TestCase):
         
         self.assertEqual(result, '')
     
-    @patch('os.path.exists', return_value=False)  # 避免嘗試載入翻譯檔案
-    @patch('builtins.open', new_callable=mock_open)
-    @patch('json.dump')
-    def test_save_user_config(self, mock_json_dump, mock_file, mock_exists):
-        """Test saving user config"""
-        dm = DataManager()
-        dm.save_user_config('TestCharacter')
+    def test_save_user_config(self):
+        """Test saving user config is deferred and written on flush"""
+        with patch('config.Config.USER_CONFIG_FILE', self.user_config_file):
+            dm = DataManager()
+            dm.save_user_config('TestCharacter')
+            self.assertEqual(dm.load_user_config(), 'TestCharacter')
+            self.assertTrue(dm.settings_store.flush())
+        
+        with open(self.user_config_file, 'r', encoding='utf-8') as f:
+            saved = json.load(f)
+        self.assertEqual(saved['last_character_name'], 'TestCharacter')
+    
+    def test_settings_store_lazy_or_injected(self):
+        """Test DataManager only loads user settings on first use and accepts an injected store"""
+        dm = DataManager(interactive=False)
+        self.assertIsNone(dm._settings_store)
         
-        # 驗證 json.dump 被正確調用
-        mock_json_dump.assert_called_once()
+        store = SettingsStore(self.user_config_file)
+        self.assertIs(DataManager(settings_store=store).settings_store, store)
+    
+    def test_translation_cache_reused_and_invalidated(self):
+        """Test the binary cache skips JSON parsing until the JSON changes"""
+        with open(self.korean_chinese_file, 'w', encoding='utf-8') as f:
+            json.dump({'職業對照': {'전사': '戰士'}, '地圖對照': {'던전1': '地下城1'}}, f, ensure_ascii=False)
+        
+        first = load_translation_mapping(self.korean_chinese_file)
+        self.assertTrue(os.path.exists(self.korean_chinese_file + Config.TRANSLATION_CACHE_SUFFIX))
+        
+        with patch('json.load') as mock_load:
+            cached = load_translation_mapping(self.korean_chinese_file)
+        mock_load.assert_not_called()
+        self.assertEqual(cached, first)
+        
+        with open(self.korean_chinese_file, 'w', encoding='utf-8') as f:
+            json.dump({'職業對照': {'전사': '戰士', '궁수': '弓箭手'}, '地圖對照': {}}, f, ensure_ascii=False)
         
-        # Check that the correct data was passed to json.dump
-        call_args = mock_json_dump.call_args[0]
-        self.assertEqual(call_args[0], {'last_character_name': 'TestCharacter'})
+        updated = load_translation_mapping(self.korean_chinese_file)
+        self.assertEqual(updated['職業對照'], {'전사': '戰士', '궁수': '弓箭手'})
+        self.assertEqual(load_translation_mapping(self.korean_chinese_file), updated)
+    
+    def test_translation_hot_reload(self):
+        """Test a changed translation file is swapped in without a restart"""
+        def write(jobs):
+            with open(self.korean_chinese_file, 'w', encoding='utf-8') as f:
+                json.dump({'職業對照': jobs, '地圖對照': {}}, f, ensure_ascii=False)
+        
+        write({'전사': '戰士'})
+        with patch.object(Config, 'KOREAN_CHINESE_FILE', self.korean_chinese_file):
+            dm = DataManager()
+            code = dm.codebook.jobs.encode('궁수')
+            self.assertEqual(dm.codebook.jobs.translate(code), '궁수')
+            self.assertFalse(dm.check_translation_file())
+            
+            listener = MagicMock()
+            dm.add_reload_listener(listener)
+            write({'전사': '戰士', '궁수': '弓箭手'})
+            os.utime(self.korean_chinese_file, ns=(1, 1))
+            self.assertTrue(dm.check_translation_file())
+            listener.assert_called_once()
+            self.assertEqual(dm.codebook.jobs.translate(code), '弓箭手')
+            self.assertEqual(dm.codebook.jobs.encode('궁수'), code)
+            
+            # 寫到一半的檔案無法解析時保留舊表
+            with open(self.korean_chinese_file, 'w', encoding='utf-8') as f:
+                f.write('{"職業對照": {')
+            self.assertFalse(dm.check_translation_file())
+            self.assertEqual(dm.translate_job('궁수'), '弓箭手')
+            self.assertEqual(dm.reloads, 1)
     
     def test_translate_job(self):
         """Test job translation"""
@@ -139,6 +209,90 @@ class TestDataManager(unittest.TestCase):
         
         self.assertEqual(dm.translate_map('던전1'), '地下城1')
         self.assertEqual(dm.translate_map('unknown'), 'unknown')
+    
+    def test_translate_map_falls_back_to_normalized_index(self):
+        """Test near-miss map names translate through the normalized index"""
+        dm = DataManager()
+        dm.map_map = {'던전1': '地下城1', '필드숲': '野外森林'}
+        
+        self.assertEqual(dm.translate_map('던전１'), '地下城1')
+        self.assertEqual(dm.translate_map(' 필드 숲 '), '野外森林')
+        self.assertEqual(dm.translate_map('던전2'), '던전2')
+    
+    def test_codebook_interns_translation_keys(self):
+        """Test map names are interned to small integer codes at load time"""
+        dm = DataManager()
+        dm.map_map = {'던전1': '地下城1', '필드1': '野外1'}
+        maps = dm.codebook.maps
+        
+        code = maps.encode('던전1')
+        self.assertEqual(maps.encode('던전1'), code)
+        self.assertEqual(maps.translate(code), '地下城1')
+        self.assertEqual(maps.encode_raw(' 필드1 '.encode('utf-8')), maps.encode('필드1'))
+    
+    def test_vocabulary_assigns_codes_to_unknown_names(self):
+        """Test unknown names get new codes and translations are memoized"""
+        translate = MagicMock(side_effect=lambda x: f"zh_{x}")
+        vocab = Vocabulary(translate, ['a'])
+        
+        code = vocab.encode('unknown')
+        self.assertEqual(code, 1)
+        self.assertEqual(vocab.translate(code), 'zh_unknown')
+        self.assertEqual(vocab.translate(code), 'zh_unknown')
+        translate.assert_called_once_with('unknown')
+        
+        vocab.refresh()
+        self.assertEqual(vocab.translate(code), 'zh_unknown')
+        self.assertEqual(translate.call_count, 2)
+    
+    def test_vocabulary_is_bounded(self):
+        """Test the raw-bytes cache is cleared past its cap and extra unknown names share one code"""
+        vocab = Vocabulary(str, ['a'], max_names=3, raw_cache_size=4)
+        for i in range(10):
+            vocab.encode_raw(b'a' + b' ' * i)
+        self.assertLessEqual(len(vocab._raw_codes), 4)
+        self.assertEqual(len(vocab), 1)
+        
+        b = vocab.encode('b')
+        c = vocab.encode('c')
+        self.assertEqual((vocab.encode('d'), vocab.encode('e')), (3, 3))
+        self.assertEqual((vocab.name(3), vocab.overflow, len(vocab)), (Vocabulary.OVERFLOW_NAME, 2, 4))
+        self.assertEqual((vocab.encode('b'), vocab.encode('c')), (b, c))
+
+class TestNameIndex(unittest.TestCase):
+    """Test normalized fuzzy name lookup"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.index = NameIndex({
+            '헤네시스동쪽숲': '弓箭手村東邊森林',
+            '헤네시스': '弓箭手村',
+            '골렘의사원2': '石巨人寺院2',
+            '전사': '戰士',
+        })
+    
+    def test_normalize_name(self):
+        """Test NFKC, whitespace and digit normalization"""
+        self.assertEqual(normalize_name(' 골렘의 사원２ '), '골렘의사원2')
+        self.assertEqual(normalize_name('Ｍａｐ\u0663'), 'map3')
+    
+    def test_lookup_variants(self):
+        """Test whitespace, suffix and spelling variants resolve to known names"""
+        self.assertEqual(self.index.lookup('헤네시스 동쪽숲'), '弓箭手村東邊森林')
+        self.assertEqual(self.index.lookup('골렘의사원２'), '石巨人寺院2')
+        self.assertEqual(self.index.lookup('헤네시스동쪽숲 (1)'), '弓箭手村東邊森林(1)')
+        self.assertEqual(self.index.lookup('헤네시스동쪽술'), '弓箭手村東邊森林')
+        # 數字不同視為不同地圖，太短的名稱不做模糊比對
+        self.assertIsNone(self.index.lookup('골렘의사원3'))
+        self.assertIsNone(self.index.lookup('전자'))
+    
+    def test_misses_are_memoized(self):
+        """Test repeated lookups are served from the bounded cache"""
+        self.index.lookup('없는지도')
+        self.index.lookup('없는지도')
+        info = self.index.lookup.cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+        self.assertEqual(info.maxsize, Config.FUZZY_CACHE_SIZE)
 
 class TestPacketProcessor(unittest.TestCase):
     """Test PacketProcessor class"""
@@ -148,6 +302,8 @@ class TestPacketProcessor(unittest.TestCase):
         self.data_manager = MagicMock()
         self.data_manager.translate_map.side_effect = lambda x: f"zh_{x}"
         self.data_manager.translate_job.side_effect = lambda x: f"zh_{x}"
+        self.data_manager.codebook = CodeBook(self.data_manager.translate_map,
+                                              self.data_manager.translate_job)
         self.processor = PacketProcessor(self.data_manager)
     
     def test_process_packet_data_empty(self):
@@ -189,6 +345,1133 @@ class TestPacketProcessor(unittest.TestCase):
         else:
             # 如果解析失敗，至少測試不會崩潰
             self.assertEqual(len(result), 0)
+    
+    def test_extract_channel_players_fields_and_id_mismatch(self):
+        """Test field extraction, leading slashes and skipping mismatched IDs"""
+        test_data = ("12345678901234567//x/12345678901234567/玩家#12345678901234567/ 地圖 /0/ 70 /職業/"
+                     "22222222222222222/x/22222222222222222/Other#33333333333333333/Map/0/1/Job")
+        packet_data = b'TOZ \x00\x00\x00\x00' + test_data.encode('utf-8')
+        
+        result = self.processor._extract_channel_players(memoryview(packet_data))
+        
+        self.assertEqual([p.to_dict() for p in result], [{
+            'nickname': '玩家',
+            'id': '12345678901234567',
+            'map_zh': 'zh_地圖',
+            'level': '70',
+            'job_zh': 'zh_職業',
+        }])
+    
+    def test_extract_channel_players_non_ascii_id(self):
+        """Test a record whose id field is not ASCII is decoded instead of raising"""
+        odd_id = '편집'.encode('utf-8') + b'\xff'  # 非 ASCII 且不是合法 UTF-8
+        body = (b'12345678901234567/0/' + odd_id + b'/Odd#' + odd_id + b'/Map/0/5/Job/'
+                b'22222222222222222/0/22222222222222222/Next#22222222222222222/Map/0/6/Job')
+        
+        result = self.processor.process_packet_data(b'TOZ ' + len(body).to_bytes(4, 'little') + body)
+        
+        self.assertEqual([(p.id, p.nickname) for p in result],
+                         [('편집', 'Odd'), ('22222222222222222', 'Next')])
+        self.assertEqual(len(self.processor.frame_buffer), 0)
+    
+    def test_extract_channel_players_keeps_legacy_level_text(self):
+        """Test blank, non-numeric and zero-padded levels keep the legacy dict text"""
+        records = []
+        for i, level in enumerate(['', 'abc', '042', ' 7 ', '9']):
+            pid = f"{10000000000000000 + i:017d}"
+            records.append(f"{pid}/0/{pid}/P{i}#{pid}/Map/0/{level}/Job")
+        packet_data = b'TOZ \x00\x00\x00\x00' + '/'.join(records).encode('utf-8')
+        
+        result = self.processor._extract_channel_players(packet_data)
+        
+        self.assertEqual([p.level for p in result], [0, 0, 42, 7, 9])
+        self.assertEqual([p['level'] for p in result], ['', 'abc', '042', '7', '9'])
+        self.assertEqual([p.level_text for p in result], ['', 'abc', '042', None, None])
+        # 原文跨行程傳送後仍保留
+        event = decode_events(encode_events([RosterEvent('joined', result[1])]), self.data_manager.codebook)[0]
+        self.assertEqual(event.player['level'], 'abc')
+    
+    def _build_roster_packet(self, count=2):
+        """Build a complete TOZ roster packet with `count` players"""
+        records = []
+        for i in range(count):
+            pid = f"{10000000000000000 + i:017d}"
+            records.append(f"{pid}/0/{pid}/Player{i}#{pid}/TestMap/0/{30 + i}/TestJob")
+        body = '/'.join(records).encode('utf-8')
+        return b'TOZ ' + len(body).to_bytes(4, 'little') + body
+    
+    def test_process_packet_data_split_across_segments(self):
+        """Test a roster packet reassembled from several small segments"""
+        packet = self._build_roster_packet(3)
+        players = []
+        for i in range(0, len(packet), 7):
+            players.extend(self.processor.process_packet_data(packet[i:i+7]))
+        
+        self.assertEqual([p['nickname'] for p in players], ['Player0', 'Player1', 'Player2'])
+        self.assertEqual(players[2]['level'], '32')
+        self.assertEqual(len(self.processor.frame_buffer), 0)
+    
+    def test_process_packet_data_multiple_packets_in_one_segment(self):
+        """Test two packets and a partial third arriving together"""
+        self.processor.dedupe_rosters = False  # 三份相同名單都要解析
+        packet = self._build_roster_packet(1)
+        result = self.processor.process_packet_data(b'junk' + packet + packet + packet[:10])
+        
+        self.assertEqual(len(result), 2)
+        self.assertEqual(self.processor.data_buffer, packet[:10])
+        
+        result = self.processor.process_packet_data(packet[10:])
+        self.assertEqual(len(result), 1)
+        self.assertEqual(self.processor.data_buffer, b'')
+    
+    def test_synthetic_traffic_round_trip(self):
+        """Test generated rosters survive noise, segmentation and reordering"""
+        generator = TrafficGenerator(seed=7, maps=['지도1', '지도2'], jobs=['전사', '궁수'])
+        roster = generator.roster(50)
+        history = [roster, generator.evolve(roster, churn=0.2)]
+        data = generator.stream(history, noise_frames=2, garbage=16)
+        flow = ('10.0.0.1', 32800, '10.0.0.2', 50000)
+        
+        # 先送 SYN，讓第一個資料段被交換到後面時仍能重組
+        players = self.processor.process_segment(flow, 999, b'', 0.0, syn=True)
+        for seq, payload in generator.segments(data, mss=300, start_seq=1000, reorder=0.2, duplicate=0.1):
+            players.extend(self.processor.process_segment(flow, seq, payload, 0.0))
+        
+        expected = [(r.id, r.nickname, f"zh_{r.map_kr}", r.level, f"zh_{r.job_kr}")
+                    for r in history[0] + history[1]]
+        self.assertEqual([(p.id, p.nickname, p.map_zh, p.level, p.job_zh) for p in players], expected)
+        self.assertEqual(self.processor.frames_dropped, 4)
+    
+    def test_frame_scan_is_incremental(self):
+        """Test that garbage is dropped and bytes are searched only once"""
+        packet = self._build_roster_packet(3)
+        buffer = self.processor.frame_buffer
+        
+        self.processor.process_packet_data(b'x' * 100 + packet[:2])
+        self.assertEqual(self.processor.data_buffer, b'x' + packet[:2])
+        self.assertEqual(buffer.garbage_dropped, 99)
+        
+        self.assertEqual(self.processor.process_packet_data(packet[2:20]), [])
+        self.assertEqual(self.processor.data_buffer, packet[:20])
+        scanned = buffer.bytes_scanned
+        
+        # 標頭已找到，之後的分段不應再被搜尋
+        result = []
+        for i in range(20, len(packet), 7):
+            result.extend(self.processor.process_packet_data(packet[i:i+7]))
+        self.assertEqual(buffer.bytes_scanned, scanned)
+        self.assertEqual(len(result), 3)
+        self.assertEqual(self.processor.data_buffer, b'')
+    
+    def test_oversized_header_resyncs_to_next_frame(self):
+        """Test a corrupt header with a huge length is skipped instead of buffering forever"""
+        packet = self._build_roster_packet(2)
+        bogus = b'TOZ ' + (1 << 31).to_bytes(4, 'little') + b'junk' * 10
+        
+        players = self.processor.process_packet_data(bogus + packet)
+        
+        self.assertEqual(len(players), 2)
+        self.assertEqual(self.processor.data_buffer, b'')
+        counters = self.processor.stats()['counters']
+        self.assertEqual((counters['resyncs'], counters['oversized_headers']), (1, 1))
+        self.assertEqual(counters['bytes_discarded'], len(bogus))
+    
+    def test_buffer_cap_bounds_memory(self):
+        """Test incomplete frames and header-free streams cannot grow the buffer without limit"""
+        from packet_processor import FrameBuffer
+        buffer = FrameBuffer(max_frame_length=4096)
+        self.processor.frame_buffer = buffer
+        
+        # 超過上限的長度直接重新同步；長度合法的封包累積到上限時一定會收齊並被消費
+        self.processor.process_packet_data(b'TOZ ' + (1 << 20).to_bytes(4, 'little'))
+        self.assertEqual(self.processor.oversized_headers, 1)
+        self.processor.process_packet_data(b'TOZ ' + (4096).to_bytes(4, 'little'))
+        for _ in range(50):
+            self.processor.process_packet_data(b'\x00' * 1000)
+            self.assertLessEqual(len(buffer), 4096 + FrameBuffer.HEADER_SIZE + 1000)
+        self.assertEqual(self.processor.frames_dropped, 1)
+        
+        # 完全沒有標頭的資料只保留可能是半個標頭的結尾
+        for _ in range(200):
+            self.processor.process_packet_data(b'\xff' * 1000)
+        self.assertLessEqual(len(buffer.data), FrameBuffer.COMPACT_THRESHOLD + 1000)
+        self.assertEqual(len(self.processor.process_packet_data(self._build_roster_packet(1))), 1)
+    
+    def test_non_roster_frames_dropped_without_parsing(self):
+        """Test frames without roster records are counted and skipped"""
+        body = 'chat/hello#world'.encode('utf-8')
+        chat = b'TOZ ' + len(body).to_bytes(4, 'little') + body
+        packet = self._build_roster_packet(2)
+        
+        handler = MagicMock(wraps=self.processor._extract_channel_players)
+        self.processor.register_handler('roster', handler)
+        result = self.processor.process_packet_data(chat + packet + chat)
+        
+        self.assertEqual(len(result), 2)
+        handler.assert_called_once()
+        self.assertEqual(self.processor.frames_processed, 3)
+        self.assertEqual(self.processor.frames_dropped, 2)
+        self.assertEqual(self.processor.frame_counts, {'roster': 1})
+    
+    def test_roster_probe_limited_to_body_prefix(self):
+        """Test the roster probe only searches the start of the body"""
+        from frame_dispatch import FrameClassifier
+        from packet_processor import ROSTER_PROBE
+        record = b"12345678901234567/0/12345678901234567/Late#12345678901234567/Map/0/5/Job"
+        body = b'chat/' + b'x' * 1000 + b'/' + record
+        frame = b'TOZ ' + len(body).to_bytes(4, 'little') + body
+        
+        windowed = FrameClassifier()
+        windowed.add_rule('roster', probe=ROSTER_PROBE, probe_window=256)
+        unlimited = FrameClassifier()
+        unlimited.add_rule('roster', probe=ROSTER_PROBE)
+        
+        self.assertIsNone(windowed.classify(frame))
+        self.assertEqual(unlimited.classify(frame), 'roster')
+        self.assertEqual(windowed.classify(self._build_roster_packet(1)), 'roster')
+    
+    def test_identical_roster_frames_deduplicated_per_flow(self):
+        """Test byte-identical rosters are skipped only within the same flow"""
+        packet = self._build_roster_packet(2)
+        flow_a = ('10.0.0.1', 32800, '10.0.0.2', 50000)
+        flow_b = ('10.0.0.1', 32800, '10.0.0.3', 50001)
+        
+        self.assertEqual(len(self.processor.process_segment(flow_a, 1000, packet, 0.0)), 2)
+        self.assertEqual(self.processor.process_segment(flow_a, 1000 + len(packet), packet, 0.0), [])
+        self.assertEqual(len(self.processor.process_segment(flow_b, 5000, packet, 0.0)), 2)
+        self.assertEqual(self.processor.dedupe_hits, 1)
+        self.assertEqual(self.processor.dedupe_bytes_skipped, len(packet))
+        
+        changed = self._build_roster_packet(3)
+        self.assertEqual(len(self.processor.process_segment(flow_a, 1000 + 2 * len(packet), changed, 0.0)), 3)
+    
+    def test_stats_snapshot(self):
+        """Test per-stage timings and counters are exposed through stats()"""
+        packet = self._build_roster_packet(2)
+        self.processor.process_packet_data(packet[:10])
+        self.processor.process_packet_data(packet[10:])
+        
+        stats = self.processor.stats()
+        stages = stats['stages']
+        self.assertEqual(stages['buffer']['count'], 2)
+        self.assertEqual(stages['parse:roster']['count'], 1)
+        self.assertEqual(stages['classify']['count'], 1)
+        self.assertGreaterEqual(stages['parse:roster']['max_us'], stages['parse:roster']['p50_us'])
+        self.assertEqual(stats['counters']['frames_processed'], 1)
+        self.assertEqual(stats['counters']['frames:roster'], 1)
+    
+    def test_register_handler(self):
+        """Test custom frame types are routed before the roster rule"""
+        seen = []
+        self.processor.register_handler('chat', lambda frame: seen.append(bytes(frame[8:])),
+                                        prefix=b'chat/')
+        body = 'chat/00000000000000001/0/1/x#1/m/0/1/j'.encode('utf-8')
+        chat = b'TOZ ' + len(body).to_bytes(4, 'little') + body
+        
+        result = self.processor.process_packet_data(chat + self._build_roster_packet(1))
+        self.assertEqual(seen, [body])
+        self.assertEqual(len(result), 1)
+        self.assertEqual(self.processor.frame_counts, {'chat': 1, 'roster': 1})
+    
+    def test_process_segment_interleaved_flows(self):
+        """Test that segments from two connections do not corrupt each other"""
+        packet = self._build_roster_packet(2)
+        flow_a = ('10.0.0.1', 32800, '10.0.0.2', 50000)
+        flow_b = ('10.0.0.1', 32800, '10.0.0.3', 50001)
+        half = len(packet) // 2
+        
+        players = []
+        players += self.processor.process_segment(flow_a, 1000, packet[:half], 1.0)
+        players += self.processor.process_segment(flow_b, 5000, packet[:half], 1.0)
+        players += self.processor.process_segment(flow_a, 1000 + half, packet[half:], 1.1)
+        players += self.processor.process_segment(flow_b, 5000 + half, packet[half:], 1.1)
+        
+        self.assertEqual(len(players), 4)
+        self.assertEqual(len(self.processor.flows), 2)
+    
+    def test_process_segment_out_of_order_and_retransmit(self):
+        """Test reordering by sequence number and dropping retransmissions"""
+        packet = self._build_roster_packet(2)
+        flow = ('10.0.0.1', 32800, '10.0.0.2', 50000)
+        third = len(packet) // 3
+        seq = 4294967000  # 跨越序號回繞
+        
+        players = self.processor.process_segment(flow, seq, b'', 1.0, syn=True)
+        players += self.processor.process_segment(flow, seq + 1 + third, packet[third:2*third], 1.0)
+        players += self.processor.process_segment(flow, seq + 1, packet[:third], 1.0)
+        players += self.processor.process_segment(flow, seq + 1, packet[:third], 1.0)
+        players += self.processor.process_segment(flow, (seq + 1 + 2*third) % (1 << 32), packet[2*third:], 1.0)
+        
+        self.assertEqual([p['nickname'] for p in players], ['Player0', 'Player1'])
+        self.assertEqual(self.processor.flows.flows[flow].duplicates, 1)
+
+class TestPlayer(unittest.TestCase):
+    """Test Player record"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        codebook = CodeBook(lambda x: f"zh_{x}", lambda x: f"zh_{x}")
+        self.player = Player('Tester', '12345678901234567', codebook.maps.encode('지도'), 70,
+                             codebook.jobs.encode('직업'), codebook)
+    
+    def test_dict_compatible_view(self):
+        """Test the read-only dict interface used by older callers"""
+        self.assertEqual(self.player['nickname'], 'Tester')
+        self.assertEqual(self.player['level'], '70')
+        self.assertEqual(self.player['map_zh'], 'zh_지도')
+        self.assertEqual(self.player.job_kr, '직업')
+        self.assertEqual(self.player.level, 70)
+        self.assertIsNone(self.player.get('missing'))
+        self.assertEqual(dict(self.player), self.player.to_dict())
+        with self.assertRaises(KeyError):
+            self.player['missing']
+    
+    def test_immutable(self):
+        """Test that player records cannot be modified"""
+        with self.assertRaises(AttributeError):
+            self.player.level = 71
+
+class TestProfiling(unittest.TestCase):
+    """Test profiling histograms"""
+    
+    def test_histogram_percentiles(self):
+        """Test power-of-two buckets bound the reported percentiles"""
+        histogram = Histogram()
+        for _ in range(90):
+            histogram.record(3e-6)
+        for _ in range(10):
+            histogram.record(0.0015)
+        
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot['count'], 100)
+        self.assertEqual(snapshot['p50_us'], 4.0)
+        self.assertAlmostEqual(snapshot['p99_us'], 1500.0)
+        self.assertAlmostEqual(snapshot['max_us'], 1500.0)
+    
+    def test_reset_keeps_stage_references(self):
+        """Test reset clears histograms in place"""
+        profiler = StageProfiler()
+        stage = profiler.stage('parse')
+        stage.record(0.001)
+        profiler.count('frames')
+        profiler.reset()
+        stage.record(0.002)
+        
+        snapshot = profiler.snapshot()
+        self.assertEqual(snapshot['stages']['parse']['count'], 1)
+        self.assertEqual(snapshot['counters'], {})
+
+class TestRosterTracker(unittest.TestCase):
+    """Test RosterTracker delta events"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.codebook = CodeBook(lambda x: x, lambda x: x)
+        self.tracker = RosterTracker()
+    
+    def _player(self, pid, map_name='A', level=10, job='J', nickname=None):
+        return Player(nickname or f"P{pid}", pid, self.codebook.maps.encode(map_name), level,
+                      self.codebook.jobs.encode(job), self.codebook)
+    
+    def test_join_leave_and_changes(self):
+        """Test joined, left, map, level and job events"""
+        events = self.tracker.update([self._player('1'), self._player('2'), self._player('3')])
+        self.assertEqual([e.kind for e in events], ['joined'] * 3)
+        
+        events = self.tracker.update([
+            self._player('1'),
+            self._player('2', map_name='B', level=11),
+            self._player('4', job='K'),
+        ])
+        kinds = sorted((e.kind, e.player.id) for e in events)
+        self.assertEqual(kinds, [('joined', '4'), ('left', '3'), ('level', '2'), ('map', '2')])
+        level_event = next(e for e in events if e.kind == 'level')
+        self.assertEqual((level_event.previous.level, level_event.player.level), (10, 11))
+        
+        self.assertEqual(self.tracker.update([self._player('1'), self._player('2', map_name='B', level=11),
+                                              self._player('4', job='K')]), [])
+        self.assertEqual(len(self.tracker), 3)
+        self.assertEqual(self.tracker.find_nickname('P4').id, '4')
+    
+    def test_map_and_nickname_indexes_follow_changes(self):
+        """Test the incremental indexes always match a full scan of the roster"""
+        import random
+        rng = random.Random(3)
+        mirror = RosterTracker()
+        roster = {}
+        for _ in range(200):
+            for _ in range(rng.randint(0, 4)):
+                pid = str(rng.randint(1, 30))
+                if rng.random() < 0.3:
+                    roster.pop(pid, None)
+                else:
+                    roster[pid] = self._player(pid, map_name=rng.choice('ABC'), level=rng.randint(1, 3),
+                                               nickname=f"N{pid}{rng.choice('xy')}")
+            mirror.apply(self.tracker.update(list(roster.values())))
+            
+            for tracker in (self.tracker, mirror):
+                for map_name in 'ABCD':
+                    code = self.codebook.maps.encode(map_name)
+                    expected = {p.id for p in roster.values() if p.map_code == code}
+                    self.assertEqual({p.id for p in tracker.on_map(code)}, expected)
+                    self.assertEqual(tracker.map_population(code), len(expected))
+                for player in roster.values():
+                    self.assertEqual(tracker.find_nickname(player.nickname), player)
+                self.assertEqual(len(tracker.by_nickname), len(roster))
+        
+        self.tracker.reset()
+        self.assertEqual((self.tracker.by_map, self.tracker.by_nickname), ({}, {}))
+    
+    def test_apply_events_from_another_tracker(self):
+        """Test applying events reproduces the source tracker's roster"""
+        mirror = RosterTracker()
+        for roster in ([self._player('1'), self._player('2')],
+                       [self._player('2', level=12), self._player('3')]):
+            mirror.apply(self.tracker.update(roster))
+        self.assertEqual(mirror.players, self.tracker.players)
+
+class TestSettings(unittest.TestCase):
+    """Test SettingsStore"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'user_config.json')
+    
+    def tearDown(self):
+        """Clean up test fixtures"""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_legacy_file_and_invalid_values(self):
+        """Test old name-only files load and invalid fields fall back to defaults"""
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump({'last_character_name': 'Old', 'port': 'abc', 'fps': 20}, f)
+        
+        settings = SettingsStore(self.path).settings
+        self.assertEqual(settings.last_character_name, 'Old')
+        self.assertEqual(settings.port, Config.DEFAULT_PORT)
+        self.assertEqual(settings.fps, 20)
+    
+    def test_validation(self):
+        """Test invalid updates raise ValueError and leave settings unchanged"""
+        store = SettingsStore(self.path)
+        for changes in ({'port': 70000}, {'fps': 7}, {'quality': '?'}, {'unknown': 1}):
+            with self.assertRaises(ValueError):
+                store.update(**changes)
+        self.assertEqual(store.settings, Settings())
+        with self.assertRaises(ValueError):
+            store.apply_profile('turbo')
+        store.close()
+    
+    def test_profiles(self):
+        """Test profiles apply their fields and manual edits clear the profile name"""
+        store = SettingsStore(self.path)
+        settings = store.apply_profile('high_fidelity')
+        self.assertEqual((settings.profile, settings.fps, settings.scale), ('high_fidelity', 30, '100%'))
+        self.assertEqual(store.update(fps=20).profile, '')
+        store.close()  # 寫入延遲中的變更，避免計時器在暫存目錄刪除後才觸發
+    
+    def test_debounced_atomic_write(self):
+        """Test several updates coalesce into one background write"""
+        store = SettingsStore(self.path, save_delay=0.05)
+        store.update(last_character_name='A')
+        store.update(port=12345)
+        store.update(last_character_name='B')
+        self.assertFalse(os.path.exists(self.path))
+        
+        deadline = time.time() + 2.0
+        while store.saves == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(store.saves, 1)
+        self.assertEqual(os.listdir(self.temp_dir), ['user_config.json'])
+        self.assertEqual(SettingsStore(self.path).settings, store.settings)
+        self.assertFalse(store.flush())
+
+class TestSightingStore(unittest.TestCase):
+    """Test SightingStore"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'sightings.db')
+        self.codebook = CodeBook(lambda x: x, lambda x: x)
+    
+    def tearDown(self):
+        """Clean up test fixtures"""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def _player(self, pid, map_name='A', level=10):
+        return Player(f"P{pid}", pid, self.codebook.maps.encode(map_name), level,
+                      self.codebook.jobs.encode('J'), self.codebook)
+    
+    def test_schema_and_wal(self):
+        """Test the database uses WAL mode and indexes player, map and time"""
+        SightingStore(self.path).close()
+        conn = connect(self.path)
+        self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        conn.close()
+        self.assertTrue({'idx_sightings_player', 'idx_sightings_map', 'idx_sightings_ts'} <= indexes)
+    
+    def test_batched_writes_and_queries(self):
+        """Test events are written in batches and queried by player and map"""
+        store = SightingStore(self.path, flush_interval=60)
+        tracker = RosterTracker()
+        store.record(tracker.update([self._player('1'), self._player('2')]), 100.0)
+        store.record(tracker.update([self._player('1', map_name='B', level=11)]), 200.0)
+        self.assertEqual(store.written, 0)
+        self.assertTrue(store.flush(timeout=5.0))
+        self.assertEqual(store.written, 5)
+        self.assertEqual(store.batches, 1)
+        
+        history = store.history('1')
+        self.assertEqual([(s.ts, s.map) for s in history][:2], [(200.0, 'B'), (200.0, 'B')])
+        self.assertEqual({s.event for s in history}, {'joined', 'map', 'level'})
+        self.assertEqual([row[:2] for row in store.maps_visited('1')], [('B', 2), ('A', 1)])
+        self.assertEqual({s.player_id for s in store.on_map('A', 0, 150)}, {'1', '2'})
+        store.close()
+    
+    def test_bounded_queue_drops_oldest(self):
+        """Test record never blocks and drops the oldest events past max_pending"""
+        store = SightingStore(self.path, flush_interval=60, batch_size=100, max_pending=2)
+        store.record([RosterTracker().update([self._player('1')])[0]] * 2, 1.0)
+        store.record(RosterTracker().update([self._player('2')]), 2.0)
+        self.assertEqual(store.dropped, 2)
+        store.close()
+        self.assertEqual(store.written, 1)
+        self.assertEqual([s.player_id for s in store.history('2')], ['2'])
+        self.assertEqual(store.history('1'), [])
+        store.record(RosterTracker().update([self._player('3')]))
+        self.assertEqual(store.stats()['sightings_pending'], 0)
+
+
+class TestBotScorer(unittest.TestCase):
+    """Test BotScorer streaming scores"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.codebook = CodeBook(lambda x: x, lambda x: x)
+        self.tracker = RosterTracker()
+        self.scorer = BotScorer(dwell_seconds=100, stagnant_seconds=200, rejoin_seconds=10,
+                                rejoin_count=3, rejoin_half_life=1000, flag_score=60,
+                                sweep_interval=5, state_ttl=50, max_tracked=100)
+    
+    def _player(self, pid, map_name='A', level=10):
+        return Player(f"P{pid}", pid, self.codebook.maps.encode(map_name), level,
+                      self.codebook.jobs.encode('J'), self.codebook)
+    
+    def _roster(self, players, now):
+        return self.scorer.update(self.tracker.update(players), now)
+    
+    def test_dwell_and_stagnation_flag_without_events(self):
+        """Test time-based signals cross thresholds on sweeps and are reported once"""
+        self.assertEqual(self._roster([self._player('1')], 0), [])
+        self.assertEqual(self._roster([self._player('1')], 100), [])
+        self.assertEqual(self.scorer.score('1', 100).score, 55)
+        
+        changes = self._roster([self._player('1')], 200)
+        self.assertEqual([(c.player_id, c.score, c.flagged) for c in changes], [('1', 70, True)])
+        self.assertEqual(len(changes[0].reasons), 2)
+        self.assertTrue(self.scorer.is_flagged('1'))
+        # 時數增加但原因相同，不再重複回報
+        self.assertEqual(self._roster([self._player('1')], 300), [])
+        
+        # 換地圖重新計算停留，升級重新計算停滯
+        changes = self._roster([self._player('1', map_name='B', level=11)], 310)
+        self.assertEqual([(c.flagged, c.score) for c in changes], [(False, 0)])
+    
+    def test_tick_without_events_flags(self):
+        """Test an empty update (the periodic tick) flags a player who never changes"""
+        self._roster([self._player('1')], 0)
+        changes = self.scorer.update((), 250)
+        self.assertEqual([(c.player_id, c.flagged) for c in changes], [('1', True)])
+    
+    def test_headless_tick(self):
+        """Test the headless ticker writes bot_score records in a quiet channel"""
+        import io
+        from headless import StreamClock, _tick_scores
+        self._roster([self._player('1')], 0)
+        clock = StreamClock()
+        clock.sync(250)
+        output = io.StringIO()
+        
+        async def tick():
+            task = asyncio.get_running_loop().create_task(_tick_scores(self.scorer, output, clock, 0.01))
+            await asyncio.sleep(0.1)
+            task.cancel()
+        
+        asyncio.run(tick())
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([(r['event'], r['id'], r['flagged']) for r in records], [('bot_score', '1', True)])
+    
+    def test_rejoins(self):
+        """Test quick leave/rejoin cycles raise the score and long absences reset dwell"""
+        now = 0
+        for _ in range(3):
+            self._roster([self._player('1')], now)
+            self._roster([], now + 1)
+            now += 5
+        changes = self._roster([self._player('1')], now)
+        self.assertEqual(self.scorer.score('1', now).reasons, ('短時間內重新出現 3 次',))
+        self.assertEqual(changes, [])  # 只有重現一項，未達標記分數
+        
+        self._roster([], now + 1)
+        self._roster([self._player('1')], now + 30)
+        self.assertEqual(self.scorer.states['1'].map_since, now + 30)
+    
+    def test_state_is_bounded(self):
+        """Test players gone longer than state_ttl or past max_tracked are evicted"""
+        self.scorer.max_tracked = 10
+        self._roster([self._player(str(i)) for i in range(20)], 0)
+        self._roster([], 10)
+        self.assertEqual(len(self.scorer), 10)
+        self._roster([self._player('x')], 100)
+        self.assertEqual(len(self.scorer), 1)
+        self.assertEqual(self.scorer.stats()['bot_evicted'], 20)
+
+
+class TestTcpStream(unittest.TestCase):
+    """Test TcpStream and FlowTable classes"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.frame_buffer = MagicMock()
+        self.stream = TcpStream(self.frame_buffer, 0.0)
+    
+    def test_in_order_segments(self):
+        """Test segments delivered in order"""
+        self.assertEqual(self.stream.add_segment(100, b'abc'), [b'abc'])
+        self.assertEqual(self.stream.add_segment(103, b'def'), [b'def'])
+    
+    def test_partial_overlap_is_trimmed(self):
+        """Test a retransmission overlapping new data keeps only the new bytes"""
+        self.stream.add_segment(100, b'abc')
+        self.assertEqual(self.stream.add_segment(101, b'bcde'), [b'de'])
+    
+    def test_gap_is_skipped_when_pending_full(self):
+        """Test that a lost segment does not stall the stream forever"""
+        self.stream.add_segment(0, b'a')
+        for i in range(TcpStream.MAX_PENDING_SEGMENTS):
+            self.assertEqual(self.stream.add_segment(10 + i, b'x'), [])
+        
+        chunks = self.stream.add_segment(10 + TcpStream.MAX_PENDING_SEGMENTS, b'x')
+        
+        self.assertEqual(len(chunks), TcpStream.MAX_PENDING_SEGMENTS + 1)
+        self.assertEqual(self.stream.gaps, 1)
+        self.frame_buffer.reset.assert_called_once()
+    
+    def test_idle_flows_evicted(self):
+        """Test that idle flows are removed after the timeout"""
+        table = FlowTable(MagicMock, idle_timeout=10)
+        table.get(('a', 1, 'b', 2), 100.0)
+        table.get(('a', 1, 'c', 3), 105.0)
+        
+        self.assertEqual(table.evict_idle(112.0), 1)
+        self.assertEqual(list(table.flows), [('a', 1, 'c', 3)])
+
+class TestPacketQueue(unittest.TestCase):
+    """Test PacketQueue and ParserWorker classes"""
+    
+    def test_drop_newest_policy(self):
+        """Test that a full queue rejects new items and counts them"""
+        queue = PacketQueue(maxsize=2, policy='drop_newest')
+        
+        self.assertTrue(queue.put(1))
+        self.assertTrue(queue.put(2))
+        self.assertFalse(queue.put(3))
+        
+        self.assertEqual(queue.get_batch(10, timeout=0), [1, 2])
+        stats = queue.stats()
+        self.assertEqual(stats['dropped'], 1)
+        self.assertEqual(stats['max_depth'], 2)
+    
+    def test_drop_oldest_policy(self):
+        """Test that a full queue discards the oldest item"""
+        queue = PacketQueue(maxsize=2, policy='drop_oldest')
+        for item in (1, 2, 3):
+            queue.put(item)
+        
+        self.assertEqual(queue.get_batch(1, timeout=0), [2])
+        self.assertEqual(queue.get_batch(10, timeout=0), [3])
+        self.assertEqual(queue.stats()['dropped'], 1)
+    
+    def test_invalid_policy(self):
+        """Test that an unknown overflow policy is rejected"""
+        with self.assertRaises(ValueError):
+            PacketQueue(policy='unknown')
+    
+    def test_worker_parses_queued_segments(self):
+        """Test that the worker drains the queue into the processor"""
+        data_manager = MagicMock()
+        data_manager.codebook = CodeBook(str, str)
+        processor = PacketProcessor(data_manager)
+        record = "12345678901234567/0/12345678901234567/Queued#12345678901234567/Map/0/9/Job"
+        body = record.encode('utf-8')
+        packet = b'TOZ ' + len(body).to_bytes(4, 'little') + body
+        
+        received = []
+        done = threading.Event()
+        queue = PacketQueue(maxsize=16)
+        worker = ParserWorker(queue, processor, lambda players: (received.extend(players), done.set()))
+        worker.start()
+        try:
+            flow = ('10.0.0.1', 32800, '10.0.0.2', 50000)
+            queue.put(QueuedSegment(1.0, flow, 10, 0x18, packet[:12]))
+            queue.put(QueuedSegment(1.0, flow, 22, 0x18, packet[12:]))
+            self.assertTrue(done.wait(2))
+        finally:
+            worker.stop()
+        
+        self.assertEqual([p.nickname for p in received], ['Queued'])
+
+def build_tcp_frame(seq, payload, sport=32800, dport=50000):
+    """Build an Ethernet/IPv4/TCP frame with trailing Ethernet padding"""
+    import struct
+    tcp = struct.pack('>HHIIBBHHH', sport, dport, seq, 0, 5 << 4, 0x18, 65535, 0, 0) + payload
+    ip = struct.pack('>BBHHHBBH4s4s', 0x45, 0, 20 + len(tcp), 0, 0, 64, 6, 0,
+                     bytes([10, 0, 0, 1]), bytes([10, 0, 0, 2])) + tcp
+    return b'\x00' * 12 + b'\x08\x00' + ip + b'\x00' * 6
+
+def write_pcap(directory, frames):
+    """Write frames to a little-endian microsecond pcap file"""
+    import struct
+    path = os.path.join(directory, 'test.pcap')
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<IHHiIII', 0xA1B2C3D4, 2, 4, 0, 0, 65535, LINKTYPE_ETHERNET))
+        for i, frame in enumerate(frames):
+            f.write(struct.pack('<IIII', 1000 + i, 0, len(frame), len(frame)))
+            f.write(frame)
+    return path
+
+class TestPcapReplay(unittest.TestCase):
+    """Test packet_decoder and pcap_replay modules"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.data_manager = MagicMock()
+        self.data_manager.translate_map.side_effect = lambda x: f"zh_{x}"
+        self.data_manager.translate_job.side_effect = lambda x: f"zh_{x}"
+        self.data_manager.codebook = CodeBook(self.data_manager.translate_map,
+                                              self.data_manager.translate_job)
+    
+    def tearDown(self):
+        """Clean up test fixtures"""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_decode_frame_strips_padding(self):
+        """Test that decoding uses the IP total length and ignores padding"""
+        segment = decode_frame(LINKTYPE_ETHERNET, build_tcp_frame(7, b'hello'))
+        
+        self.assertEqual(segment.flow_key, ('10.0.0.1', 32800, '10.0.0.2', 50000))
+        self.assertEqual(segment.seq, 7)
+        self.assertEqual(bytes(segment.payload), b'hello')
+    
+    def test_replay_pcap_writes_rosters(self):
+        """Test replaying a pcap file through the processor"""
+        import io
+        record = "12345678901234567/0/12345678901234567/Replay#12345678901234567/TestMap/0/42/TestJob"
+        body = record.encode('utf-8')
+        packet = b'TOZ ' + len(body).to_bytes(4, 'little') + body
+        frames = [
+            build_tcp_frame(100, packet[:20]),
+            build_tcp_frame(100 + 20, packet[20:]),
+            build_tcp_frame(1, b'ignored', sport=80, dport=1234),
+        ]
+        output = io.BytesIO()
+        
+        stats = replay(write_pcap(self.temp_dir, frames), PacketProcessor(self.data_manager), output=output)
+        
+        self.assertEqual(stats.packets, 3)
+        self.assertEqual(stats.tcp_segments, 2)
+        self.assertEqual(stats.frames, 1)
+        self.assertEqual(stats.players, 1)
+        line = json.loads(output.getvalue().decode('utf-8'))
+        self.assertEqual(line['players'][0]['nickname'], 'Replay')
+
+class TestAsyncPlayerMonitor(unittest.TestCase):
+    """Test AsyncPlayerMonitor streaming API"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.data_manager = MagicMock()
+        self.data_manager.codebook = CodeBook(lambda x: f"zh_{x}", lambda x: f"zh_{x}")
+        self.processor = PacketProcessor(self.data_manager)
+    
+    def _roster(self, *players):
+        records = [f"{pid}/0/{pid}/{nick}#{pid}/TestMap/0/{level}/TestJob" for pid, nick, level in players]
+        body = '/'.join(records).encode('utf-8')
+        return b'TOZ ' + len(body).to_bytes(4, 'little') + body
+    
+    def test_events_from_payloads(self):
+        """Test joined and changed events stream until input finishes"""
+        a, b = '10000000000000001', '10000000000000002'
+        
+        async def run():
+            async with AsyncPlayerMonitor(self.processor, queue_size=1, event_queue_size=1) as monitor:
+                async def produce():
+                    await monitor.feed_payload(self._roster((a, 'A', 10), (b, 'B', 20)), 1.0)
+                    await monitor.feed_payload(self._roster((a, 'A', 11)), 2.0)
+                    await monitor.finish()
+                
+                producer = asyncio.ensure_future(produce())
+                events = [(e.timestamp, e.kind, e.player.nickname) async for e in monitor.events()]
+                await producer
+                return events, monitor.stats()
+        
+        events, stats = asyncio.run(run())
+        self.assertEqual(events[:2], [(1.0, 'joined', 'A'), (1.0, 'joined', 'B')])
+        self.assertEqual(sorted(events[2:]), [(2.0, 'left', 'B'), (2.0, 'level', 'A')])
+        self.assertEqual(stats['segments_processed'], 2)
+        self.assertEqual(stats['events_emitted'], 4)
+    
+    def test_stop_ends_waiting_consumer(self):
+        """Test a consumer waiting in events() exits after stop()"""
+        
+        async def run():
+            monitor = AsyncPlayerMonitor(self.processor, event_queue_size=1)
+            monitor.start()
+            await monitor.feed_payload(self._roster(('10000000000000001', 'A', 10)), 1.0)
+            
+            async def consume():
+                return [e.kind async for e in monitor.events()]
+            
+            consumer = asyncio.ensure_future(consume())
+            await asyncio.sleep(0.05)
+            await monitor.stop()
+            return await asyncio.wait_for(consumer, 1.0)
+        
+        self.assertEqual(asyncio.run(run()), ['joined'])
+    
+    def test_stop_releases_blocked_feeders(self):
+        """Test feed() callers waiting on a full segment queue return after stop()"""
+        
+        async def run():
+            # 沒有人取用事件：解析卡在事件佇列，資料段佇列隨即填滿
+            monitor = AsyncPlayerMonitor(self.processor, queue_size=1, event_queue_size=1)
+            monitor.start()
+            feeders = [asyncio.ensure_future(monitor.feed_payload(
+                self._roster((f"1000000000000000{i}", f"P{i}", 10)), float(i))) for i in range(6)]
+            await asyncio.sleep(0.1)
+            blocked = sum(not f.done() for f in feeders)
+            await monitor.stop()
+            await asyncio.wait_for(asyncio.gather(*feeders), 1.0)
+            return blocked
+        
+        self.assertGreater(asyncio.run(run()), 0)
+    
+    def test_parsing_does_not_block_event_loop(self):
+        """Test a slow parse runs off the event loop so other coroutines keep running"""
+        processor = MagicMock()
+        processor.process_packet_data.side_effect = lambda payload: time.sleep(0.3) or []
+        
+        async def run():
+            ticks = 0
+            
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+            
+            async with AsyncPlayerMonitor(processor) as monitor:
+                async def consume():
+                    return [e async for e in monitor.events()]
+                
+                task = asyncio.ensure_future(ticker())
+                await monitor.feed_payload(b'slow', 1.0)
+                await monitor.finish()
+                await asyncio.wait_for(consume(), 2.0)
+                task.cancel()
+            return ticks
+        
+        self.assertGreater(asyncio.run(run()), 5)
+    
+    def test_replay_pcap(self):
+        """Test a pcap file can be used as the event source"""
+        temp_dir = tempfile.mkdtemp()
+        packet = self._roster(('12345678901234567', 'Replay', 42))
+        path = write_pcap(temp_dir, [build_tcp_frame(100, packet[:20]), build_tcp_frame(120, packet[20:])])
+        
+        async def run():
+            async with AsyncPlayerMonitor(self.processor) as monitor:
+                replay_task = asyncio.ensure_future(monitor.replay_pcap(path))
+                events = [e async for e in monitor.events()]
+                await replay_task
+                return events
+        
+        try:
+            events = asyncio.run(run())
+        finally:
+            import shutil
+            shutil.rmtree(temp_dir, ignore_errors=True)
+        self.assertEqual([(e.kind, e.player.nickname, e.timestamp) for e in events],
+                         [('joined', 'Replay', 1001.0)])
+    
+    def test_cancellation(self):
+        """Test a blocked consumer and the parser task cancel cleanly"""
+        async def run():
+            monitor = AsyncPlayerMonitor(self.processor)
+            monitor.start()
+            parser_task = monitor._parser_task
+            
+            async def consume():
+                return [e async for e in monitor.events()]
+            
+            consumer = asyncio.ensure_future(consume())
+            await asyncio.sleep(0)
+            consumer.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await consumer
+            await monitor.stop()
+            return parser_task
+        
+        parser_task = asyncio.run(run())
+        self.assertTrue(parser_task.cancelled())
+
+class TestProcessWorker(unittest.TestCase):
+    """Test the child-process capture and parse worker"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.codebook = CodeBook(lambda x: f"zh_{x}", lambda x: f"zh_{x}")
+    
+    def tearDown(self):
+        """Clean up test fixtures"""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def _roster(self, level):
+        record = f"12345678901234567/0/12345678901234567/Child#12345678901234567/TestMap/0/{level}/TestJob"
+        body = record.encode('utf-8')
+        return b'TOZ ' + len(body).to_bytes(4, 'little') + body
+    
+    def test_encode_decode_round_trip(self):
+        """Test events cross the pipe as plain tuples and decode with the local codebook"""
+        other = CodeBook(str, str)
+        other.maps.encode('Unused')
+        player = Player('Nick', '1', other.maps.encode('Map'), 30, other.jobs.encode('Job'), other)
+        tracker = RosterTracker()
+        
+        records = encode_events(tracker.update([player]))
+        self.assertEqual(records, [('joined', 'Nick', '1', 'Map', 30, 'Job', None)])
+        event = decode_events(records, self.codebook)[0]
+        self.assertEqual((event.kind, event.player.map_zh, event.player.job_zh), ('joined', 'zh_Map', 'zh_Job'))
+        
+        # previous 不跨行程傳送
+        changed = decode_events(encode_events(tracker.update([player._replace(level=31)])), self.codebook)
+        self.assertEqual((changed[0].kind, changed[0].player.level, changed[0].previous), ('level', 31, None))
+    
+    def test_restart_clears_ui_roster(self):
+        """Test restarting the child resets the UI roster and drops events from the old child"""
+        tab = PlayerMonitorTab.__new__(PlayerMonitorTab)
+        tab.roster = RosterTracker()
+        tab.players_tree = MagicMock()
+        tab.players_tree.get_children.return_value = []
+        tab.data_manager = MagicMock(codebook=self.codebook)
+        tab.profiler = StageProfiler()
+        tab.process_worker = MagicMock()
+        tab.process_generation = 0
+        tab.shown_map_code = 1
+        tab.my_id = '1'
+        tab.log_message = lambda msg: None
+        tab._set_status_light = lambda on: None
+        tab._apply_events = MagicMock()
+        tab.bot_scorer = BotScorer()
+        old = tab.process_worker
+        tab.bot_scorer.update(tab.roster.update([Player('Old', '9', self.codebook.maps.encode('Map'), 1,
+                                                        self.codebook.jobs.encode('Job'), self.codebook)]), 0.0)
+        
+        with patch('ui.player_monitor.ProcessParserWorker') as worker_class:
+            tab._start_process_worker('eth0', 'eth0', Settings())
+        old.stop.assert_called_once()
+        worker_class.return_value.start.assert_called_once()
+        self.assertEqual((len(tab.roster), tab.shown_map_code, tab.my_id), (0, None, ''))
+        self.assertEqual(tab.bot_scorer.stats()['bot_online'], 0)  # 中斷期間離開的玩家不會繼續累積停留時間
+        
+        tab._update_events([], time.time(), time.perf_counter(), generation=0)
+        tab._apply_events.assert_not_called()
+        tab._update_events([], time.time(), time.perf_counter(), generation=1)
+        tab._apply_events.assert_called_once()
+    
+    def test_pcap_source_in_child_process(self):
+        """Test the child parses a pcap and streams roster events back"""
+        first, second = self._roster(42), self._roster(43)
+        path = write_pcap(self.temp_dir, [
+            build_tcp_frame(100, first[:20]),
+            build_tcp_frame(120, first[20:]),
+            build_tcp_frame(100 + len(first), second),
+        ])
+        received = []
+        worker = ProcessParserWorker(self.codebook, lambda events, captured: received.append((events, captured)),
+                                     WorkerSource(pcap=path))
+        started = time.time()
+        worker.start()
+        try:
+            self.assertTrue(worker.wait(30))
+        finally:
+            worker.stop()
+        
+        kinds = [(e.kind, e.player.nickname, e.player.level) for events, _ in received for e in events]
+        self.assertEqual(kinds, [('joined', 'Child', 42), ('level', 'Child', 43)])
+        self.assertTrue(all(captured >= started for _, captured in received))
+        stats = worker.stats()
+        self.assertEqual(stats['counters']['frames:roster'], 2)
+        self.assertEqual(stats['counters']['ipc_events'], 2)
+        self.assertEqual(worker.profiler.snapshot()['stages']['ipc']['count'], 2)
+
+class TestHeadless(unittest.TestCase):
+    """Test the headless entry point"""
+    
+    def setUp(self):
+        """Set up test fixtures"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.output = os.path.join(self.temp_dir, 'events.jsonl')
+        record = "12345678901234567/0/12345678901234567/Headless#12345678901234567/TestMap/0/42/TestJob"
+        body = record.encode('utf-8')
+        packet = b'TOZ ' + len(body).to_bytes(4, 'little') + body
+        self.pcap = write_pcap(self.temp_dir, [
+            build_tcp_frame(100, packet[:20]),
+            build_tcp_frame(120, packet[20:]),
+        ])
+    
+    def tearDown(self):
+        """Clean up test fixtures"""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def _command(self, *args):
+        """Run main.py --headless in a child and report which GUI modules got imported"""
+        import sys
+        script = (
+            "import runpy, sys\n"
+            "sys.argv = ['main.py', '--headless'] + sys.argv[1:]\n"
+            "try:\n"
+            "    runpy.run_path('main.py', run_name='__main__')\n"
+            "except SystemExit as e:\n"
+            "    code = e.code\n"
+            "loaded = [m for m in ('tkinter', 'cv2', 'pygetwindow') if m in sys.modules]\n"
+            "sys.stderr.write('LOADED=' + ','.join(loaded) + '\\n')\n"
+            "sys.exit(code)\n"
+        )
+        return [sys.executable, '-c', script, '--output', self.output, '--pcap', self.pcap] + list(args)
+    
+    def test_pcap_to_jsonl_without_gui_modules(self):
+        """Test headless mode writes JSONL events and never imports tkinter, cv2 or pygetwindow"""
+        import subprocess
+        result = subprocess.run(self._command(), cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, timeout=60)
+        
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn('LOADED=\n', result.stderr)
+        with open(self.output, 'r', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([(r['event'], r['nickname'], r['level']) for r in records],
+                         [('joined', 'Headless', '42')])
+    
+    @unittest.skipIf(os.name == 'nt', "SIGTERM cannot be delivered to a child on Windows")
+    def test_sigterm_exits_cleanly(self):
+        """Test SIGTERM stops a running headless monitor with exit code 0"""
+        import signal
+        import subprocess
+        # 兩個封包間隔 1 秒，以千分之一倍速播放時會一直等待
+        process = subprocess.Popen(self._command('--speed', '0.001'),
+                                   cwd=os.path.dirname(os.path.abspath(__file__)),
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        deadline = time.time() + 30
+        while not os.path.exists(self.output) and time.time() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.2)
+        process.send_signal(signal.SIGTERM)
+        _, stderr = process.communicate(timeout=30)
+        
+        self.assertEqual(process.returncode, 0, stderr)
+        self.assertIn('"segments_processed"', stderr)
+
+class TestCaptureBackend(unittest.TestCase):
+    """Test capture backends"""
+    
+    def test_af_packet_handle_frame_filters_port(self):
+        """Test the raw-socket backend decodes headers and filters by port"""
+        segments = []
+        backend = AFPacketCaptureBackend('eth0', 32800, segments.append)
+        
+        self.assertTrue(backend.handle_frame(build_tcp_frame(5, b'payload'), 12.5))
+        self.assertFalse(backend.handle_frame(build_tcp_frame(5, b'other', sport=80, dport=81), 12.5))
+        
+        self.assertEqual(len(segments), 1)
+        segment = segments[0]
+        self.assertEqual(segment.flow_key, ('10.0.0.1', 32800, '10.0.0.2', 50000))
+        self.assertEqual(segment.timestamp, 12.5)
+        self.assertEqual(bytes(segment.payload), b'payload')
+    
+    def test_create_capture_backend(self):
+        """Test backend selection and scapy fallback"""
+        with patch.object(AFPacketCaptureBackend, 'available', return_value=False), \
+                patch.object(ScapyCaptureBackend, 'start'):
+            backend = create_capture_backend('auto', None, 32800, lambda s: None)
+            backend.start()
+            self.assertIsInstance(backend.backend, ScapyCaptureBackend)
+            with self.assertRaises(RuntimeError):
+                create_capture_backend('af_packet', None, 32800, lambda s: None)
+        
+        with self.assertRaises(ValueError):
+            create_capture_backend('unknown', None, 32800, lambda s: None)
+    
+    def test_af_packet_kernel_filter(self):
+        """Test the BPF program keeps only TCP segments on the monitored port"""
+        import socket
+        segments = []
+        backend = AFPacketCaptureBackend('lo', 45678, segments.append)
+        delivered = []
+        handle_frame = backend.handle_frame
+        backend.handle_frame = lambda data, timestamp, raw_ip=False: delivered.append(
+            handle_frame(data, timestamp, raw_ip))
+        try:
+            backend.start()
+        except (PermissionError, OSError) as e:
+            self.skipTest(f"AF_PACKET unavailable: {e}")
+        
+        server = socket.socket()
+        noise = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            server.bind(('127.0.0.1', 45678))
+            server.listen()
+            client = socket.create_connection(('127.0.0.1', 45678))
+            conn, _ = server.accept()
+            for _ in range(20):
+                noise.sendto(b'noise', ('127.0.0.1', 9))
+            client.sendall(b'roster')
+            conn.recv(16)
+            time.sleep(0.3)
+            client.close()
+            conn.close()
+        finally:
+            backend.stop()
+            server.close()
+            noise.close()
+        
+        self.assertTrue(delivered)
+        self.assertTrue(all(delivered))  # 非目標埠的封包在核心內就被丟棄
+        self.assertIn(b'roster', [bytes(s.payload) for s in segments])
+    
+    def test_auto_falls_back_when_af_packet_start_fails(self):
+        """Test 'auto' switches to scapy when opening the raw socket is not permitted"""
+        with patch.object(AFPacketCaptureBackend, 'available', return_value=True), \
+                patch.object(AFPacketCaptureBackend, 'start', side_effect=PermissionError(1, 'Operation not permitted')), \
+                patch.object(ScapyCaptureBackend, 'start') as scapy_start, \
+                patch('builtins.print'):
+            backend = create_capture_backend('auto', 'eth0', 32800, lambda s: None)
+            backend.start()
+        
+        scapy_start.assert_called_once()
+        self.assertEqual(backend.name, 'scapy')
+        self.assertEqual((backend.backend.iface, backend.backend.port), ('eth0', 32800))
+        self.assertEqual(backend.packets, 0)
 
 class TestVideoRecorder(unittest.TestCase):
     """Test VideoRecorder class"""
@@ -332,7 +1615,21 @@ if __name__ == '__main__':
     test_classes = [
         TestConfig,
         TestDataManager,
+        TestNameIndex,
         TestPacketProcessor,
+        TestPlayer,
+        TestProfiling,
+        TestRosterTracker,
+        TestSettings,
+        TestSightingStore,
+        TestBotScorer,
+        TestTcpStream,
+        TestPacketQueue,
+        TestPcapReplay,
+        TestAsyncPlayerMonitor,
+        TestProcessWorker,
+        TestHeadless,
+        TestCaptureBackend,
         TestVideoRecorder,
         TestIntegration
     ]
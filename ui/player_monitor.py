@@ -3,13 +3,23 @@
 處理玩家監控相關的使用者介面
 """
 
+import sys
+import time
 import tkinter as tk
 from tkinter import scrolledtext, ttk, messagebox
-from scapy.all import AsyncSniffer, TCP, get_working_ifaces
-from typing import List, Dict
+from scapy.all import get_working_ifaces
+from typing import List
+from bot_score import BotScore, BotScorer
 from config import Config
 from data_manager import DataManager
 from packet_processor import PacketProcessor
+from packet_queue import PacketQueue, ParserWorker
+from process_worker import ProcessParserWorker, WorkerSource
+from capture_backend import create_capture_backend
+from player import Player
+from profiling import StageProfiler, format_stats
+from roster_delta import JOINED, LEFT, RosterEvent, RosterTracker
+from sighting_store import SightingStore
 
 
 
@@ -21,16 +31,36 @@ class PlayerMonitorTab:
         self.data_manager = data_manager
         self.packet_processor = packet_processor
         self.my_name = ""
+        self.my_id = ""
         self.my_current_map = ""
-        self.sniffer = None
+        self.capture = None
+        self.packet_queue = None
+        self.parser_worker = None
+        self.process_worker = None  # Config.PARSER_MODE == 'process' 時的解析子行程
+        self.process_generation = 0  # 每次重新啟動子行程加一，丟棄舊子行程尚未套用的事件
+        self.roster = RosterTracker()
+        self.sightings = self._open_sighting_store()
+        self.bot_scorer = BotScorer()
+        self.shown_map_code = None  # 表格目前顯示的地圖代碼（None 表示需要重建）
+        self.profiler = StageProfiler()  # 介面端（GUI 轉送與表格更新）的耗時統計
+        self.diagnostics_job = None
+        self.heartbeat_job = None
+        self.bot_tick_job = None
+        self.recording_active = lambda: False  # 由主視窗設定，用來區分錄影中與否的介面卡頓次數
         self.iface_map = {}
         self.iface_displayname = []
         self.iface_list = self._create_iface_list()
         
-        # 載入上次的角色名稱
+        # 載入上次的設定（角色名稱、網卡、埠號）
+        self.settings_store = self.data_manager.settings_store
         self.last_character_name = self.data_manager.load_user_config()
         
         self._create_widgets()
+        self._schedule_heartbeat(time.perf_counter())
+        self._schedule_bot_tick()
+        
+        # 翻譯表重新載入後以新翻譯重建表格
+        self.data_manager.add_reload_listener(lambda: self.parent.after(0, self._on_translations_reloaded))
     
     def _create_widgets(self):
         """創建玩家監控UI元件"""
@@ -51,7 +81,10 @@ class PlayerMonitorTab:
         self.iface_var = tk.StringVar()
         self.iface_combo = ttk.Combobox(name_frame, textvariable=self.iface_var,values=self.iface_displayname, state='readonly')
         self.iface_combo.pack(fill='x', pady=(5, 10))
-        if self.iface_displayname:
+        last_iface = self.settings_store.settings.iface
+        if last_iface in self.iface_displayname:
+            self.iface_combo.set(last_iface)
+        elif self.iface_displayname:
             #預設抓第一個
             self.iface_combo.current(0)
         ttk.Button(name_frame, text="🔍 開始監控", command=self._set_character_name).pack(anchor='e')
@@ -67,6 +100,9 @@ class PlayerMonitorTab:
         
         # 日誌區域
         self._create_log_area()
+        
+        # 診斷面板（預設隱藏）
+        self._create_diagnostics_panel()
     
     def _create_status_display(self, parent):
         """創建狀態顯示元件"""
@@ -122,6 +158,7 @@ class PlayerMonitorTab:
         
         # 配置玩家自己的行樣式
         self.players_tree.tag_configure('myself', background='#E8F4FD')
+        self.players_tree.tag_configure('suspicious', foreground='#C0392B')
     
     def _create_context_menu(self):
         """創建右鍵選單"""
@@ -133,6 +170,8 @@ class PlayerMonitorTab:
         self.context_menu.add_command(label="複製職業", command=lambda: self._copy_cell_data('職業'))
         self.context_menu.add_separator()
         self.context_menu.add_command(label="複製整列", command=self._copy_entire_row)
+        self.context_menu.add_command(label="查詢出現紀錄", command=self._show_sighting_history)
+        self.context_menu.add_command(label="查看可疑度", command=self._show_bot_score)
     
     def _create_log_area(self):
         """創建日誌顯示區域"""
@@ -141,6 +180,98 @@ class PlayerMonitorTab:
         
         self.log = scrolledtext.ScrolledText(log_frame, state='disabled', wrap='word', height=6)
         self.log.pack(fill='both', expand=True)
+    
+    def _create_diagnostics_panel(self):
+        """創建診斷面板：各處理階段的次數與耗時"""
+        self.diagnostics_var = tk.BooleanVar(value=Config.SHOW_DIAGNOSTICS)
+        ttk.Checkbutton(self.parent, text="顯示診斷資訊", variable=self.diagnostics_var,
+                        command=self._toggle_diagnostics).pack(anchor='w', padx=10)
+        
+        self.diagnostics_frame = ttk.LabelFrame(self.parent, text="診斷資訊", padding=5)
+        self.diagnostics_text = tk.Text(self.diagnostics_frame, height=14, font=('Consolas', 9),
+                                        state='disabled', wrap='none')
+        self.diagnostics_text.pack(fill='both', expand=True)
+        self._toggle_diagnostics()
+    
+    def _toggle_diagnostics(self):
+        """顯示或隱藏診斷面板"""
+        if self.diagnostics_var.get():
+            self.diagnostics_frame.pack(fill='x', padx=10, pady=(0, 10))
+            self._refresh_diagnostics()
+        else:
+            self.diagnostics_frame.pack_forget()
+            if self.diagnostics_job:
+                self.parent.after_cancel(self.diagnostics_job)
+                self.diagnostics_job = None
+    
+    def _refresh_diagnostics(self):
+        """更新診斷面板內容（面板顯示時定期執行）"""
+        self.diagnostics_job = None
+        if not self.diagnostics_var.get():
+            return
+        
+        lines = self.diagnostics_lines()
+        self.diagnostics_text.configure(state='normal')
+        self.diagnostics_text.delete('1.0', 'end')
+        self.diagnostics_text.insert('end', '\n'.join(lines))
+        self.diagnostics_text.configure(state='disabled')
+        self.diagnostics_job = self.parent.after(Config.DIAGNOSTICS_REFRESH_MS, self._refresh_diagnostics)
+    
+    def _schedule_heartbeat(self, now: float):
+        """排程下一次主迴圈心跳"""
+        interval = Config.GUI_HEARTBEAT_MS / 1000
+        self.heartbeat_job = self.parent.after(
+            Config.GUI_HEARTBEAT_MS, lambda: self._heartbeat(now + interval))
+    
+    def _schedule_bot_tick(self):
+        """排程下一次定時評分"""
+        self.bot_tick_job = self.parent.after(int(Config.BOT_SWEEP_INTERVAL * 1000), self._bot_tick)
+    
+    def _bot_tick(self):
+        """定時評分：頻道沒有變動（名單封包被去重）時，停留與停滯時間仍會持續累積"""
+        scores = self.bot_scorer.update((), time.time())
+        if scores and self.shown_map_code is not None:
+            self._apply_bot_scores(scores)
+        self._schedule_bot_tick()
+    
+    def _heartbeat(self, expected: float):
+        """量測主迴圈的延遲：心跳晚到超過 GUI_STALL_MS 視為一次卡頓（錄影中與否分開計算）"""
+        now = time.perf_counter()
+        lag = max(0.0, now - expected)
+        self.profiler.record('gui_lag', lag)
+        if lag * 1000 >= Config.GUI_STALL_MS:
+            self.profiler.count('gui_stalls:recording' if self.recording_active() else 'gui_stalls:idle')
+        self._schedule_heartbeat(now)
+    
+    def stats(self):
+        """解析端與介面端的統計快照"""
+        if self.process_worker:
+            # 解析在子行程進行，使用子行程回報的統計
+            snapshot = self.process_worker.stats()
+        else:
+            snapshot = self.packet_processor.stats()
+        ui = self.profiler.snapshot()
+        snapshot['stages'].update(ui['stages'])
+        snapshot['counters'].update(ui['counters'])
+        snapshot['counters'].update(self.bot_scorer.stats())
+        if self.packet_queue and not self.process_worker:
+            snapshot['queue'] = self.packet_queue.stats()
+        if self.capture:
+            snapshot['counters']['captured'] = self.capture.packets
+        return snapshot
+    
+    def diagnostics_lines(self) -> List[str]:
+        """診斷面板的文字內容"""
+        snapshot = self.stats()
+        lines = format_stats(snapshot['stages'])
+        lines.append('')
+        lines.append('  '.join(f"{name}={value}" for name, value in snapshot['counters'].items()))
+        queue = snapshot.get('queue')
+        if queue:
+            lines.append(f"佇列深度 {queue['depth']} (最大 {queue['max_depth']})  "
+                         f"已丟棄 {queue['dropped']}  "
+                         f"平均放入 {queue['avg_enqueue_latency'] * 1e6:.1f}µs")
+        return lines
         
     def _create_iface_list(self):
         """取得所有網卡並加入下拉選單"""
@@ -148,39 +279,82 @@ class PlayerMonitorTab:
         for iface in get_working_ifaces():
             iface_names.append(iface.name)
             print(f"{iface.name} | {iface.description} | {iface.guid}")
-            self.iface_map[iface.name] = "\\Device\\NPF_"+iface.guid
+            # Windows 以 NPF 裝置路徑指定網卡，其他平台直接使用網卡名稱
+            self.iface_map[iface.name] = "\\Device\\NPF_"+iface.guid if sys.platform == 'win32' else iface.name
         self.iface_displayname = iface_names
     
     def _start_packet_monitoring(self):
         """開始封包監控"""
         selected_iface_name = self.iface_var.get()
         iface_guid = self.iface_map.get(selected_iface_name)
-        if self.sniffer and self.sniffer.thread and self.sniffer.thread.is_alive():
+        if self.capture and self.capture.running:
             self.log_message(f"已停止 封包監控 監控網卡:{selected_iface_name}|{iface_guid}")
-            self.sniffer.stop()
+            self.capture.stop()
+        settings = self.settings_store.settings
+        if Config.PARSER_MODE == 'process':
+            self._start_process_worker(iface_guid, selected_iface_name, settings)
+            return
+        self._start_parser_worker()
         try:
-            self.sniffer = AsyncSniffer(
-                iface=iface_guid,
-                filter=f'tcp port {Config.DEFAULT_PORT}',
-                prn=self._process_packet,
-                store=False
+            # 擷取後端只負責把資料段放入佇列
+            self.capture = create_capture_backend(
+                settings.capture_backend, iface_guid, settings.port, self.packet_queue.put
             )
-            self.sniffer.start()
+            self.capture.start()
             self._set_status_light(True)
-            self.log_message(f"🟢 封包監控已啟動 (TCP {Config.DEFAULT_PORT}) 監控網卡:{selected_iface_name}|{iface_guid}")
+            self.log_message(f"🟢 封包監控已啟動 (TCP {settings.port}, {self.capture.name}) 監控網卡:{selected_iface_name}|{iface_guid}")
+        except Exception as e:
+            self.log_message(f"❌ 啟動監控失敗：{e}")
+            messagebox.showerror("錯誤", f"無法啟動封包監控：{e}")
+    
+    def _start_process_worker(self, iface_guid, selected_iface_name, settings):
+        """在子行程啟動擷取與解析（重新開始時先停止舊的子行程）"""
+        if self.process_worker:
+            self.process_worker.stop()
+            self.log_message(f"已停止 封包監控 監控網卡:{selected_iface_name}|{iface_guid}")
+        # 新的子行程從空名單開始比對，介面端的名單與表格也要清空，否則舊玩家永遠不會收到離開事件；
+        # 評分狀態一併清空：中斷期間離開的玩家會一直被當成在線而累積停留時間，
+        # 改送離開事件則會讓所有人重新出現時被算成快速重現
+        self.process_generation += 1
+        generation = self.process_generation
+        self.roster.reset()
+        self.bot_scorer.reset()
+        self._clear_players_table()
+        self.shown_map_code = None
+        self.my_id = ''
+        source = WorkerSource(settings.capture_backend, iface_guid, settings.port)
+        self.process_worker = ProcessParserWorker(
+            self.data_manager.codebook,
+            lambda events, captured: self._on_roster_events(events, captured, generation),
+            source, self.profiler)
+        try:
+            self.process_worker.start()
         except Exception as e:
+            self.process_worker = None
             self.log_message(f"❌ 啟動監控失敗：{e}")
             messagebox.showerror("錯誤", f"無法啟動封包監控：{e}")
+            return
+        self._set_status_light(True)
+        self.log_message(f"🟢 封包監控已啟動 (TCP {settings.port}, 子行程) 監控網卡:{selected_iface_name}|{iface_guid}")
     
-    def _process_packet(self, pkt):
-        """處理傳入的封包"""
-        if TCP not in pkt:
+    def _start_parser_worker(self):
+        """啟動解析執行緒（擷取執行緒只負責放入佇列）"""
+        if self.parser_worker:
             return
-        
-        players = self.packet_processor.process_packet_data(bytes(pkt[TCP].payload))
-        if players:
-            # 使用 after 方法安全地從線程更新GUI
-            self.parent.after(0, lambda p=players: self._update_players(p))
+        self.packet_queue = PacketQueue()
+        self.parser_worker = ParserWorker(self.packet_queue, self.packet_processor, self._on_players)
+        self.parser_worker.start()
+    
+    def _on_players(self, players: List[Player]):
+        """解析執行緒回報玩家名單"""
+        # 使用 after 方法安全地從線程更新GUI
+        posted = time.perf_counter()
+        self.parent.after(0, lambda p=players: self._update_players(p, posted))
+    
+    def _on_roster_events(self, events: List[RosterEvent], captured: float, generation: int):
+        """子行程回報名單變動事件（接收執行緒）"""
+        posted = time.perf_counter()
+        self.parent.after(0, lambda e=events: self._update_events(e, captured, posted, generation))
     
     def _set_character_name(self):
         """設定要監控的角色名稱"""
@@ -191,63 +365,152 @@ class PlayerMonitorTab:
         
         self._start_packet_monitoring()
         self.my_name = name
-        self.data_manager.save_user_config(name)
+        self.shown_map_code = None
+        # 設定在背景延遲寫入，不阻塞介面
+        self.settings_store.update(last_character_name=name, iface=self.iface_var.get())
         self.status_label.config(text=f"正在監控角色：{name}", foreground='blue')
         self.log_message(f"🎯 開始監控角色：{name}")
     
-    def _update_players(self, players: List[Dict]):
-        """根據檢測到的玩家更新玩家列表"""
+    def _update_players(self, players: List[Player], posted: float = None):
+        """根據檢測到的玩家名單套用變動事件"""
+        start = time.perf_counter()
+        if posted is not None:
+            # 解析執行緒交給主執行緒到實際執行的延遲
+            self.profiler.record('gui_hop', start - posted)
+        try:
+            self._apply_players(players)
+        finally:
+            self.profiler.record('ui_update', time.perf_counter() - start)
+    
+    def _update_events(self, events: List[RosterEvent], captured: float, posted: float, generation: int):
+        """套用子行程算好的變動事件"""
+        if generation != self.process_generation:
+            return  # 已重新啟動的舊子行程送來的事件
+        start = time.perf_counter()
+        self.profiler.record('gui_hop', start - posted)
+        try:
+            self._apply_events(self.roster.apply(events))
+        finally:
+            self.profiler.record('ui_update', time.perf_counter() - start)
+            # 擷取到表格更新完成的端到端延遲
+            self.profiler.record('end_to_end', max(0.0, time.time() - captured))
+    
+    def _apply_players(self, players: List[Player]):
+        """以完整名單更新名單狀態、地圖資訊與表格"""
+        self._apply_events(self.roster.update(players))
+    
+    def _apply_events(self, events: List[RosterEvent]):
+        """依變動事件更新地圖資訊與表格"""
+        now = time.time()
+        if self.sightings and events:
+            self.sightings.record(events, now)
+        scores = self.bot_scorer.update(events, now)
         if not self.my_name:
             return
         
-        # 找到玩家的角色
-        my_player = next((p for p in players if p['nickname'] == self.my_name), None)
+        # 找到玩家的角色（先以上次的 ID 查詢，找不到才掃描整份名單）
+        my_player = self.roster.get(self.my_id)
+        if my_player is None or my_player.nickname != self.my_name:
+            my_player = self.roster.find_nickname(self.my_name)
+            self.my_id = my_player.id if my_player else ''
         
         if not my_player:
             self.map_info_label.config(text=f"未找到角色 '{self.my_name}' 在頻道中")
             self._clear_players_table()
+            self.shown_map_code = None
             return
         
         # 更新當前地圖資訊
-        current_map = my_player['map_zh']
+        current_map = my_player.map_zh
         self.my_current_map = current_map
         self.map_info_label.config(
-            text=f"您目前在：{current_map} (等級: {my_player['level']}, 職業: {my_player['job_zh']})"
+            text=f"您目前在：{current_map} (等級: {my_player.level}, 職業: {my_player.job_zh})"
         )
         
-        # 找到所有在同一地圖的玩家
-        same_map_players = [p for p in players if p['map_zh'] == current_map]
+        if my_player.map_code != self.shown_map_code:
+            self._rebuild_players_table(my_player)
+        else:
+            self._apply_roster_events(events, my_player.map_code)
+        self._apply_bot_scores(scores)
+    
+    def _on_translations_reloaded(self):
+        """翻譯表已重新載入（主執行緒）"""
+        self.log_message(f"🔄 已重新載入 {Config.KOREAN_CHINESE_FILE}")
+        if self.roster.players:
+            self.shown_map_code = None
+            self._apply_events([])
+    
+    def _rebuild_players_table(self, my_player: Player):
+        """切換地圖（或首次找到角色）時重建整個表格"""
+        map_code = my_player.map_code
+        current_map = my_player.map_zh
+        same_map_players = self.roster.on_map(map_code)
         
-        # 更新玩家表格
         self._update_players_table(same_map_players)
+        self.shown_map_code = map_code
         
         # 記錄日誌資訊
-        other_players = [p for p in same_map_players if p['nickname'] != self.my_name]
+        other_players = [p for p in same_map_players if p.nickname != self.my_name]
         if other_players:
             self.log_message(f"📍 在 {current_map} 發現 {len(other_players)} 位其他玩家")
             for player in other_players:
-                self.log_message(f"   ➤ {player['nickname']} (ID: {player['id']}, {player['level']}級 {player['job_zh']})")
+                self.log_message(f"   ➤ {player.nickname} (ID: {player.id}, {player.level}級 {player.job_zh})")
         else:
             self.log_message(f"📍 在 {current_map} 只有您一個人")
     
-    def _update_players_table(self, players: List[Dict]):
+    def _apply_roster_events(self, events: List[RosterEvent], map_code: int):
+        """只針對有變動的玩家更新表格"""
+        tree = self.players_tree
+        for event in events:
+            player = event.player
+            on_map = event.kind != LEFT and player.map_code == map_code
+            shown = tree.exists(player.id)
+            
+            if on_map and shown:
+                tree.item(player.id, values=self._player_row(player)[0])
+            elif on_map:
+                values, tags = self._player_row(player)
+                tree.insert('', 'end', iid=player.id, values=values, tags=tags)
+                verb = "進入地圖" if event.kind == JOINED else "來到此地圖"
+                self.log_message(f"   ➕ {player.nickname} {verb} (ID: {player.id}, {player.level}級 {player.job_zh})")
+            elif shown:
+                tree.delete(player.id)
+                where = "頻道" if event.kind == LEFT else "地圖"
+                self.log_message(f"   ➖ {player.nickname} 離開了{where}")
+    
+    def _apply_bot_scores(self, scores: List[BotScore]):
+        """標記狀態改變的玩家：更新表格標籤，同地圖玩家新被標記時寫入日誌"""
+        tree = self.players_tree
+        for result in scores:
+            if not tree.exists(result.player_id):
+                continue
+            player = self.roster.get(result.player_id)
+            if player is not None:
+                tree.item(result.player_id, tags=self._player_row(player)[1])
+            if result.flagged and result.player_id != self.my_id:
+                self.log_message(f"⚠️ 可疑玩家 {result.nickname} (ID: {result.player_id}) "
+                                 f"分數 {result.score}：{'、'.join(result.reasons)}")
+    
+    def _player_row(self, player: Player):
+        """表格中一位玩家的欄位值與標籤"""
+        nickname = player.nickname
+        tags = ()
+        
+        if nickname == self.my_name:
+            nickname = f"★ {nickname} (我)"
+            tags = ('myself',)
+        elif self.bot_scorer.is_flagged(player.id):
+            tags = ('suspicious',)
+        
+        return (nickname, player.id, player.level, player.job_zh), tags
+    
+    def _update_players_table(self, players: List[Player]):
         """更新玩家表格顯示"""
         self._clear_players_table()
         
         for player in players:
-            nickname = player['nickname']
-            tags = ()
-            
-            if nickname == self.my_name:
-                nickname = f"★ {nickname} (我)"
-                tags = ('myself',)
-            
-            self.players_tree.insert('', 'end', values=(
-                nickname,
-                player['id'],
-                player['level'],
-                player['job_zh']
-            ), tags=tags)
+            values, tags = self._player_row(player)
+            self.players_tree.insert('', 'end', iid=player.id, values=values, tags=tags)
     
     def _clear_players_table(self):
         """清空玩家表格中的所有項目"""
@@ -310,6 +573,47 @@ class PlayerMonitorTab:
         self.parent.clipboard_append(data)
         self.log_message(f"📋 已複製整列：{data}")
     
+    def _open_sighting_store(self):
+        """開啟出現紀錄資料庫；停用或開啟失敗時不記錄"""
+        if not Config.SIGHTINGS_DB:
+            return None
+        try:
+            return SightingStore(Config.SIGHTINGS_DB)
+        except Exception as e:
+            print(f"開啟出現紀錄資料庫失敗: {e}")
+            return None
+    
+    def _show_sighting_history(self):
+        """在日誌列出選取玩家出現過的地圖"""
+        selected_item = self.players_tree.selection()
+        if not selected_item or not self.sightings:
+            return
+        
+        player_id = self.players_tree.item(selected_item[0], 'values')[1]
+        self.sightings.flush(timeout=1.0)
+        visits = self.sightings.maps_visited(player_id)
+        if not visits:
+            self.log_message(f"🗂️ 沒有 ID {player_id} 的出現紀錄")
+            return
+        self.log_message(f"🗂️ ID {player_id} 出現過 {len(visits)} 張地圖：")
+        for map_kr, count, first_seen, last_seen in visits:
+            first = time.strftime('%m-%d %H:%M', time.localtime(first_seen))
+            last = time.strftime('%m-%d %H:%M', time.localtime(last_seen))
+            self.log_message(f"   ➤ {self.data_manager.translate_map(map_kr)}：{count} 筆 ({first} ~ {last})")
+    
+    def _show_bot_score(self):
+        """在日誌列出選取玩家目前的可疑度與原因"""
+        selected_item = self.players_tree.selection()
+        if not selected_item:
+            return
+        
+        player_id = self.players_tree.item(selected_item[0], 'values')[1]
+        result = self.bot_scorer.score(player_id, time.time())
+        if result is None:
+            return
+        reasons = '、'.join(result.reasons) or "未達任何門檻"
+        self.log_message(f"🤖 {result.nickname} (ID: {player_id}) 可疑度 {result.score}：{reasons}")
+    
     def _set_status_light(self, on: bool):
         """設定狀態指示燈"""
         color = 'green' if on else 'red'
@@ -324,5 +628,20 @@ class PlayerMonitorTab:
     
     def cleanup(self):
         """清理資源"""
-        if self.sniffer:
-            self.sniffer.stop() 
\ No newline at end of file
+        if self.diagnostics_job:
+            self.parent.after_cancel(self.diagnostics_job)
+            self.diagnostics_job = None
+        if self.heartbeat_job:
+            self.parent.after_cancel(self.heartbeat_job)
+            self.heartbeat_job = None
+        if self.bot_tick_job:
+            self.parent.after_cancel(self.bot_tick_job)
+            self.bot_tick_job = None
+        if self.process_worker:
+            self.process_worker.stop()
+        if self.capture:
+            self.capture.stop()
+        if self.parser_worker:
+            self.parser_worker.stop()
+        if self.sightings:
+            self.sightings.close() 
\ No newline at end of file
@@ -8,16 +8,20 @@ import tkinter as tk
 from tkinter import scrolledtext, ttk, filedialog
 import pygetwindow as gw
 from datetime import datetime
+from typing import Optional
 from config import Config
+from settings import FPS_CHOICES, PROFILES, SCALE_CHOICES, SettingsStore
 from video_recorder import VideoRecorder
 
 
 class RecordingTab:
     """處理視頻錄製UI頁籤"""
     
-    def __init__(self, parent):
+    def __init__(self, parent, settings_store: Optional[SettingsStore] = None):
         self.parent = parent
-        self.recorder = VideoRecorder(Config.RECORDINGS_DIR, self._log_message)
+        self.settings_store = settings_store or SettingsStore()
+        self.recorder = VideoRecorder(Config.RECORDINGS_DIR, self._log_message,
+                                      self.settings_store.settings.max_file_size)
         self.available_windows = []
         self.update_timer = None
         
@@ -87,20 +91,33 @@ class RecordingTab:
         quality_frame = ttk.Frame(parent)
         quality_frame.pack(fill='x', pady=(0, 10))
         
+        settings = self.settings_store.settings
+        
+        # 效能設定檔
+        profile_row = ttk.Frame(quality_frame)
+        profile_row.pack(fill='x', pady=(0, 5))
+        
+        ttk.Label(profile_row, text="效能設定檔：").pack(side='left')
+        self.profile_var = tk.StringVar(value=settings.profile)
+        profile_combo = ttk.Combobox(profile_row, textvariable=self.profile_var,
+                                     values=list(PROFILES), width=14, state='readonly')
+        profile_combo.pack(side='left', padx=(5, 0))
+        profile_combo.bind('<<ComboboxSelected>>', self._apply_profile)
+        
         # 第一行：FPS 和品質
         quality_row1 = ttk.Frame(quality_frame)
         quality_row1.pack(fill='x', pady=(0, 5))
         
         ttk.Label(quality_row1, text="FPS：").pack(side='left')
-        self.fps_var = tk.StringVar(value=str(Config.DEFAULT_FPS))
+        self.fps_var = tk.StringVar(value=str(settings.fps))
         fps_combo = ttk.Combobox(quality_row1, textvariable=self.fps_var, 
-                                values=["15", "20", "25", "30"], width=5, state='readonly')
+                                values=[str(fps) for fps in FPS_CHOICES], width=5, state='readonly')
         fps_combo.pack(side='left', padx=(5, 20))
         
         ttk.Label(quality_row1, text="品質：").pack(side='left')
-        self.quality_var = tk.StringVar(value=Config.DEFAULT_QUALITY)
+        self.quality_var = tk.StringVar(value=settings.quality)
         quality_combo = ttk.Combobox(quality_row1, textvariable=self.quality_var, 
-                                   values=["低", "中等", "高", "超高"], width=8, state='readonly')
+                                   values=list(Config.QUALITY_SETTINGS), width=8, state='readonly')
         quality_combo.pack(side='left', padx=(5, 0))
         
         # 第二行：解析度縮放
@@ -108,12 +125,31 @@ class RecordingTab:
         quality_row2.pack(fill='x')
         
         ttk.Label(quality_row2, text="解析度：").pack(side='left')
-        self.scale_var = tk.StringVar(value=Config.DEFAULT_SCALE)
+        self.scale_var = tk.StringVar(value=settings.scale)
         scale_combo = ttk.Combobox(quality_row2, textvariable=self.scale_var, 
-                                 values=["50%", "60%", "75%", "85%", "100%"], width=8, state='readonly')
+                                 values=list(SCALE_CHOICES), width=8, state='readonly')
         scale_combo.pack(side='left', padx=(5, 20))
         
-        ttk.Label(quality_row2, text="檔案大小：90MB", foreground='gray').pack(side='left')
+        self.file_size_label = ttk.Label(quality_row2, text=self._file_size_text(), foreground='gray')
+        self.file_size_label.pack(side='left')
+    
+    def _file_size_text(self) -> str:
+        return f"檔案大小：{self.recorder.max_file_size // (1024 * 1024)}MB"
+    
+    def _apply_profile(self, event=None):
+        """套用選擇的效能設定檔"""
+        try:
+            settings = self.settings_store.apply_profile(self.profile_var.get())
+        except ValueError as e:
+            self._log_message(f"❌ {e}")
+            return
+        self.fps_var.set(str(settings.fps))
+        self.quality_var.set(settings.quality)
+        self.scale_var.set(settings.scale)
+        if not self.recorder.recording:
+            self.recorder.max_file_size = settings.max_file_size
+            self.file_size_label.config(text=self._file_size_text())
+        self._log_message(f"⚙️ 已套用效能設定檔：{settings.profile}")
     
     def _create_recording_button(self, parent):
         """創建錄製控制按鈕"""
@@ -193,6 +229,12 @@ class RecordingTab:
         try:
             fps = int(self.fps_var.get())
             scale = int(self.scale_var.get().replace('%', '')) / 100.0
+            # 記住這次的錄影參數（背景延遲寫入）
+            settings = self.settings_store.update(
+                fps=fps, quality=self.quality_var.get(), scale=self.scale_var.get())
+            self.profile_var.set(settings.profile)
+            self.recorder.max_file_size = settings.max_file_size
+            self.file_size_label.config(text=self._file_size_text())
             
             if self.recorder.start_recording(selected_window, fps, scale):
                 self.record_button.config(text="⏹️ 停止錄影")
@@ -227,7 +269,7 @@ class RecordingTab:
         """更新錄製資訊顯示"""
         status = self.recorder.get_status_info()
         
-        info_text = f"檔案分割大小：90MB\n"
+        info_text = f"檔案分割大小：{self.recorder.max_file_size // (1024 * 1024)}MB\n"
         info_text += f"當前檔案編號：{status['file_counter']}\n"
         info_text += f"FPS：{self.fps_var.get()} | 品質：{self.quality_var.get()} | 解析度：{self.scale_var.get()}\n"
         info_text += f"輸出目錄：{self.recorder.output_dir}\n"
@@ -17,9 +17,11 @@ from config import Config
 class VideoRecorder:
     """處理視頻錄製功能"""
     
-    def __init__(self, output_dir: str, log_callback: Callable[[str], None]):
+    def __init__(self, output_dir: str, log_callback: Callable[[str], None],
+                 max_file_size: int = Config.MAX_FILE_SIZE):
         self.output_dir = output_dir
         self.log_callback = log_callback
+        self.max_file_size = max_file_size  # 檔案分割大小（位元組）
         self.recording = False
         self.video_writer = None
         self.recording_thread = None
@@ -131,7 +133,7 @@ class VideoRecorder:
         height, width = frame.shape[:2]
         
         # 如需要，創建新的視頻檔案
-        if self.video_writer is None or self.current_file_size >= Config.MAX_FILE_SIZE:
+        if self.video_writer is None or self.current_file_size >= self.max_file_size:
             if self.video_writer:
                 self.video_writer.release()
             
@@ -174,7 +176,7 @@ class VideoRecorder:
             if os.path.exists(self.current_video_path):
                 self.current_file_size = os.path.getsize(self.current_video_path)
                 
-                if self.current_file_size >= Config.MAX_FILE_SIZE:
+                if self.current_file_size >= self.max_file_size:
                     self.file_counter += 1
                     size_mb = self.current_file_size / (1024 * 1024)
                     self.log_callback(f"📄 檔案達到 {size_mb:.1f}MB，準備分割")